@@ -30,6 +30,7 @@ from nova.api.ec2 import apirequest
 from nova.api.ec2 import ec2utils
 from nova.api.ec2 import faults
 from nova.api import validator
+from nova import cache_utils
 from nova import context
 from nova import exception
 from nova.i18n import _
@@ -37,7 +38,6 @@ from nova.i18n import _LE
 from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
-from nova.openstack.common import memorycache
 from nova.openstack.common import timeutils
 from nova import utils
 from nova import wsgi
@@ -147,7 +147,7 @@ class Lockout(wsgi.Middleware):
 
     def __init__(self, application):
         """middleware can use fake for testing."""
-        self.mc = memorycache.get_client()
+        self.mc = cache_utils.get_client()
         super(Lockout, self).__init__(application)
 
     @webob.dec.wsgify(RequestClass=wsgi.Request)
@@ -1049,12 +1049,20 @@ class CloudController(object):
         return {'instancesSet': instances_set}
 
     def _format_instance_bdm(self, context, instance_uuid, root_device_name,
-                             result):
-        """Format InstanceBlockDeviceMappingResponseItemType."""
+                             result, bdms=None, volumes=None):
+        """Format InstanceBlockDeviceMappingResponseItemType.
+
+        The block device mappings of the instance and a dict of their
+        volumes by id can be passed in when they have been fetched for
+        several instances at once.
+        """
         root_device_type = 'instance-store'
         mapping = []
-        bdms = objects.BlockDeviceMappingList.get_by_instance_uuid(
-                context, instance_uuid)
+        if bdms is None:
+            bdms = objects.BlockDeviceMappingList.get_by_instance_uuid(
+                    context, instance_uuid)
+        if volumes is None:
+            volumes = {}
         for bdm in bdms:
             volume_id = bdm.volume_id
             if volume_id is None or bdm.no_device:
@@ -1063,7 +1071,9 @@ class CloudController(object):
             if bdm.device_name == root_device_name and bdm.is_volume:
                 root_device_type = 'ebs'
 
-            vol = self.volume_api.get(context, volume_id)
+            vol = volumes.get(volume_id)
+            if vol is None:
+                vol = self.volume_api.get(context, volume_id)
             LOG.debug("vol = %s\n", vol)
             # TODO(yamahata): volume attach time
             ebs = {'volumeId': ec2utils.id_to_ec2_vol_id(volume_id),
@@ -1078,6 +1088,18 @@ class CloudController(object):
             result['blockDeviceMapping'] = mapping
         result['rootDeviceType'] = root_device_type
 
+    def _get_bdm_volumes(self, context, bdms):
+        """Returns the volumes used by the block device mappings by id.
+
+        Each volume is looked up once, however many of the mappings use
+        it.  Only the volumes in use are fetched, listing every volume
+        would return the whole cloud for an admin.
+        """
+        volume_ids = set(bdm.volume_id for bdm in bdms
+                         if bdm.volume_id is not None and not bdm.no_device)
+        return dict((volume_id, self.volume_api.get(context, volume_id))
+                    for volume_id in volume_ids)
+
     @staticmethod
     def _format_instance_root_device_name(instance, result):
         result['rootDeviceName'] = (instance.get('root_device_name') or
@@ -1134,10 +1156,22 @@ class CloudController(object):
             except exception.NotFound:
                 instances = []
 
+        if not context.is_admin:
+            instances = [inst for inst in instances
+                         if not pipelib.is_vpn_image(inst['image_ref'])]
+
+        # Fetch what is not part of the instances themselves for all of
+        # them at once, rather than with a few queries per instance.
+        bdms = objects.BlockDeviceMappingList.get_by_instance_uuids(
+            context, [inst['uuid'] for inst in instances])
+        bdms_by_instance = {}
+        for bdm in bdms:
+            bdms_by_instance.setdefault(bdm.instance_uuid, []).append(bdm)
+        volumes = self._get_bdm_volumes(context, bdms)
+        zones = ec2utils.get_availability_zones_by_hosts(
+            set(inst['host'] for inst in instances))
+
         for instance in instances:
-            if not context.is_admin:
-                if pipelib.is_vpn_image(instance['image_ref']):
-                    continue
             i = {}
             instance_uuid = instance['uuid']
             ec2_id = ec2utils.id_to_ec2_inst_id(instance_uuid)
@@ -1172,7 +1206,8 @@ class CloudController(object):
             for k, v in utils.instance_meta(instance).iteritems():
                 i['tagSet'].append({'key': k, 'value': v})
 
-            client_token = self._get_client_token(context, instance_uuid)
+            client_token = utils.instance_sys_meta(instance).get(
+                'EC2_client_token')
             if client_token:
                 i['clientToken'] = client_token
 
@@ -1187,10 +1222,11 @@ class CloudController(object):
             i['amiLaunchIndex'] = instance['launch_index']
             self._format_instance_root_device_name(instance, i)
             self._format_instance_bdm(context, instance['uuid'],
-                                      i['rootDeviceName'], i)
-            host = instance['host']
-            zone = ec2utils.get_availability_zone_by_host(host)
-            i['placement'] = {'availabilityZone': zone}
+                                      i['rootDeviceName'], i,
+                                      bdms=bdms_by_instance.get(
+                                          instance['uuid'], []),
+                                      volumes=volumes)
+            i['placement'] = {'availabilityZone': zones[instance['host']]}
             if instance['reservation_id'] not in reservations:
                 r = {}
                 r['reservationId'] = instance['reservation_id']
@@ -1362,12 +1398,6 @@ class CloudController(object):
                         {'EC2_client_token': client_token})
                 instance.save()
 
-    def _get_client_token(self, context, instance_uuid):
-        """Get client token for a given instance."""
-        instance = objects.Instance.get_by_uuid(context,
-                instance_uuid, expected_attrs=['system_metadata'])
-        return instance.system_metadata.get('EC2_client_token')
-
     def _remove_client_token(self, context, instance_ids):
         """Remove client token to reservation ID mapping."""
 
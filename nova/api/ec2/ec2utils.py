@@ -18,6 +18,7 @@ import functools
 import re
 
 from nova import availability_zones
+from nova import cache_utils
 from nova import context
 from nova import db
 from nova import exception
@@ -26,7 +27,6 @@ from nova.network import model as network_model
 from nova import objects
 from nova.objects import base as obj_base
 from nova.openstack.common import log as logging
-from nova.openstack.common import memorycache
 from nova.openstack.common import timeutils
 from nova.openstack.common import uuidutils
 
@@ -41,7 +41,7 @@ def memoize(func):
     def memoizer(context, reqid):
         global _CACHE
         if not _CACHE:
-            _CACHE = memorycache.get_client()
+            _CACHE = cache_utils.get_client()
         key = "%s:%s" % (func.__name__, reqid)
         key = str(key)
         value = _CACHE.get(key)
@@ -177,6 +177,11 @@ def get_availability_zone_by_host(host, conductor_api=None):
         context.get_admin_context(), host, conductor_api)
 
 
+def get_availability_zones_by_hosts(hosts):
+    return availability_zones.get_hosts_availability_zones(
+        context.get_admin_context(), hosts)
+
+
 def id_to_ec2_id(instance_id, template='i-%08x'):
     """Convert an instance ID (int) to an ec2 ID (i-[base 16 number])."""
     return template % int(instance_id)
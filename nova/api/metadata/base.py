@@ -29,6 +29,7 @@ from nova import block_device
 from nova.compute import flavors
 from nova import conductor
 from nova import context
+from nova import metadata_documents
 from nova import network
 from nova import objects
 from nova.objects import base as obj_base
@@ -96,7 +97,7 @@ class InvalidMetadataPath(Exception):
     pass
 
 
-class InstanceMetadata():
+class InstanceMetadata(object):
     """Instance metadata."""
 
     def __init__(self, instance, address=None, content=None, extra_md=None,
@@ -122,9 +123,7 @@ class InstanceMetadata():
                 ctxt, objects.Instance(), instance,
                 expected_attrs=expected)
 
-        # The default value of mimeType is set to MIME_TYPE_TEXT_PLAIN
-        self.set_mimetype(MIME_TYPE_TEXT_PLAIN)
-        self.instance = instance
+        self._set_instance(instance)
         self.extra_md = extra_md
 
         if conductor_api:
@@ -140,23 +139,11 @@ class InstanceMetadata():
 
         self.mappings = _format_instance_mapping(ctxt, instance)
 
-        if instance.get('user_data', None) is not None:
-            self.userdata_raw = base64.b64decode(instance['user_data'])
-        else:
-            self.userdata_raw = None
-
         self.ec2_ids = capi.get_ec2_ids(ctxt,
                                         obj_base.obj_to_primitive(instance))
 
         self.address = address
 
-        # expose instance metadata.
-        self.launch_metadata = utils.instance_meta(instance)
-
-        self.password = password.extract_password(instance)
-
-        self.uuid = instance.get('uuid')
-
         self.content = {}
         self.files = []
 
@@ -194,8 +181,67 @@ class InstanceMetadata():
         self.vddriver = vdclass(instance=instance, address=address,
                                 extra_md=extra_md, network_info=network_info)
 
+    def _set_instance(self, instance):
+        # The default value of mimeType is set to MIME_TYPE_TEXT_PLAIN
+        self.set_mimetype(MIME_TYPE_TEXT_PLAIN)
+        self.instance = instance
+
+        if instance.get('user_data', None) is not None:
+            self.userdata_raw = base64.b64decode(instance['user_data'])
+        else:
+            self.userdata_raw = None
+
+        # expose instance metadata.
+        self.launch_metadata = utils.instance_meta(instance)
+
+        self.password = password.extract_password(instance)
+
+        self.uuid = instance.get('uuid')
+
         self.route_configuration = None
 
+    def get_document(self):
+        """Return what was collected about the instance as primitives.
+
+        from_document() turns the result back into an InstanceMetadata
+        without any database or conductor round trip.
+        """
+        return {'instance': self.instance.obj_to_primitive(),
+                'availability_zone': self.availability_zone,
+                'security_groups': [group['name']
+                                    for group in self.security_groups],
+                'mappings': self.mappings,
+                'ec2_ids': self.ec2_ids,
+                'ip_info': self.ip_info,
+                'content': self.content,
+                'files': self.files,
+                'network_config': self.network_config,
+                'extra_md': self.extra_md,
+                'vendor_data': self.vddriver.get()}
+
+    @classmethod
+    def from_document(cls, document, address=None):
+        """Create the metadata of an instance from a get_document() result.
+
+        :param address: the fixed IP address the metadata is requested from
+        """
+        meta_data = cls.__new__(cls)
+        meta_data._set_instance(
+            objects.Instance.obj_from_primitive(document['instance']))
+        meta_data.extra_md = document['extra_md']
+        meta_data.availability_zone = document['availability_zone']
+        meta_data.security_groups = [{'name': name}
+                                     for name in document['security_groups']]
+        meta_data.mappings = document['mappings']
+        meta_data.ec2_ids = document['ec2_ids']
+        meta_data.address = address
+        meta_data.content = document['content']
+        meta_data.files = document['files']
+        meta_data.ip_info = document['ip_info']
+        meta_data.network_config = document['network_config']
+        meta_data.vddriver = StoredVendorData(document['vendor_data'])
+        return meta_data
+
     def _route_configuration(self):
         if self.route_configuration:
             return self.route_configuration
@@ -504,6 +550,24 @@ class VendorDataDriver(object):
         return self._data
 
 
+class StoredVendorData(VendorDataDriver):
+    """Vendor data read back from a stored metadata document."""
+
+    def __init__(self, data):
+        super(StoredVendorData, self).__init__()
+        self._data = data
+
+
+def store_metadata_document(meta_data):
+    """Store the document of an InstanceMetadata for the metadata API."""
+    addresses = set(meta_data.ip_info['fixed_ips'] +
+                    meta_data.ip_info['fixed_ip6s'])
+    if meta_data.address:
+        addresses.add(meta_data.address)
+    metadata_documents.store_document(meta_data.uuid, addresses,
+                                      meta_data.get_document())
+
+
 def get_metadata_by_address(conductor_api, address):
     ctxt = context.get_admin_context()
     fixed_ip = network.API().get_fixed_ip_by_address(ctxt, address)
@@ -28,13 +28,11 @@ from nova.api.metadata import base
 from nova import conductor
 from nova import exception
 from nova.i18n import _
+from nova import metadata_documents
 from nova.openstack.common import log as logging
-from nova.openstack.common import memorycache
 from nova import utils
 from nova import wsgi
 
-CACHE_EXPIRATION = 15  # in seconds
-
 CONF = cfg.CONF
 CONF.import_opt('use_forwarded_for', 'nova.api.auth')
 
@@ -59,32 +57,29 @@ class MetadataRequestHandler(wsgi.Application):
     """Serve metadata."""
 
     def __init__(self):
-        self._cache = memorycache.get_client()
         self.conductor_api = conductor.API()
 
     def get_metadata_by_remote_address(self, address):
         if not address:
             raise exception.FixedIpNotFoundForAddress(address=address)
 
-        cache_key = 'metadata-%s' % address
-        data = self._cache.get(cache_key)
-        if data:
-            return data
+        document = metadata_documents.get_document_by_address(address)
+        if document:
+            return base.InstanceMetadata.from_document(document, address)
 
         try:
             data = base.get_metadata_by_address(self.conductor_api, address)
         except exception.NotFound:
             return None
 
-        self._cache.set(cache_key, data, CACHE_EXPIRATION)
+        base.store_metadata_document(data)
 
         return data
 
     def get_metadata_by_instance_id(self, instance_id, address):
-        cache_key = 'metadata-%s' % instance_id
-        data = self._cache.get(cache_key)
-        if data:
-            return data
+        document = metadata_documents.get_document(instance_id)
+        if document:
+            return base.InstanceMetadata.from_document(document, address)
 
         try:
             data = base.get_metadata_by_instance_id(self.conductor_api,
@@ -92,7 +87,7 @@ class MetadataRequestHandler(wsgi.Application):
         except exception.NotFound:
             return None
 
-        self._cache.set(cache_key, data, CACHE_EXPIRATION)
+        base.store_metadata_document(data)
 
         return data
 
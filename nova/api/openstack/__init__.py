@@ -18,6 +18,8 @@
 WSGI middleware for OpenStack API controllers.
 """
 
+import functools
+
 from oslo.config import cfg
 import routes
 import stevedore
@@ -203,10 +205,13 @@ class APIRouter(base_wsgi.Router):
             inherits = None
             if resource.inherits:
                 inherits = self.resources.get(resource.inherits)
-                if not resource.controller:
+                if not resource.controller and not resource.load_controller:
                     resource.controller = inherits.controller
             wsgi_resource = wsgi.Resource(resource.controller,
                                           inherits=inherits)
+            if resource.load_controller:
+                wsgi_resource.defer(functools.partial(
+                    self._load_deferred_controller, resource))
             self.resources[resource.collection] = wsgi_resource
             kargs = dict(
                 controller=wsgi_resource,
@@ -239,9 +244,38 @@ class APIRouter(base_wsgi.Router):
                       msg_format_dict)
 
             resource = self.resources[collection]
+            if extension.load_controller or resource.deferred:
+                # Keep the registration order of the extensions even
+                # when only some of them are loaded lazily.
+                resource.defer(functools.partial(
+                    self._register_deferred_extension, extension))
+                continue
             resource.register_actions(controller)
             resource.register_extensions(controller)
 
+    @staticmethod
+    def _load_deferred_controller(resource_ext, resource):
+        controller = resource_ext.load_controller()
+        if controller is not None:
+            resource.controller = controller
+            resource.register_actions(controller)
+
+    @staticmethod
+    def _register_deferred_extension(extension, resource):
+        controller = extension.controller
+        if controller is None:
+            try:
+                controller = extension.load_controller()
+            except Exception:
+                # The extended resource keeps working without it until
+                # a later request loads it, the failure was logged by
+                # the extension.
+                return False
+            if controller is None:
+                return
+        resource.register_actions(controller)
+        resource.register_extensions(controller)
+
     def _setup_routes(self, mapper, ext_mgr, init_only):
         raise NotImplementedError()
 
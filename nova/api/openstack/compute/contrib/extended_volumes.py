@@ -14,6 +14,8 @@
 
 """The Extended Volumes API extension."""
 
+import functools
+
 from nova.api.openstack import extensions
 from nova.api.openstack import wsgi
 from nova.api.openstack import xmlutil
@@ -28,9 +30,18 @@ class ExtendedVolumesController(wsgi.Controller):
         super(ExtendedVolumesController, self).__init__(*args, **kwargs)
         self.compute_api = compute.API()
 
-    def _extend_server(self, context, server, instance):
-        bdms = objects.BlockDeviceMappingList.get_by_instance_uuid(
-                context, instance['uuid'])
+    @staticmethod
+    def _get_bdms(context, instance_uuids):
+        bdms = {}
+        for bdm in objects.BlockDeviceMappingList.get_by_instance_uuids(
+                context, instance_uuids):
+            bdms.setdefault(bdm.instance_uuid, []).append(bdm)
+        return bdms
+
+    def _extend_server(self, context, req, server, instance):
+        bdms = req.get_db_instance_items(
+            'block_device_mappings', instance['uuid'],
+            functools.partial(self._get_bdms, context)) or []
         volume_ids = [bdm.volume_id for bdm in bdms if bdm.volume_id]
         key = "%s:volumes_attached" % Extended_volumes.alias
         server[key] = [{'id': volume_id} for volume_id in volume_ids]
@@ -45,7 +56,7 @@ class ExtendedVolumesController(wsgi.Controller):
             db_instance = req.get_db_instance(server['id'])
             # server['id'] is guaranteed to be in the cache due to
             # the core API adding it in its 'show' method.
-            self._extend_server(context, server, db_instance)
+            self._extend_server(context, req, server, db_instance)
 
     @wsgi.extends
     def detail(self, req, resp_obj):
@@ -58,7 +69,7 @@ class ExtendedVolumesController(wsgi.Controller):
                 db_instance = req.get_db_instance(server['id'])
                 # server['id'] is guaranteed to be in the cache due to
                 # the core API adding it in its 'detail' method.
-                self._extend_server(context, server, db_instance)
+                self._extend_server(context, req, server, db_instance)
 
 
 class Extended_volumes(extensions.ExtensionDescriptor):
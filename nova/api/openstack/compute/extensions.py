@@ -25,9 +25,16 @@ ext_opts = [
                       'nova.api.openstack.compute.contrib.standard_extensions'
                       ],
                     help='osapi compute extension to load'),
+    cfg.StrOpt('osapi_compute_extension_manifest',
+               help='File in which the metadata and routes of the loaded '
+                    'osapi compute extensions are recorded. Once it has '
+                    'been written, API workers import the modules of the '
+                    'extensions on first use rather than at startup'),
 ]
 CONF = cfg.CONF
 CONF.register_opts(ext_opts)
+CONF.import_opt('osapi_compute_ext_list',
+                'nova.api.openstack.compute.contrib')
 
 LOG = logging.getLogger(__name__)
 
@@ -36,6 +43,12 @@ class ExtensionManager(base_extensions.ExtensionManager):
     def __init__(self):
         LOG.audit(_('Initializing extension manager.'))
         self.cls_list = CONF.osapi_compute_extension
+        self.manifest_path = CONF.osapi_compute_extension_manifest
         self.extensions = {}
         self.sorted_ext_list = []
         self._load_extensions()
+
+    def _manifest_settings(self):
+        settings = super(ExtensionManager, self)._manifest_settings()
+        settings.append(CONF.osapi_compute_ext_list)
+        return settings
@@ -27,12 +27,15 @@ To find good rate-limit values, check how long requests are taking (see logs)
 in your environment to assess your capabilities and multiply out to get
 figures.
 
-NOTE: As the rate-limiting here is done in memory, this only works per
-process (each process will have its own rate limiting counter).
+NOTE: As the rate-limiting of `Limiter` is done in memory, this only works per
+process (each process will have its own rate limiting counter).  Use
+`SharedLimiter` with memcached_servers set to share the counters between API
+workers and hosts.
 """
 
 import collections
 import copy
+import hashlib
 import httplib
 import math
 import re
@@ -44,9 +47,11 @@ import webob.exc
 from nova.api.openstack.compute.views import limits as limits_views
 from nova.api.openstack import wsgi
 from nova.api.openstack import xmlutil
+from nova import cache_utils
 from nova.i18n import _
 from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
+from nova.openstack.common import log as logging
 from nova import quota
 from nova import utils
 from nova import wsgi as base_wsgi
@@ -55,6 +60,8 @@ from nova import wsgi as base_wsgi
 QUOTAS = quota.QUOTAS
 LIMITS_PREFIX = "limits."
 
+LOG = logging.getLogger(__name__)
+
 
 limits_nsmap = {None: xmlutil.XMLNS_COMMON_V10, 'atom': xmlutil.XMLNS_ATOM}
 
@@ -171,6 +178,13 @@ class Limit(object):
         if self.verb != verb or not re.match(self.regex, url):
             return
 
+        return self._consume()
+
+    def _consume(self):
+        """Account for a request matching this limit.
+
+        Returns the delay before the request would be allowed, or None.
+        """
         now = self._get_time()
 
         if self.last_request is None:
@@ -232,6 +246,60 @@ DEFAULT_LIMITS = [
 ]
 
 
+# Patterns that cannot be nested into a combined regex without changing
+# their meaning: numbered back references and global inline flags.
+_UNCOMBINABLE_RE = re.compile(r'\\[1-9]|\(\?[iLmsux]+\)')
+
+
+class _LimitMatcher(object):
+    """Finds the limits that apply to a request.
+
+    The regexes of all the limits on a verb are combined into a single
+    pattern of optional lookaheads, one per limit, so that one match
+    against the URL tells which of the limits it matches.
+    """
+
+    def __init__(self, limits):
+        regexes = collections.defaultdict(list)
+        for idx, limit in enumerate(limits):
+            regexes[limit.verb].append((idx, limit.regex))
+
+        self._patterns = {}
+        for verb, entries in regexes.items():
+            self._patterns[verb] = self._compile(entries)
+
+    @staticmethod
+    def _compile(entries):
+        """Return a (combined pattern, group names to limit indexes) pair.
+
+        The pattern is None when the regexes have to be matched one by
+        one, in which case the second item is a list of (index, pattern).
+        """
+        if not any(_UNCOMBINABLE_RE.search(regex) for _idx, regex in entries):
+            groups = dict(('_limit%d' % idx, idx) for idx, _regex in entries)
+            combined = ''.join('(?:(?=(?P<_limit%d>%s)))?' % entry
+                               for entry in entries)
+            try:
+                return re.compile(combined), groups
+            except re.error:
+                pass
+        return None, [(idx, re.compile(regex)) for idx, regex in entries]
+
+    def __call__(self, verb, url):
+        """Return the indexes of the limits matching the request."""
+        try:
+            pattern, groups = self._patterns[verb]
+        except KeyError:
+            return []
+
+        if pattern is None:
+            return [idx for idx, regex in groups if regex.match(url)]
+
+        match = pattern.match(url)
+        return [groups[name] for name, value in match.groupdict().iteritems()
+                if value is not None and name in groups]
+
+
 class RateLimitingMiddleware(base_wsgi.Middleware):
     """Rate-limits requests passing through this middleware. All limit
     information is stored in memory for this implementation.
@@ -310,10 +378,33 @@ class Limiter(object):
                 username = key[len(LIMITS_PREFIX):]
                 self.levels[username] = self.parse_limits(value)
 
+        # Matchers by user, shared between users with the same limits
+        self._matchers = {}
+        self._shared_matchers = {}
+
     def get_limits(self, username=None):
         """Return the limits for a given user."""
         return [limit.display() for limit in self.levels[username]]
 
+    def _get_matching_limits(self, verb, url, username):
+        """Return the limits of the user that apply to the request."""
+        limits = self.levels[username]
+        entry = self._matchers.get(username)
+        if entry is None or entry[0] is not limits:
+            key = tuple((limit.verb, limit.regex) for limit in limits)
+            matcher = self._shared_matchers.get(key)
+            if matcher is None:
+                matcher = self._shared_matchers[key] = _LimitMatcher(limits)
+            entry = self._matchers[username] = (limits, matcher)
+        return [limits[idx] for idx in entry[1](verb, url)]
+
+    def _check_limit(self, limit, username):
+        """Account for a request to limit.
+
+        @return: Delay (in seconds) before the request is allowed, or None
+        """
+        return limit._consume()
+
     def check_for_delay(self, verb, url, username=None):
         """Check the given verb/user/user triplet for limit.
 
@@ -321,8 +412,8 @@ class Limiter(object):
         """
         delays = []
 
-        for limit in self.levels[username]:
-            delay = limit(verb, url)
+        for limit in self._get_matching_limits(verb, url, username):
+            delay = self._check_limit(limit, username)
             if delay:
                 delays.append((delay, limit.error_message))
 
@@ -392,6 +483,65 @@ class Limiter(object):
         return result
 
 
+class SharedLimiter(Limiter):
+    """Rate-limit checking class which keeps the counters in memcached.
+
+    Requests are counted per user and limit in fixed windows of the limit's
+    unit, using atomic increments.  When memcached_servers is set, every API
+    worker and host using those servers enforces the same counters, instead
+    of each process allowing the full limit.
+    """
+
+    def __init__(self, limits, **kwargs):
+        super(SharedLimiter, self).__init__(limits, **kwargs)
+        self._cache = cache_utils.get_client()
+        self._cache_down = False
+
+    def _increment(self, key, expiry):
+        """Atomically add one to the counter at key and return it.
+
+        Returns None when the counter could not be updated, e.g. when
+        memcached can not be reached.
+        """
+        count = self._cache.incr(key)
+        if count is None:
+            # Only one of the workers racing for a new window creates it
+            if self._cache.add(key, '1', time=expiry):
+                return 1
+            count = self._cache.incr(key)
+        if count is None:
+            return None
+        return int(count)
+
+    def _check_limit(self, limit, username):
+        now = limit._get_time()
+        window = int(now // limit.unit)
+        key = 'limits:%s' % hashlib.md5('%s|%s|%s|%s|%s|%s' % (
+            username, limit.verb, limit.regex, limit.value, limit.unit,
+            window)).hexdigest()
+        count = self._increment(key, limit.unit + 1)
+        if count is None:
+            # Fail open, an unreachable memcached must not block the API.
+            # Only the outage is logged rather than every request it lets
+            # through.
+            if not self._cache_down:
+                LOG.warn(_("Could not update the rate limit counters, "
+                           "requests are not rate limited until memcached "
+                           "can be reached again"))
+                self._cache_down = True
+            limit.next_request = now
+            return None
+        if self._cache_down:
+            LOG.info(_("Rate limit counters can be updated again"))
+            self._cache_down = False
+
+        limit.remaining = max(limit.value - count, 0)
+        if count > limit.value:
+            limit.next_request = (window + 1) * limit.unit
+            return limit.next_request - now
+        limit.next_request = now
+
+
 class WsgiLimiter(object):
     """Rate-limit checking from a WSGI application. Uses an in-memory
     `Limiter`.
@@ -15,6 +15,8 @@
 
 """The Extended Availability Zone Status API extension."""
 
+import functools
+
 from nova.api.openstack import extensions
 from nova.api.openstack import wsgi
 from nova import availability_zones as avail_zone
@@ -25,9 +27,19 @@ authorize = extensions.soft_extension_authorizer('compute',
 
 
 class ExtendedAZController(wsgi.Controller):
-    def _extend_server(self, context, server, instance):
+    @staticmethod
+    def _get_availability_zones(req, instance_uuids):
+        context = req.environ['nova.context']
+        instances = [req.get_db_instance(instance_uuid)
+                     for instance_uuid in instance_uuids]
+        return avail_zone.get_instances_availability_zones(context,
+                                                           instances)
+
+    def _extend_server(self, req, server, instance):
         key = "%s:availability_zone" % ExtendedAvailabilityZone.alias
-        az = avail_zone.get_instance_availability_zone(context, instance)
+        az = req.get_db_instance_items(
+            'availability_zones', instance['uuid'],
+            functools.partial(self._get_availability_zones, req))
         if not az and instance.get('availability_zone'):
             # Likely hasn't reached a viable compute node yet so give back the
             # desired availability_zone that *may* exist in the instance
@@ -41,7 +53,7 @@ class ExtendedAZController(wsgi.Controller):
         if authorize(context):
             server = resp_obj.obj['server']
             db_instance = req.get_db_instance(server['id'])
-            self._extend_server(context, server, db_instance)
+            self._extend_server(req, server, db_instance)
 
     @wsgi.extends
     def detail(self, req, resp_obj):
@@ -50,7 +62,7 @@ class ExtendedAZController(wsgi.Controller):
             servers = list(resp_obj.obj['servers'])
             for server in servers:
                 db_instance = req.get_db_instance(server['id'])
-                self._extend_server(context, server, db_instance)
+                self._extend_server(req, server, db_instance)
 
 
 class ExtendedAvailabilityZone(extensions.V3APIExtensionBase):
@@ -13,6 +13,8 @@
 #   under the License.
 
 """The Extended Volumes API extension."""
+import functools
+
 import webob
 from webob import exc
 
@@ -45,9 +47,18 @@ class ExtendedVolumesController(wsgi.Controller):
         self.compute_api = compute.API()
         self.volume_api = volume.API()
 
-    def _extend_server(self, context, server, instance):
-        bdms = objects.BlockDeviceMappingList.get_by_instance_uuid(
-                context, instance['uuid'])
+    @staticmethod
+    def _get_bdms(context, instance_uuids):
+        bdms = {}
+        for bdm in objects.BlockDeviceMappingList.get_by_instance_uuids(
+                context, instance_uuids):
+            bdms.setdefault(bdm.instance_uuid, []).append(bdm)
+        return bdms
+
+    def _extend_server(self, context, req, server, instance):
+        bdms = req.get_db_instance_items(
+            'block_device_mappings', instance['uuid'],
+            functools.partial(self._get_bdms, context)) or []
         volume_ids = [bdm['volume_id'] for bdm in bdms if bdm['volume_id']]
         key = "%s:volumes_attached" % ExtendedVolumes.alias
         server[key] = [{'id': volume_id} for volume_id in volume_ids]
@@ -109,7 +120,7 @@ class ExtendedVolumesController(wsgi.Controller):
             db_instance = req.get_db_instance(server['id'])
             # server['id'] is guaranteed to be in the cache due to
             # the core API adding it in its 'show' method.
-            self._extend_server(context, server, db_instance)
+            self._extend_server(context, req, server, db_instance)
 
     @wsgi.extends
     def detail(self, req, resp_obj):
@@ -120,7 +131,7 @@ class ExtendedVolumesController(wsgi.Controller):
                 db_instance = req.get_db_instance(server['id'])
                 # server['id'] is guaranteed to be in the cache due to
                 # the core API adding it in its 'detail' method.
-                self._extend_server(context, server, db_instance)
+                self._extend_server(context, req, server, db_instance)
 
     @extensions.expected_errors((400, 404, 409))
     @wsgi.response(202)
@@ -22,6 +22,7 @@ from nova.api.openstack.compute.views import flavors as views_flavors
 from nova.api.openstack.compute.views import images as views_images
 from nova.compute import flavors
 from nova.i18n import _
+from nova import objects
 from nova.objects import base as obj_base
 from nova.openstack.common import log as logging
 from nova.openstack.common import timeutils
@@ -90,7 +91,7 @@ class ViewBuilder(common.ViewBuilder):
                 "tenant_id": instance.get("project_id") or "",
                 "user_id": instance.get("user_id") or "",
                 "metadata": self._get_metadata(instance),
-                "hostId": self._get_host_id(instance) or "",
+                "hostId": self._get_host_id(instance, request) or "",
                 "image": self._get_image(request, instance),
                 "flavor": self._get_flavor(request, instance),
                 "created": timeutils.isotime(instance["created_at"]),
@@ -121,8 +122,52 @@ class ViewBuilder(common.ViewBuilder):
     def detail(self, request, instances):
         """Detailed view of a list of instance."""
         coll_name = self._collection_name + '/detail'
+        self._prefetch_faults(instances)
         return self._list_view(self.show, request, instances, coll_name)
 
+    @staticmethod
+    def _prefetch_faults(instances):
+        """Load the faults of a page of instances with a single query.
+
+        Otherwise each instance in a fault status would lazy-load its own
+        fault while its view is built.
+        """
+        if not isinstance(instances, objects.InstanceList):
+            return
+        for instance in instances:
+            if (not instance.obj_attr_is_set('fault') and
+                    instance.obj_attr_is_set('uuid')):
+                instances.fill_faults()
+                return
+
+    @staticmethod
+    def _get_request_cache(request):
+        """Return a dict for memoizing view fragments during a request.
+
+        Host ids, flavor and image links and the server link prefixes are
+        the same for many servers of a listing, so they are only computed
+        once per request.
+        """
+        return request.environ.setdefault('nova.servers_view_cache', {})
+
+    def _get_links(self, request, identifier, collection_name):
+        cache = self._get_request_cache(request)
+        key = ('links', collection_name)
+        bases = cache.get(key)
+        if bases is None:
+            bases = cache[key] = (
+                self._get_href_link(request, '', collection_name),
+                self._get_bookmark_link(request, '', collection_name))
+        identifier = str(identifier)
+        return [{
+            "rel": "self",
+            "href": bases[0] + identifier,
+        },
+        {
+            "rel": "bookmark",
+            "href": bases[1] + identifier,
+        }]
+
     def _list_view(self, func, request, servers, coll_name):
         """Provide a view for a list of servers.
 
@@ -161,13 +206,22 @@ class ViewBuilder(common.ViewBuilder):
         return common.status_from_state(instance.get("vm_state"),
                                         instance.get("task_state"))
 
-    @staticmethod
-    def _get_host_id(instance):
+    @classmethod
+    def _get_host_id(cls, instance, request=None):
         host = instance.get("host")
+        if not host:
+            return None
         project = str(instance.get("project_id"))
-        if host:
+        if request is None:
+            cache = {}
+        else:
+            cache = cls._get_request_cache(request)
+        key = ('host_id', project, host)
+        host_id = cache.get(key)
+        if host_id is None:
             sha_hash = hashlib.sha224(project + host)  # pylint: disable=E1101
-            return sha_hash.hexdigest()
+            host_id = cache[key] = sha_hash.hexdigest()
+        return host_id
 
     def _get_addresses(self, request, instance):
         context = request.environ["nova.context"]
@@ -178,9 +232,14 @@ class ViewBuilder(common.ViewBuilder):
         image_ref = instance["image_ref"]
         if image_ref:
             image_id = str(common.get_id_from_href(image_ref))
-            bookmark = self._image_builder._get_bookmark_link(request,
-                                                              image_id,
-                                                              "images")
+            cache = self._get_request_cache(request)
+            key = ('image', image_id)
+            bookmark = cache.get(key)
+            if bookmark is None:
+                bookmark = cache[key] = \
+                    self._image_builder._get_bookmark_link(request,
+                                                           image_id,
+                                                           "images")
             return {
                 "id": image_id,
                 "links": [{
@@ -192,15 +251,23 @@ class ViewBuilder(common.ViewBuilder):
             return ""
 
     def _get_flavor(self, request, instance):
-        instance_type = flavors.extract_flavor(instance)
-        if not instance_type:
-            LOG.warn(_("Instance has had its instance_type removed "
-                    "from the DB"), instance=instance)
-            return {}
-        flavor_id = instance_type["flavorid"]
-        flavor_bookmark = self._flavor_builder._get_bookmark_link(request,
-                                                                  flavor_id,
-                                                                  "flavors")
+        cache = self._get_request_cache(request)
+        # NOTE: only the flavorid is used from the flavor, so the flavor is
+        # extracted from the system metadata once per flavorid per request.
+        flavor_id = utils.instance_sys_meta(instance).get(
+            'instance_type_flavorid')
+        key = ('flavor', flavor_id)
+        flavor_bookmark = cache.get(key)
+        if flavor_bookmark is None:
+            instance_type = flavors.extract_flavor(instance)
+            if not instance_type:
+                LOG.warn(_("Instance has had its instance_type removed "
+                        "from the DB"), instance=instance)
+                return {}
+            flavor_id = instance_type["flavorid"]
+            flavor_bookmark = self._flavor_builder._get_bookmark_link(
+                request, flavor_id, "flavors")
+            cache[('flavor', flavor_id)] = flavor_bookmark
         return {
             "id": str(flavor_id),
             "links": [{
@@ -253,7 +320,7 @@ class ViewBuilderV3(ViewBuilder):
                 "tenant_id": instance.get("project_id") or "",
                 "user_id": instance.get("user_id") or "",
                 "metadata": self._get_metadata(instance),
-                "host_id": self._get_host_id(instance) or "",
+                "host_id": self._get_host_id(instance, request) or "",
                 "image": self._get_image(request, instance),
                 "flavor": self._get_flavor(request, instance),
                 "created": timeutils.isotime(instance["created_at"]),
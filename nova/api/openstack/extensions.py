@@ -16,7 +16,10 @@
 
 import abc
 import functools
+import hashlib
 import os
+import sys
+import tempfile
 
 import six
 import webob.dec
@@ -27,7 +30,9 @@ from nova.api.openstack import wsgi
 from nova.api.openstack import xmlutil
 from nova import exception
 from nova.i18n import _
+from nova.openstack.common import excutils
 from nova.openstack.common import importutils
+from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 import nova.policy
 
@@ -177,7 +182,15 @@ class ExtensionManager(object):
     See nova/tests/api/openstack/compute/extensions/foxinsocks.py or an
     example extension implementation.
 
+    If manifest_path is set, the metadata and routes of the loaded
+    extensions are recorded in a manifest file the first time they are
+    loaded.  Later managers build their extensions from that manifest
+    and only import an extension's module when one of its controllers
+    is first needed.
+
     """
+    manifest_path = None
+
     def sorted_extensions(self):
         if self.sorted_ext_list is None:
             self.sorted_ext_list = sorted(self.extensions.iteritems())
@@ -196,12 +209,20 @@ class ExtensionManager(object):
         alias = ext.alias
         LOG.audit(_('Loaded extension: %s'), alias)
 
-        if alias in self.extensions:
+        # A lazily loaded extension is replaced by the real one once its
+        # module has been imported.
+        if (alias in self.extensions and
+                not isinstance(self.extensions[alias], LazyExtension)):
             raise exception.NovaException("Found duplicate extension: %s"
                                           % alias)
         self.extensions[alias] = ext
         self.sorted_ext_list = None
 
+    def deregister(self, alias):
+        """Forget an extension, e.g. one whose module failed to import."""
+        if self.extensions.pop(alias, None) is not None:
+            self.sorted_ext_list = None
+
     def get_resources(self):
         """Returns a list of ResourceExtension objects."""
 
@@ -269,6 +290,9 @@ class ExtensionManager(object):
     def _load_extensions(self):
         """Load extensions specified on the command line."""
 
+        if self.manifest_path and self._load_manifest():
+            return
+
         extensions = list(self.cls_list)
 
         for ext_factory in extensions:
@@ -279,6 +303,191 @@ class ExtensionManager(object):
                            '%(exc)s'),
                          {'ext_factory': ext_factory, 'exc': exc})
 
+        if self.manifest_path:
+            self._write_manifest()
+
+    def _manifest_settings(self):
+        """Settings which change the set of extensions that is loaded."""
+        return [str(factory) for factory in self.cls_list]
+
+    def _manifest_fingerprint(self, directories):
+        """Fingerprint the settings and files a manifest depends on.
+
+        Adding, removing or modifying any module in the directories the
+        extensions were loaded from invalidates the manifest.
+        """
+        data = [self._manifest_settings()]
+        for directory in sorted(directories):
+            for fname in sorted(os.listdir(directory)):
+                entry = [directory, fname]
+                if fname.endswith('.py'):
+                    stat = os.stat(os.path.join(directory, fname))
+                    entry.extend([stat.st_mtime, stat.st_size])
+                data.append(entry)
+        return hashlib.md5(jsonutils.dumps(data)).hexdigest()
+
+    def _load_manifest(self):
+        """Register the extensions recorded in the manifest.
+
+        Returns False if the manifest is missing or out of date, in which
+        case the extensions have to be loaded the regular way.
+        """
+        try:
+            with open(self.manifest_path) as manifest_file:
+                manifest = jsonutils.load(manifest_file)
+            fingerprint = self._manifest_fingerprint(manifest['directories'])
+        except (IOError, OSError, ValueError, KeyError) as exc:
+            LOG.debug('Unable to use extension manifest %(path)s: %(exc)s',
+                      {'path': self.manifest_path, 'exc': exc})
+            return False
+
+        if manifest.get('fingerprint') != fingerprint:
+            LOG.info(_('Extension manifest %s is out of date'),
+                     self.manifest_path)
+            return False
+
+        for entry in manifest['extensions']:
+            if entry['eager']:
+                try:
+                    self.load_extension(entry['class'])
+                except Exception as exc:
+                    LOG.warn(_('Failed to load extension %(ext_factory)s: '
+                               '%(exc)s'),
+                             {'ext_factory': entry['class'], 'exc': exc})
+            else:
+                self.register(LazyExtension(self, entry))
+        return True
+
+    def _write_manifest(self):
+        """Record the loaded extensions in the manifest."""
+
+        entries = []
+        directories = set()
+        for ext in self.sorted_extensions():
+            cls = ext.__class__
+            module = sys.modules.get(cls.__module__)
+            if (getattr(module, cls.__name__, None) is not cls or
+                    not getattr(module, '__file__', None)):
+                LOG.debug('Not writing extension manifest, extension '
+                          '%s can not be imported by name', ext.alias)
+                return
+            directories.add(os.path.dirname(os.path.abspath(module.__file__)))
+
+            resources = []
+            if hasattr(ext, 'get_resources'):
+                resources = ext.get_resources()
+            controller_exts = []
+            if hasattr(ext, 'get_controller_extensions'):
+                controller_exts = ext.get_controller_extensions()
+
+            entries.append({
+                'class': '%s.%s' % (cls.__module__, cls.__name__),
+                'name': ext.name,
+                'alias': ext.alias,
+                'namespace': ext.namespace,
+                'updated': ext.updated,
+                'description': ext.__doc__,
+                # Custom routes can't be recorded, so those extensions
+                # are always imported up front.
+                'eager': any(res.custom_routes_fn for res in resources),
+                'resources': [{
+                    'collection': res.collection,
+                    'parent': res.parent,
+                    'collection_actions': res.collection_actions,
+                    'member_actions': res.member_actions,
+                    'inherits': res.inherits,
+                    'member_name': res.member_name,
+                    'controller': res.controller is not None,
+                } for res in resources],
+                'controller_extensions': [controller_ext.collection
+                                          for controller_ext
+                                          in controller_exts],
+            })
+
+        manifest = {
+            'fingerprint': self._manifest_fingerprint(directories),
+            'directories': sorted(directories),
+            'extensions': entries,
+        }
+        try:
+            # Several API workers may write the manifest at the same time,
+            # so write it to a temporary file and rename it into place.
+            with tempfile.NamedTemporaryFile(
+                    dir=os.path.dirname(os.path.abspath(self.manifest_path)),
+                    delete=False) as manifest_file:
+                manifest_file.write(jsonutils.dumps(manifest))
+            os.rename(manifest_file.name, self.manifest_path)
+        except (IOError, OSError) as exc:
+            LOG.warn(_('Unable to write extension manifest %(path)s: '
+                       '%(exc)s'), {'path': self.manifest_path, 'exc': exc})
+
+
+class LazyExtension(object):
+    """Stands in for an extension recorded in an extension manifest.
+
+    Provides the extension metadata, resources and controller extensions
+    from the manifest without importing the extension module.  The module
+    is imported, and the real extension registered in place of this one,
+    when the first of its controllers is loaded.
+    """
+
+    def __init__(self, ext_mgr, entry):
+        self.ext_mgr = ext_mgr
+        self.classpath = entry['class']
+        self.name = entry['name']
+        self.alias = entry['alias']
+        self.namespace = entry['namespace']
+        self.updated = entry['updated']
+        self.__doc__ = entry['description']
+        self._resources = entry['resources']
+        self._collections = entry['controller_extensions']
+        self._extension = None
+        self._loaded = {}
+
+    def load(self):
+        """Import and register the real extension."""
+
+        if self._extension is None:
+            LOG.debug('Loading extension %s on first use', self.classpath)
+            self._extension = importutils.import_class(self.classpath)(
+                self.ext_mgr)
+        return self._extension
+
+    def _load_controller(self, method, index):
+        if method not in self._loaded:
+            try:
+                self._loaded[method] = getattr(self.load(), method)()
+            except Exception as exc:
+                with excutils.save_and_reraise_exception():
+                    LOG.warn(_('Failed to load extension %(ext_factory)s: '
+                               '%(exc)s'),
+                             {'ext_factory': self.classpath, 'exc': exc})
+                    # Stop advertising it until a later attempt succeeds
+                    self.ext_mgr.deregister(self.alias)
+        return self._loaded[method][index].controller
+
+    def get_resources(self):
+        resources = []
+        for index, res in enumerate(self._resources):
+            load_controller = None
+            if res['controller']:
+                load_controller = functools.partial(
+                    self._load_controller, 'get_resources', index)
+            resources.append(ResourceExtension(
+                res['collection'], parent=res['parent'],
+                collection_actions=res['collection_actions'],
+                member_actions=res['member_actions'],
+                inherits=res['inherits'], member_name=res['member_name'],
+                load_controller=load_controller))
+        return resources
+
+    def get_controller_extensions(self):
+        return [ControllerExtension(self, collection, None,
+                                    load_controller=functools.partial(
+                                        self._load_controller,
+                                        'get_controller_extensions', index))
+                for index, collection in enumerate(self._collections)]
+
 
 class ControllerExtension(object):
     """Extend core controllers of nova OpenStack API.
@@ -287,10 +496,12 @@ class ControllerExtension(object):
     controllers.
     """
 
-    def __init__(self, extension, collection, controller):
+    def __init__(self, extension, collection, controller,
+                 load_controller=None):
         self.extension = extension
         self.collection = collection
         self.controller = controller
+        self.load_controller = load_controller
 
 
 class ResourceExtension(object):
@@ -298,7 +509,8 @@ class ResourceExtension(object):
 
     def __init__(self, collection, controller=None, parent=None,
                  collection_actions=None, member_actions=None,
-                 custom_routes_fn=None, inherits=None, member_name=None):
+                 custom_routes_fn=None, inherits=None, member_name=None,
+                 load_controller=None):
         if not collection_actions:
             collection_actions = {}
         if not member_actions:
@@ -311,6 +523,7 @@ class ResourceExtension(object):
         self.custom_routes_fn = custom_routes_fn
         self.inherits = inherits
         self.member_name = member_name
+        self.load_controller = load_controller
 
 
 def load_standard_extensions(ext_mgr, logger, path, package, ext_list=None):
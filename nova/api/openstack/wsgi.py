@@ -16,10 +16,12 @@
 
 import inspect
 import math
+import threading
 import time
 from xml.dom import minidom
 
 from lxml import etree
+from oslo.config import cfg
 import six
 import webob
 
@@ -33,6 +35,24 @@ from nova import utils
 from nova import wsgi
 
 
+wsgi_opts = [
+    cfg.IntOpt('osapi_json_stream_threshold',
+               default=100,
+               help='JSON API responses holding a collection of more than '
+                    'this many items are sent in chunks, encoding a batch '
+                    'of items at a time, instead of being serialized into '
+                    'a single string. Keep it below osapi_max_limit for '
+                    'full pages of a paginated listing to be streamed. Set '
+                    'to 0 to disable streaming.'),
+    cfg.IntOpt('osapi_json_stream_batch_size',
+               default=100,
+               help='Number of collection items encoded into each chunk '
+                    'of a streamed JSON API response.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(wsgi_opts)
+
 XMLNS_V10 = 'http://docs.rackspacecloud.com/servers/api/v1.0'
 XMLNS_V11 = 'http://docs.openstack.org/compute/api/v1.1'
 
@@ -141,6 +161,27 @@ class Request(webob.Request):
     def get_db_compute_node(self, id):
         return self.get_db_item('compute_nodes', id)
 
+    def get_db_instance_items(self, key, instance_uuid, loader):
+        """Allow API extensions to share data about the instances of
+        the same API request.
+
+        On a miss, loader is called once with the uuids of all cached
+        instances that have no data stored under key yet, and returns a
+        dict of their data keyed by instance uuid.  Extending every
+        server of a listing therefore costs a single load rather than
+        one per server.
+        """
+        db_items = self._extension_data['db_items']
+        items = db_items.setdefault(key, {})
+        if instance_uuid not in items:
+            instance_uuids = set(db_items.get('instances', {}))
+            instance_uuids.add(instance_uuid)
+            instance_uuids.difference_update(items)
+            loaded = loader(list(instance_uuids))
+            for uuid in instance_uuids:
+                items[uuid] = loaded.get(uuid)
+        return items[instance_uuid]
+
     def best_match_content_type(self):
         """Determine the requested response content-type."""
         if 'nova.best_content_type' not in self.environ:
@@ -339,6 +380,14 @@ class DictSerializer(ActionDispatcher):
     def serialize(self, data, action='default'):
         return self.dispatch(data, action=action)
 
+    def serialize_iter(self, data):
+        """Serialize data as an iterable of chunks.
+
+        Returns None when data should be serialized in one piece with
+        serialize() instead.
+        """
+        return None
+
     def default(self, data):
         return ""
 
@@ -349,6 +398,43 @@ class JSONDictSerializer(DictSerializer):
     def default(self, data):
         return jsonutils.dumps(data)
 
+    def serialize_iter(self, data):
+        """Serialize large collections as an iterable of chunks.
+
+        Only responses holding a top level list longer than
+        osapi_json_stream_threshold are streamed; the chunks join up to
+        exactly what default() returns for the same data.
+        """
+        threshold = CONF.osapi_json_stream_threshold
+        if threshold <= 0 or not isinstance(data, dict):
+            return None
+        if not all(isinstance(key, six.string_types) for key in data):
+            return None
+        if not any(isinstance(value, list) and len(value) > threshold
+                   for value in data.itervalues()):
+            return None
+        return self._iter_dict(data)
+
+    def _iter_dict(self, data):
+        batch_size = max(CONF.osapi_json_stream_batch_size, 1)
+        separator = '{'
+        for key, value in data.iteritems():
+            head = '%s%s: ' % (separator, jsonutils.dumps(key))
+            separator = ', '
+            if not isinstance(value, list) or not value:
+                yield head + jsonutils.dumps(value)
+                continue
+            # Each item is encoded on its own, so only one batch of the
+            # collection is held as a string at any time.
+            item_separator = head + '['
+            for start in xrange(0, len(value), batch_size):
+                items = value[start:start + batch_size]
+                yield item_separator + ', '.join(jsonutils.dumps(item)
+                                                 for item in items)
+                item_separator = ', '
+            yield ']'
+        yield '}'
+
 
 class XMLDictSerializer(DictSerializer):
 
@@ -607,7 +693,14 @@ class ResponseObject(object):
             response.headers[hdr] = utils.utf8(str(value))
         response.headers['Content-Type'] = utils.utf8(content_type)
         if self.obj is not None:
-            response.body = serializer.serialize(self.obj)
+            body_iter = None
+            serialize_iter = getattr(serializer, 'serialize_iter', None)
+            if serialize_iter is not None:
+                body_iter = serialize_iter(self.obj)
+            if body_iter is not None:
+                response.app_iter = body_iter
+            else:
+                response.body = serializer.serialize(self.obj)
 
         return response
 
@@ -746,6 +839,32 @@ class Resource(wsgi.Application):
         self.wsgi_action_extensions = {}
         self.inherits = inherits
 
+        # Loaders deferred until the first request, see defer()
+        self.deferred = []
+        self._deferred_lock = threading.Lock()
+
+    def defer(self, loader):
+        """Defers calling loader(resource) until the first request.
+
+        Used to import and register controllers of lazily loaded
+        extensions.  Loaders are run in the order they were deferred.
+        A loader which raises fails the request, one which returns False
+        lets it go on without what it loads; either is kept and run
+        again on the next request.
+        """
+        self.deferred.append(loader)
+
+    def _run_deferred(self):
+        with self._deferred_lock:
+            pending = []
+            try:
+                while self.deferred:
+                    if self.deferred[0](self) is False:
+                        pending.append(self.deferred[0])
+                    self.deferred.pop(0)
+            finally:
+                self.deferred[:0] = pending
+
     def register_actions(self, controller):
         """Registers controller actions with this resource."""
 
@@ -890,6 +1009,13 @@ class Resource(wsgi.Application):
     def __call__(self, request):
         """WSGI method that controls (de)serialization and method dispatch."""
 
+        if self.deferred:
+            try:
+                self._run_deferred()
+            except Exception:
+                # The controller could not be loaded, its loader logged why
+                return Fault(webob.exc.HTTPNotFound())
+
         # Identify the action, its arguments, and the requested
         # content type
         action_args = self.get_action_args(request.environ)
@@ -1010,6 +1136,8 @@ class Resource(wsgi.Application):
         return response
 
     def get_method(self, request, action, content_type, body):
+        if self.deferred:
+            self._run_deferred()
         meth, extensions = self._get_method(request,
                                             action,
                                             content_type,
@@ -148,6 +148,53 @@ class ConstantSelector(object):
         return self.value
 
 
+class _RenderPlan(object):
+    """Flattened rendering instructions for a template element.
+
+    Merges a template element with the patches applied along with it
+    (the matching elements of slave templates), so that the merge is
+    done once instead of for every datum rendered.
+    """
+
+    def __init__(self, elements):
+        self.generations = [elem._generation for elem in elements]
+
+        # Text selectors and (key, index, selector) attribute triples,
+        # in the order apply() would use them.  index is set when the
+        # selector is a plain lookup of a single key, which is then
+        # done inline.  None when an element overrides apply().
+        self.texts = None
+        self.attrs = None
+        if all(type(elem).apply.__func__ is TemplateElement.apply.__func__
+               for elem in elements):
+            self.texts = [elem.text for elem in elements
+                          if elem.text is not None]
+            self.attrs = []
+            for elem in elements:
+                for key, selector in elem.attrib.items():
+                    index = None
+                    if (type(selector) is Selector and
+                            len(selector.chain) == 1 and
+                            not callable(selector.chain[0])):
+                        index = selector.chain[0]
+                    self.attrs.append((key, index, selector))
+
+        # The siblings to render each child element against
+        self.children = []
+        seen = set()
+        for idx, sibling in enumerate(elements):
+            for child in sibling:
+                if child.tag in seen:
+                    continue
+                seen.add(child.tag)
+
+                nieces = [child]
+                for sib in elements[idx + 1:]:
+                    if child.tag in sib:
+                        nieces.append(sib[child.tag])
+                self.children.append(nieces)
+
+
 class TemplateElement(object):
     """Represent an element in the template."""
 
@@ -192,6 +239,9 @@ class TemplateElement(object):
         self._text = None
         self._children = []
         self._childmap = {}
+        self._plans = {}
+        # Bumped on every change to this element, see _get_plan()
+        self._generation = 0
         self.colon_ns = colon_ns
 
         # Run the incoming attributes through set() so that they
@@ -240,6 +290,7 @@ class TemplateElement(object):
 
         self._children.append(elem)
         self._childmap[elem.tag] = elem
+        self._changed()
 
     def extend(self, elems):
         """Append children to the element."""
@@ -261,6 +312,7 @@ class TemplateElement(object):
         # Update the children
         self._children.extend(elemlist)
         self._childmap.update(elemmap)
+        self._changed()
 
     def insert(self, idx, elem):
         """Insert a child element at the given index."""
@@ -274,6 +326,7 @@ class TemplateElement(object):
 
         self._children.insert(idx, elem)
         self._childmap[elem.tag] = elem
+        self._changed()
 
     def remove(self, elem):
         """Remove a child element."""
@@ -287,6 +340,7 @@ class TemplateElement(object):
 
         self._children.remove(elem)
         del self._childmap[elem.tag]
+        self._changed()
 
     def get(self, key):
         """Get an attribute.
@@ -317,6 +371,7 @@ class TemplateElement(object):
             value = Selector(value)
 
         self.attrib[key] = value
+        self._changed()
 
     def keys(self):
         """Return the attribute names."""
@@ -363,7 +418,33 @@ class TemplateElement(object):
                 # Attribute has no value, so don't include it
                 pass
 
-    def _render(self, parent, datum, patches, nsmap):
+    def _changed(self):
+        """Invalidate the render plans compiled from this element."""
+
+        self._generation += 1
+
+    def _get_plan(self, patches):
+        """Return the render plan of this element with the patches.
+
+        Plans are cached on the element and rebuilt whenever one of the
+        elements they were compiled from has been modified since.  A
+        plan only covers the text, attributes and children of its own
+        elements, the children have plans of their own.
+        """
+
+        key = tuple(patches)
+        plan = self._plans.get(key)
+        if (plan is None or
+                plan.generations != [elem._generation
+                                     for elem in (self,) + key]):
+            # Only slave combinations are cached, so this stays small
+            # unless templates are attached ad hoc.
+            if len(self._plans) >= 64:
+                self._plans.clear()
+            plan = self._plans[key] = _RenderPlan((self,) + key)
+        return plan
+
+    def _render(self, parent, datum, patches, nsmap, plan=None):
         """Internal rendering.
 
         Renders the template node into an etree.Element object.
@@ -375,6 +456,8 @@ class TemplateElement(object):
                         also be applied.
         :param nsmap: An optional namespace dictionary to be
                       associated with the etree.Element instance.
+        :param plan: An optional _RenderPlan for this element and the
+                     patches.
         """
 
         # Allocate a node
@@ -391,22 +474,45 @@ class TemplateElement(object):
                 nsmap[colon_key] = colon_key
                 tagname = '{%s}%s' % (colon_key, colon_name)
 
-        elem = etree.Element(tagname, nsmap=nsmap)
-
         # If we have a parent, append the node to the parent
         if parent is not None:
-            parent.append(elem)
+            elem = etree.SubElement(parent, tagname, nsmap=nsmap)
+        else:
+            elem = etree.Element(tagname, nsmap=nsmap)
 
         # If the datum is None, do nothing else
         if datum is None:
             return elem
 
-        # Apply this template element to the element
-        self.apply(elem, datum)
+        if plan is None:
+            plan = self._get_plan(patches)
+        if plan.attrs is None:
+            # Apply this template element to the element
+            self.apply(elem, datum)
 
-        # Additionally, apply the patches
-        for patch in patches:
-            patch.apply(elem, datum)
+            # Additionally, apply the patches
+            for patch in patches:
+                patch.apply(elem, datum)
+
+            return elem
+
+        # Same as apply() for this element and the patches
+        for text in plan.texts:
+            elem.text = unicode(text(datum))
+        for key, index, selector in plan.attrs:
+            if index is None:
+                try:
+                    value = selector(datum, True)
+                except KeyError:
+                    continue
+            elif datum == '':
+                value = ''
+            else:
+                try:
+                    value = datum[index]
+                except (KeyError, IndexError):
+                    continue
+            elem.set(key, unicode(value))
 
         # We have fully rendered the element; return it
         return elem
@@ -438,6 +544,8 @@ class TemplateElement(object):
         elif data is None:
             return [(self._render(parent, None, patches, nsmap), None)]
 
+        plan = self._get_plan(patches)
+
         # Make the data into a list if it isn't already
         if not isinstance(data, list):
             data = [data]
@@ -449,7 +557,8 @@ class TemplateElement(object):
         for datum in data:
             if self.subselector is not None:
                 datum = self.subselector(datum)
-            elems.append((self._render(parent, datum, patches, nsmap), datum))
+            elems.append((self._render(parent, datum, patches, nsmap, plan),
+                          datum))
 
         # Return all the elements rendered, as well as the
         # corresponding datum for the next step down the tree
@@ -484,9 +593,11 @@ class TemplateElement(object):
             value = Selector(value)
 
         self._text = value
+        self._changed()
 
     def _text_del(self):
         self._text = None
+        self._changed()
 
     text = property(_text_get, _text_set, _text_del)
 
@@ -578,25 +689,15 @@ class Template(object):
 
         # First step, render the element
         elems = siblings[0].render(parent, obj, siblings[1:], nsmap)
+        if not elems:
+            return None
 
-        # Now, recurse to all child elements
-        seen = set()
-        for idx, sibling in enumerate(siblings):
-            for child in sibling:
-                # Have we handled this child already?
-                if child.tag in seen:
-                    continue
-                seen.add(child.tag)
-
-                # Determine the child's siblings
-                nieces = [child]
-                for sib in siblings[idx + 1:]:
-                    if child.tag in sib:
-                        nieces.append(sib[child.tag])
-
-                # Now we recurse for every data element
-                for elem, datum in elems:
-                    self._serialize(elem, datum, nieces)
+        # Now, recurse to all child elements, using the siblings of
+        # each child as precomputed by the render plan
+        plan = siblings[0]._get_plan(siblings[1:])
+        for nieces in plan.children:
+            for elem, datum in elems:
+                self._serialize(elem, datum, nieces)
 
         # Return the first element; at the top level, this will be the
         # root element
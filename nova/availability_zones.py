@@ -17,8 +17,8 @@
 
 from oslo.config import cfg
 
+from nova import cache_utils
 from nova import db
-from nova.openstack.common import memorycache
 
 # NOTE(vish): azs don't change that often, so cache them for an hour to
 #             avoid hitting the db multiple times on every request.
@@ -42,7 +42,7 @@ def _get_cache():
     global MC
 
     if MC is None:
-        MC = memorycache.get_client()
+        MC = cache_utils.get_client()
 
     return MC
 
@@ -94,6 +94,60 @@ def get_host_availability_zone(context, host, conductor_api=None):
     return az
 
 
+def get_hosts_availability_zones(context, hosts):
+    """Returns a dict of the availability zone of each of the hosts.
+
+    This looks the zones up with one query for all of the hosts, where
+    get_host_availability_zone() needs one per host.
+    """
+    metadata = db.aggregate_host_get_by_metadata_key(
+        context, key='availability_zone')
+    azs = {}
+    for host in hosts:
+        if metadata.get(host):
+            azs[host] = list(metadata[host])[0]
+        else:
+            azs[host] = CONF.default_availability_zone
+    return azs
+
+
+def get_instances_availability_zones(context, instances):
+    """Returns a dict of the availability zone of each instance by uuid.
+
+    Hosts that are not cached yet are looked up together rather than
+    one at a time as get_instance_availability_zone() does.
+    """
+    azs = {}
+    missing = {}
+    cache = _get_cache()
+    for instance in instances:
+        host = str(instance.get('host'))
+        if not host:
+            azs[instance['uuid']] = None
+            continue
+        az = cache.get(_make_cache_key(host))
+        if az:
+            azs[instance['uuid']] = az
+        else:
+            missing.setdefault(host, []).append(instance['uuid'])
+
+    if not missing:
+        return azs
+    elevated = context.elevated()
+    if len(missing) == 1:
+        # The query for a single host is cheaper than the one for all
+        # the hosts in an availability zone.
+        host_azs = dict((host, get_host_availability_zone(elevated, host))
+                        for host in missing)
+    else:
+        host_azs = get_hosts_availability_zones(elevated, missing)
+    for host, instance_uuids in missing.iteritems():
+        cache.set(_make_cache_key(host), host_azs[host], AZ_CACHE_SECONDS)
+        for instance_uuid in instance_uuids:
+            azs[instance_uuid] = host_azs[host]
+    return azs
+
+
 def update_host_availability_zone_cache(context, host, availability_zone=None):
     if not availability_zone:
         availability_zone = get_host_availability_zone(context, host)
@@ -0,0 +1,184 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Memcached client, with a bounded in process cache as fallback.
+
+Without memcached_servers, get_client() returns an in process Client
+replicating the subset of the memcached client interface nova uses.  It
+replaces the client of nova.openstack.common.memorycache, which scans
+every key on each lookup and is not bounded.
+"""
+
+import heapq
+
+from oslo.config import cfg
+
+from nova.openstack.common import timeutils
+
+cache_opts = [
+    cfg.IntOpt('memorycache_max_size',
+               default=100000,
+               help='Maximum number of entries kept by the in process '
+                    'cache, the least recently used ones are evicted '
+                    'first. 0 means unbounded.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(cache_opts)
+CONF.import_opt('memcached_servers', 'nova.openstack.common.memorycache')
+
+
+def get_client(memcached_servers=None):
+    client_cls = Client
+
+    if not memcached_servers:
+        memcached_servers = CONF.memcached_servers
+    if memcached_servers:
+        try:
+            import memcache
+            client_cls = memcache.Client
+        except ImportError:
+            pass
+
+    return client_cls(memcached_servers, debug=0)
+
+
+# Fields of the entries kept in Client.cache
+_PREV, _NEXT, _KEY, _VALUE, _TIMEOUT = range(5)
+
+
+class Client(object):
+    """Replicates a tiny subset of memcached client interface.
+
+    Entries live in a dict and are linked in least recently used order,
+    so lookups, updates and evictions are O(1).  Expiry times are kept on
+    a heap, which lets expired entries be reclaimed without scanning
+    every key.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Ignores the passed in args, except for max_size."""
+        self.max_size = kwargs.get('max_size', CONF.memorycache_max_size)
+        self.cache = {}
+        # Circular list, root[_NEXT] is the least recently used entry
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None, 0]
+        self._expiry = []
+        self._stats = dict.fromkeys(['cmd_get', 'cmd_set', 'get_hits',
+                                     'get_misses', 'evictions',
+                                     'reclaimed'], 0)
+
+    def _unlink(self, entry):
+        entry[_PREV][_NEXT] = entry[_NEXT]
+        entry[_NEXT][_PREV] = entry[_PREV]
+
+    def _link_last(self, entry):
+        last = self._root[_PREV]
+        last[_NEXT] = self._root[_PREV] = entry
+        entry[_PREV] = last
+        entry[_NEXT] = self._root
+
+    def _remove(self, key):
+        self._unlink(self.cache.pop(key))
+
+    def _expire(self):
+        """Reclaims every entry whose timeout has passed."""
+        now = timeutils.utcnow_ts()
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            timeout, key = heapq.heappop(expiry)
+            entry = self.cache.get(key)
+            # Keys set again since have a different timeout and a heap
+            # entry of their own.
+            if entry is not None and entry[_TIMEOUT] == timeout:
+                self._remove(key)
+                self._stats['reclaimed'] += 1
+        return now
+
+    def _lookup(self, key):
+        self._expire()
+        entry = self.cache.get(key)
+        if entry is not None:
+            self._unlink(entry)
+            self._link_last(entry)
+        return entry
+
+    def get(self, key):
+        """Retrieves the value for a key or None."""
+        self._stats['cmd_get'] += 1
+        entry = self._lookup(key)
+        if entry is None:
+            self._stats['get_misses'] += 1
+            return None
+        self._stats['get_hits'] += 1
+        return entry[_VALUE]
+
+    def set(self, key, value, time=0, min_compress_len=0):
+        """Sets the value for a key."""
+        self._stats['cmd_set'] += 1
+        now = self._expire()
+        timeout = 0
+        if time != 0:
+            timeout = now + time
+
+        entry = self.cache.get(key)
+        if entry is None:
+            entry = [None, None, key, value, timeout]
+            self.cache[key] = entry
+        else:
+            self._unlink(entry)
+            entry[_VALUE] = value
+            entry[_TIMEOUT] = timeout
+        self._link_last(entry)
+
+        if timeout:
+            heapq.heappush(self._expiry, (timeout, key))
+            if len(self._expiry) > 2 * len(self.cache) + 64:
+                # Drop the heap entries left behind by overwritten keys
+                self._expiry = [(e[_TIMEOUT], k)
+                                for k, e in self.cache.iteritems()
+                                if e[_TIMEOUT]]
+                heapq.heapify(self._expiry)
+
+        if self.max_size and len(self.cache) > self.max_size:
+            self._remove(self._root[_NEXT][_KEY])
+            self._stats['evictions'] += 1
+        return True
+
+    def add(self, key, value, time=0, min_compress_len=0):
+        """Sets the value for a key if it doesn't exist."""
+        entry = self._lookup(key)
+        if entry is not None and entry[_VALUE] is not None:
+            return False
+        return self.set(key, value, time, min_compress_len)
+
+    def incr(self, key, delta=1):
+        """Increments the value for a key."""
+        entry = self._lookup(key)
+        if entry is None or entry[_VALUE] is None:
+            return None
+        new_value = int(entry[_VALUE]) + delta
+        entry[_VALUE] = str(new_value)
+        return new_value
+
+    def delete(self, key, time=0):
+        """Deletes the value associated with a key."""
+        if key in self.cache:
+            self._remove(key)
+
+    def get_stats(self):
+        """Returns the cache statistics, in the memcache client format."""
+        stats = dict(self._stats, curr_items=len(self.cache))
+        return [('memorycache', stats)]
@@ -45,6 +45,7 @@ from nova import exception
 from nova import hooks
 from nova.i18n import _
 from nova import image
+from nova import metadata_documents
 from nova import network
 from nova.network import model as network_model
 from nova.network.security_group import openstack_driver
@@ -3808,6 +3809,7 @@ class SecurityGroupAPI(base.Base, security_group_base.SecurityGroupBase):
         self.db.instance_add_security_group(context.elevated(),
                                             instance_uuid,
                                             security_group['id'])
+        metadata_documents.invalidate_document(instance_uuid)
         # NOTE(comstud): No instance_uuid argument to this compute manager
         # call
         self.security_group_rpcapi.refresh_security_group_rules(context,
@@ -3831,6 +3833,7 @@ class SecurityGroupAPI(base.Base, security_group_base.SecurityGroupBase):
         self.db.instance_remove_security_group(context.elevated(),
                                                instance_uuid,
                                                security_group['id'])
+        metadata_documents.invalidate_document(instance_uuid)
         # NOTE(comstud): No instance_uuid argument to this compute manager
         # call
         self.security_group_rpcapi.refresh_security_group_rules(context,
@@ -41,6 +41,7 @@ from oslo.config import cfg
 from oslo import messaging
 import six
 
+from nova.api.metadata import base as instance_metadata
 from nova import block_device
 from nova.cells import rpcapi as cells_rpcapi
 from nova.cloudpipe import pipelib
@@ -145,6 +146,11 @@ interval_opts = [
                default=60,
                help="Number of seconds between instance info_cache self "
                     "healing updates"),
+    cfg.BoolOpt("heal_instance_info_cache_bulk",
+                default=False,
+                help="Whether each instance info_cache self healing update "
+                     "should refresh the caches of all the instances on the "
+                     "host at once, rather than those of a single instance"),
     cfg.IntOpt('reclaim_instance_interval',
                default=0,
                help='Interval in seconds for reclaiming deleted instances'),
@@ -227,6 +233,7 @@ CONF.import_opt('allow_resize_to_same_host', 'nova.compute.api')
 CONF.import_opt('console_topic', 'nova.console.rpcapi')
 CONF.import_opt('host', 'nova.netconf')
 CONF.import_opt('my_ip', 'nova.netconf')
+CONF.import_opt('precompute_metadata_documents', 'nova.metadata_documents')
 CONF.import_opt('vnc_enabled', 'nova.vnc')
 CONF.import_opt('enabled', 'nova.spice', group='spice')
 CONF.import_opt('enable', 'nova.cells.opts', group='cells')
@@ -1795,8 +1802,22 @@ class ComputeManager(manager.Manager):
         network_info.wait(do_raise=True)
         instance.info_cache.network_info = network_info
         instance.save(expected_task_state=task_states.SPAWNING)
+        self._precompute_metadata_document(instance, network_info)
         return instance
 
+    def _precompute_metadata_document(self, instance, network_info):
+        """Render the metadata of a new instance before it asks for it."""
+        if not CONF.precompute_metadata_documents:
+            return
+        try:
+            instance_metadata.store_metadata_document(
+                instance_metadata.InstanceMetadata(
+                    instance, network_info=network_info))
+        except Exception:
+            # The metadata API renders it on the first request instead
+            LOG.exception(_LE('Failed to precompute the metadata document'),
+                          instance=instance)
+
     def _notify_about_instance_usage(self, context, instance, event_suffix,
                                      network_info=None, system_metadata=None,
                                      extra_usage_info=None, fault=None):
@@ -2038,6 +2059,7 @@ class ComputeManager(manager.Manager):
         instance.task_state = None
         instance.launched_at = timeutils.utcnow()
         instance.save(expected_task_state=task_states.SPAWNING)
+        self._precompute_metadata_document(instance, network_info)
 
     @contextlib.contextmanager
     def _build_resources(self, context, instance, requested_networks,
@@ -4985,6 +5007,10 @@ class ComputeManager(manager.Manager):
         if not heal_interval:
             return
 
+        if CONF.heal_instance_info_cache_bulk:
+            self._heal_instance_info_caches_bulk(context)
+            return
+
         instance_uuids = getattr(self, '_instance_uuids_to_heal', [])
         instance = None
 
@@ -5057,6 +5083,59 @@ class ComputeManager(manager.Manager):
             LOG.debug("Didn't find any instances for network info cache "
                       "update.")
 
+    def _heal_instance_info_caches_bulk(self, context):
+        """Refresh the info_cache of every instance on this host at once.
+
+        The network info of all the instances is looked up together, which
+        the network API can do with a few bulk queries, and only the caches
+        which differ from it are written back.
+        """
+        LOG.debug('Starting bulk heal of instance info caches')
+        db_instances = objects.InstanceList.get_by_host(
+            context, self.host, expected_attrs=['system_metadata',
+                                                'info_cache'],
+            use_slave=True)
+        instances = [inst for inst in db_instances
+                     if inst.vm_state != vm_states.BUILDING and
+                     inst.task_state != task_states.DELETING]
+        if not instances:
+            LOG.debug("Didn't find any instances for network info cache "
+                      "update.")
+            return
+
+        try:
+            nw_infos = self.network_api.get_instances_nw_info(context,
+                                                              instances)
+        except Exception:
+            LOG.error(_('An error occurred while refreshing the network '
+                        'caches.'), exc_info=True)
+            return
+
+        updated = 0
+        for instance in instances:
+            nw_info = nw_infos.get(instance.uuid)
+            if nw_info is None:
+                continue
+            if instance.info_cache is not None:
+                cached = instance.info_cache.network_info
+                if (jsonutils.to_primitive(cached) ==
+                        jsonutils.to_primitive(nw_info)):
+                    continue
+            try:
+                # NOTE(comstud): See network.api.get_instance_nw_info about
+                # not updating the API cell.
+                info_cache = objects.InstanceInfoCache.new(context,
+                                                           instance.uuid)
+                info_cache.network_info = nw_info
+                info_cache.save(update_cells=False)
+                updated += 1
+            except Exception:
+                LOG.error(_('An error occurred while refreshing the network '
+                            'cache.'), instance=instance, exc_info=True)
+        LOG.debug('Updated the network info_cache of %(updated)d of '
+                  '%(total)d instances',
+                  {'updated': updated, 'total': len(instances)})
+
     @periodic_task.periodic_task
     def _poll_rebooting_instances(self, context):
         if CONF.reboot_timeout > 0:
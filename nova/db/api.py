@@ -535,7 +535,10 @@ def fixed_ip_create(context, values):
 
 
 def fixed_ip_bulk_create(context, ips):
-    """Create a lot of fixed ips from the values dictionary."""
+    """Create a lot of fixed ips from an iterable of values dictionaries.
+
+    The fixed ips are all created in one transaction.
+    """
     return IMPL.fixed_ip_bulk_create(context, ips)
 
 
@@ -632,6 +635,13 @@ def virtual_interface_get_by_instance(context, instance_id, use_slave=False):
                                                   use_slave=use_slave)
 
 
+def virtual_interface_get_by_instances(context, instance_uuids,
+                                       use_slave=False):
+    """Gets all virtual_interfaces for a list of instances."""
+    return IMPL.virtual_interface_get_by_instances(context, instance_uuids,
+                                                   use_slave=use_slave)
+
+
 def virtual_interface_get_by_instance_and_network(context, instance_id,
                                                            network_id):
     """Gets all virtual interfaces for instance."""
@@ -1229,6 +1239,14 @@ def block_device_mapping_get_all_by_instance(context, instance_uuid,
                                                          use_slave)
 
 
+def block_device_mapping_get_all_by_instances(context, instance_uuids,
+                                              use_slave=False):
+    """Get all block device mapping belonging to a list of instances."""
+    return IMPL.block_device_mapping_get_all_by_instances(context,
+                                                          instance_uuids,
+                                                          use_slave)
+
+
 def block_device_mapping_get_by_volume_id(context, volume_id,
         columns_to_join=None):
     """Get block device mapping for a given volume."""
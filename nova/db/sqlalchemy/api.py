@@ -21,6 +21,7 @@ import collections
 import copy
 import datetime
 import functools
+import random
 import sys
 import time
 import uuid
@@ -39,6 +40,7 @@ from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import joinedload_all
 from sqlalchemy.orm import noload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.schema import Table
 from sqlalchemy.sql.expression import asc
 from sqlalchemy.sql.expression import desc
@@ -128,6 +130,10 @@ def get_session(use_slave=False, **kwargs):
 
 _SHADOW_TABLE_PREFIX = 'shadow_'
 _DEFAULT_QUOTA_NAME = 'default'
+# Number of free fixed ips fixed_ip_associate_pool picks one from at random.
+_FIXED_IP_POOL_WINDOW = 16
+# Number of rows fixed_ip_bulk_create inserts per statement.
+_FIXED_IP_BULK_CREATE_CHUNK = 1000
 PER_PROJECT_QUOTAS = ['fixed_ips', 'floating_ips', 'networks']
 
 
@@ -1162,33 +1168,43 @@ def fixed_ip_associate_pool(context, network_id, instance_uuid=None,
     if instance_uuid and not uuidutils.is_uuid_like(instance_uuid):
         raise exception.InvalidUUID(uuid=instance_uuid)
 
+    # Rather than locking the first free row, which serializes concurrent
+    # allocations on the network, a random address out of a window of free
+    # ones is claimed with a conditional UPDATE. An UPDATE that matches no
+    # row means another allocation won the race for that address, so the
+    # next one is tried.
     session = get_session()
-    with session.begin():
-        network_or_none = or_(models.FixedIp.network_id == network_id,
-                              models.FixedIp.network_id == null())
-        fixed_ip_ref = model_query(context, models.FixedIp, session=session,
-                                   read_deleted="no").\
-                               filter(network_or_none).\
-                               filter_by(reserved=False).\
-                               filter_by(instance_uuid=None).\
-                               filter_by(host=None).\
-                               with_lockmode('update').\
-                               first()
-        # NOTE(vish): if with_lockmode isn't supported, as in sqlite,
-        #             then this has concurrency issues
-        if not fixed_ip_ref:
-            raise exception.NoMoreFixedIps()
-
-        if fixed_ip_ref['network_id'] is None:
-            fixed_ip_ref['network'] = network_id
-
-        if instance_uuid:
-            fixed_ip_ref['instance_uuid'] = instance_uuid
+    network_or_none = or_(models.FixedIp.network_id == network_id,
+                          models.FixedIp.network_id == null())
+
+    def _free_ips():
+        return model_query(context, models.FixedIp, session=session,
+                           read_deleted="no").\
+                       filter(network_or_none).\
+                       filter_by(reserved=False).\
+                       filter_by(instance_uuid=None).\
+                       filter_by(host=None)
+
+    values = {'network_id': network_id, 'updated_at': timeutils.utcnow()}
+    if instance_uuid:
+        values['instance_uuid'] = instance_uuid
+    if host:
+        values['host'] = host
 
-        if host:
-            fixed_ip_ref['host'] = host
-        session.add(fixed_ip_ref)
-    return fixed_ip_ref
+    while True:
+        candidates = _free_ips().limit(_FIXED_IP_POOL_WINDOW).all()
+        if not candidates:
+            raise exception.NoMoreFixedIps()
+        random.shuffle(candidates)
+        for fixed_ip_ref in candidates:
+            with session.begin():
+                claimed = _free_ips().filter_by(id=fixed_ip_ref['id']).\
+                                      update(values,
+                                             synchronize_session=False)
+            if claimed:
+                for key, value in values.iteritems():
+                    set_committed_value(fixed_ip_ref, key, value)
+                return fixed_ip_ref
 
 
 @require_context
@@ -1202,21 +1218,55 @@ def fixed_ip_create(context, values):
     return fixed_ip_ref
 
 
+def _fixed_ip_bulk_create_chunks(ips):
+    """Split ips into lists of rows to insert with one statement each.
+
+    Rows are inserted with executemany, which needs every row of a
+    statement to set the same columns.
+    """
+    chunk = []
+    keys = None
+    for ip in ips:
+        ip_keys = sorted(ip)
+        if chunk and (ip_keys != keys or
+                      len(chunk) >= _FIXED_IP_BULK_CREATE_CHUNK):
+            yield chunk
+            chunk = []
+        keys = ip_keys
+        chunk.append(ip)
+    if chunk:
+        yield chunk
+
+
 @require_context
 def fixed_ip_bulk_create(context, ips):
+    # ips may be any iterable. It is read one chunk at a time, and all the
+    # chunks are inserted in a single transaction.
+    table = models.FixedIp.__table__
+    seen = set()
     session = get_session()
-    with session.begin():
-        for ip in ips:
-            model = models.FixedIp()
-            model.update(ip)
-            try:
-                # NOTE (vsergeyev): To get existing address we have to do each
-                #                   time session.flush().
-                #                   See related note at line 697.
-                session.add(model)
-                session.flush()
-            except db_exc.DBDuplicateEntry:
-                raise exception.FixedIpExists(address=ip['address'])
+    chunk = []
+    try:
+        with session.begin():
+            for chunk in _fixed_ip_bulk_create_chunks(ips):
+                for ip in chunk:
+                    if ip['address'] in seen:
+                        raise exception.FixedIpExists(address=ip['address'])
+                    seen.add(ip['address'])
+                session.execute(table.insert(), chunk)
+    except db_exc.DBDuplicateEntry:
+        address = _fixed_ip_get_existing_address(
+            context, [ip['address'] for ip in chunk])
+        raise exception.FixedIpExists(address=address)
+
+
+def _fixed_ip_get_existing_address(context, addresses):
+    """Return one of addresses that is already in use, for error reports."""
+    row = model_query(context, models.FixedIp.address,
+                      base_model=models.FixedIp, read_deleted="no").\
+                filter(models.FixedIp.address.in_(addresses)).\
+                first()
+    return row.address if row else addresses[0]
 
 
 @require_context
@@ -1519,6 +1569,23 @@ def virtual_interface_get_by_instance(context, instance_uuid, use_slave=False):
     return vif_refs
 
 
+@require_context
+def virtual_interface_get_by_instances(context, instance_uuids,
+                                       use_slave=False):
+    """Gets all virtual interfaces for a list of instances.
+
+    :param instance_uuids: = uuids of the instances to retrieve vifs for
+    """
+    if not instance_uuids:
+        return []
+    vif_refs = _virtual_interface_query(context, use_slave=use_slave).\
+                       filter(models.VirtualInterface.instance_uuid.in_(
+                           instance_uuids)).\
+                       order_by(asc("created_at"), asc("id")).\
+                       all()
+    return vif_refs
+
+
 @require_context
 def virtual_interface_get_by_instance_and_network(context, instance_uuid,
                                                   network_id):
@@ -3577,6 +3644,17 @@ def block_device_mapping_get_all_by_instance(context, instance_uuid,
                  all()
 
 
+@require_context
+def block_device_mapping_get_all_by_instances(context, instance_uuids,
+                                              use_slave=False):
+    if not instance_uuids:
+        return []
+    return _block_device_mapping_get_query(context, use_slave=use_slave).\
+                 filter(models.BlockDeviceMapping.instance_uuid.in_(
+                     instance_uuids)).\
+                 all()
+
+
 @require_context
 def block_device_mapping_get_by_volume_id(context, volume_id,
         columns_to_join=None):
@@ -0,0 +1,117 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Store of the rendered metadata documents of instances.
+
+A document holds everything the metadata API collects about an instance
+from the database and conductor, serialized to JSON.  It is stored under
+the uuid of the instance only; each fixed IP address of the instance
+points to that uuid, and a document is only served for an address it
+still lists, so an address which moved to another instance never gets
+the document of the previous one.  The services changing an instance, its
+network information, block device mappings or security groups drop its
+document; they only reach the metadata API when memcached_servers is
+shared with it.
+"""
+
+from oslo.config import cfg
+
+from nova import cache_utils
+from nova.openstack.common import jsonutils
+
+MC = None
+
+metadata_document_opts = [
+    cfg.IntOpt('metadata_document_expiration',
+               default=15,
+               help='Number of seconds the metadata document of an instance '
+                    'is kept. Documents are also dropped when the instance '
+                    'changes, but only by the services sharing '
+                    'memcached_servers with the metadata API; changes made '
+                    'elsewhere are only seen once the document expired.'),
+    cfg.BoolOpt('precompute_metadata_documents',
+                default=False,
+                help='Render the metadata document of a new instance on its '
+                     'compute host as soon as it becomes active, instead of '
+                     'on its first metadata request. Vendor data is then '
+                     'read on the compute host. Requires memcached_servers '
+                     'shared with the metadata API.'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(metadata_document_opts)
+
+
+def _get_cache():
+    global MC
+
+    if MC is None:
+        MC = cache_utils.get_client()
+
+    return MC
+
+
+def reset_cache():
+    """Reset the cache, mainly for testing purposes."""
+
+    global MC
+
+    MC = None
+
+
+def _make_cache_key(instance_uuid):
+    return "metadata-document-%s" % instance_uuid.encode('utf-8')
+
+
+def _make_address_cache_key(address):
+    return "metadata-address-%s" % address.encode('utf-8')
+
+
+def get_document(instance_uuid):
+    """Return the document of an instance."""
+    document = _get_cache().get(_make_cache_key(instance_uuid))
+    if document is None:
+        return None
+    return jsonutils.loads(document)
+
+
+def get_document_by_address(address):
+    """Return the document of the instance owning a fixed IP address."""
+    instance_uuid = _get_cache().get(_make_address_cache_key(address))
+    if instance_uuid is None:
+        return None
+    document = get_document(instance_uuid)
+    # The pointer outlives the document it was stored with, check that
+    # the address was not given to another instance since.
+    if document is None or address not in document['addresses']:
+        return None
+    return document
+
+
+def store_document(instance_uuid, addresses, document):
+    """Store the document of an instance and point its addresses to it."""
+    addresses = list(addresses)
+    cache = _get_cache()
+    cache.set(_make_cache_key(instance_uuid),
+              jsonutils.dumps(dict(document, addresses=addresses)),
+              CONF.metadata_document_expiration)
+    for address in addresses:
+        cache.set(_make_address_cache_key(address), instance_uuid,
+                  CONF.metadata_document_expiration)
+
+
+def invalidate_document(instance_uuid):
+    """Drop the document of an instance after it changed."""
+    _get_cache().delete(_make_cache_key(instance_uuid))
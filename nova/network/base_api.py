@@ -232,6 +232,16 @@ class NetworkAPI(base.Base):
         """Returns all network info related to an instance."""
         raise NotImplementedError()
 
+    def get_instances_nw_info(self, context, instances):
+        """Returns the network info of several instances, keyed by uuid.
+
+        Unlike get_instance_nw_info(), this does not update the info
+        caches of the instances.
+        """
+        return dict((instance['uuid'],
+                     self._get_instance_nw_info(context, instance))
+                    for instance in instances)
+
     def validate_networks(self, context, requested_networks, num_instances):
         """validate the networks passed at the time of creating
         the server.
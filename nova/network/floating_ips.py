@@ -77,6 +77,9 @@ class FloatingIP(object):
         except exception.NotFound:
             return
 
+        # Collect everything first so the driver can set up the forwarding
+        # rules and addresses of each interface in one go.
+        by_interface = {}
         for floating_ip in floating_ips:
             if floating_ip.fixed_ip_id:
                 try:
@@ -86,14 +89,16 @@ class FloatingIP(object):
                     LOG.debug(msg)
                     continue
                 interface = CONF.public_interface or floating_ip.interface
-                try:
-                    self.l3driver.add_floating_ip(floating_ip.address,
-                                                  fixed_ip.address,
-                                                  interface,
-                                                  fixed_ip.network)
-                except processutils.ProcessExecutionError:
-                    LOG.debug('Interface %s not found', interface)
-                    raise exception.NoFloatingIpInterface(interface=interface)
+                by_interface.setdefault(interface, []).append(
+                    (floating_ip.address, fixed_ip.address, interface,
+                     fixed_ip.network))
+
+        for interface, to_add in by_interface.iteritems():
+            try:
+                self.l3driver.add_floating_ips(to_add)
+            except processutils.ProcessExecutionError:
+                LOG.debug('Interface %s not found', interface)
+                raise exception.NoFloatingIpInterface(interface=interface)
 
     def allocate_for_instance(self, context, **kwargs):
         """Handles allocating the floating IP resources for an instance.
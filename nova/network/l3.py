@@ -55,6 +55,18 @@ class L3Driver(object):
         """
         raise NotImplementedError()
 
+    def add_floating_ips(self, floating_ips):
+        """Add a batch of floating IPs.
+
+           floating_ips is a list of (floating_ip, fixed_ip,
+           l3_interface_id, network) tuples, the arguments of
+           add_floating_ip().  Drivers that can apply them at once should
+           override this.
+        """
+        for floating_ip, fixed_ip, l3_interface_id, network in floating_ips:
+            self.add_floating_ip(floating_ip, fixed_ip, l3_interface_id,
+                                 network)
+
     def remove_floating_ip(self, floating_ip, fixed_ip, l3_interface_id,
                            network=None):
         raise NotImplementedError()
@@ -113,6 +125,14 @@ class LinuxNetL3(L3Driver):
                                           l3_interface_id, network)
         linux_net.bind_floating_ip(floating_ip, l3_interface_id)
 
+    def add_floating_ips(self, floating_ips):
+        linux_net.ensure_floating_forwards(floating_ips)
+        by_interface = {}
+        for floating_ip, _fixed_ip, l3_interface_id, _network in floating_ips:
+            by_interface.setdefault(l3_interface_id, []).append(floating_ip)
+        for l3_interface_id, addresses in by_interface.iteritems():
+            linux_net.bind_floating_ips(addresses, l3_interface_id)
+
     def remove_floating_ip(self, floating_ip, fixed_ip, l3_interface_id,
                            network=None):
         linux_net.unbind_floating_ip(floating_ip, l3_interface_id)
@@ -18,10 +18,14 @@
 """Implements vlans, bridges, and iptables rules using linux utilities."""
 
 import calendar
+import hashlib
 import inspect
+import itertools
 import os
 import re
+import time
 
+from eventlet import greenthread
 import netaddr
 from oslo.config import cfg
 import six
@@ -80,6 +84,12 @@ linux_net_opts = [
     cfg.StrOpt('dnsmasq_config_file',
                default='',
                help='Override the default dnsmasq settings with this file'),
+    cfg.FloatOpt('dnsmasq_reload_delay',
+                 default=0.0,
+                 help='Number of seconds a running dnsmasq is given to '
+                      'reload its host files after they change. Changes '
+                      'made within this window are picked up by a single '
+                      'reload. 0 reloads dnsmasq immediately'),
     cfg.StrOpt('linuxnet_interface_driver',
                default='nova.network.linux_net.LinuxBridgeInterfaceDriver',
                help='Driver used to create ethernet devices.'),
@@ -119,6 +129,13 @@ linux_net_opts = [
                default='DROP',
                help=('The table that iptables to jump to when a packet is '
                      'to be dropped.')),
+    cfg.FloatOpt('iptables_apply_interval',
+                 default=0.0,
+                 help='Minimum number of seconds between two runs of '
+                      'iptables-restore. Rule changes requested within the '
+                      'interval, for example security group refreshes of '
+                      'many instances, are coalesced into a single apply at '
+                      'its end. 0 applies every change immediately.'),
     cfg.IntOpt('ovs_vsctl_timeout',
                default=120,
                help='Amount of time, in seconds, that ovs_vsctl should wait '
@@ -170,6 +187,9 @@ class IptablesRule(object):
     def __ne__(self, other):
         return not self == other
 
+    def __hash__(self):
+        return hash((self.chain, self.rule, self.top, self.wrap))
+
     def __str__(self):
         if self.wrap:
             chain = '%s-%s' % (binary_name, self.chain)
@@ -184,6 +204,9 @@ class IptablesTable(object):
 
     def __init__(self):
         self.rules = []
+        # Mirrors self.rules so membership checks do not have to scan the
+        # list, which made building large tables quadratic.
+        self._rule_set = set()
         self.remove_rules = []
         self.chains = set()
         self.unwrapped_chains = set()
@@ -222,36 +245,70 @@ class IptablesTable(object):
 
         If the chain is not found, this is merely logged.
 
+        """
+        self.bulk_remove_chains([name], wrap=wrap)
+
+    def bulk_remove_chains(self, names, wrap=True):
+        """Remove several named chains in a single pass over the rules.
+
+        Behaves like calling remove_chain() for each name, without
+        scanning the whole table once per chain.
+
         """
         if wrap:
             chain_set = self.chains
         else:
             chain_set = self.unwrapped_chains
 
-        if name not in chain_set:
+        names = set(names)
+        for name in names - chain_set:
             LOG.warn(_('Attempted to remove chain %s which does not exist'),
                      name)
+        names &= chain_set
+        if not names:
             return
         self.dirty = True
 
         # non-wrapped chains and rules need to be dealt with specially,
         # so we keep a list of them to be iterated over in apply()
         if not wrap:
-            self.remove_chains.add(name)
-        chain_set.remove(name)
-        if not wrap:
-            self.remove_rules += filter(lambda r: r.chain == name, self.rules)
-        self.rules = filter(lambda r: r.chain != name, self.rules)
+            self.remove_chains.update(names)
+        chain_set.difference_update(names)
 
         if wrap:
-            jump_snippet = '-j %s-%s' % (binary_name, name)
+            targets = set('%s-%s' % (binary_name, name) for name in names)
         else:
-            jump_snippet = '-j %s' % (name,)
+            targets = names
 
-        if not wrap:
-            self.remove_rules += filter(lambda r: jump_snippet in r.rule,
-                                        self.rules)
-        self.rules = filter(lambda r: jump_snippet not in r.rule, self.rules)
+        def _jump_target(rule):
+            head, sep, tail = rule.partition('-j ')
+            if sep:
+                return tail.split(' ', 1)[0]
+
+        self._remove_rules_if(
+            lambda r: r.chain in names or _jump_target(r.rule) in targets,
+            track=not wrap)
+
+    def _remove_rules_if(self, predicate, track=False):
+        """Drop every rule matching predicate in a single pass.
+
+        If track is True the dropped rules are also queued in
+        remove_rules, so that apply() removes them from the live table.
+        Returns the number of rules dropped.
+        """
+        kept = []
+        removed = []
+        for rule in self.rules:
+            if predicate(rule):
+                removed.append(rule)
+            else:
+                kept.append(rule)
+        if removed:
+            self.rules = kept
+            self._rule_set.difference_update(removed)
+            if track:
+                self.remove_rules += removed
+        return len(removed)
 
     def add_rule(self, chain, rule, wrap=True, top=False):
         """Add a rule to the table.
@@ -271,12 +328,13 @@ class IptablesTable(object):
             rule = ' '.join(map(self._wrap_target_chain, rule.split(' ')))
 
         rule_obj = IptablesRule(chain, rule, wrap, top)
-        if rule_obj in self.rules:
+        if rule_obj in self._rule_set:
             LOG.debug("Skipping duplicate iptables rule addition. "
-                      "%(rule)r already in %(rules)r",
-                      {'rule': rule_obj, 'rules': self.rules})
+                      "%(rule)r already in %(chain)r",
+                      {'rule': rule_obj, 'chain': chain})
         else:
-            self.rules.append(IptablesRule(chain, rule, wrap, top))
+            self.rules.append(rule_obj)
+            self._rule_set.add(rule_obj)
             self.dirty = True
 
     def _wrap_target_chain(self, s):
@@ -292,12 +350,14 @@ class IptablesTable(object):
         CLI tool.
 
         """
-        try:
-            self.rules.remove(IptablesRule(chain, rule, wrap, top))
+        rule_obj = IptablesRule(chain, rule, wrap, top)
+        if rule_obj in self._rule_set:
+            self.rules.remove(rule_obj)
+            self._rule_set.discard(rule_obj)
             if not wrap:
-                self.remove_rules.append(IptablesRule(chain, rule, wrap, top))
+                self.remove_rules.append(rule_obj)
             self.dirty = True
-        except ValueError:
+        else:
             LOG.warn(_('Tried to remove rule that was not there:'
                        ' %(chain)r %(rule)r %(wrap)r %(top)r'),
                      {'chain': chain, 'rule': rule,
@@ -307,21 +367,36 @@ class IptablesTable(object):
         """Remove all rules matching regex."""
         if isinstance(regex, six.string_types):
             regex = re.compile(regex)
-        num_rules = len(self.rules)
-        self.rules = filter(lambda r: not regex.match(str(r)), self.rules)
-        removed = num_rules - len(self.rules)
+        removed = self._remove_rules_if(lambda r: regex.match(str(r)))
+        if removed > 0:
+            self.dirty = True
+        return removed
+
+    def remove_address_rules(self, addresses):
+        """Remove all rules referring to any of the given addresses.
+
+        This is the batched counterpart of removing each address with
+        remove_rules_regex: an address matches a whitespace separated
+        argument of the rule either bare or with a /32 suffix.
+        """
+        addresses = set(str(address) for address in addresses)
+
+        def _refers(rule):
+            for arg in str(rule).split()[1:]:
+                if arg.split('/32', 1)[0] in addresses:
+                    return True
+            return False
+
+        removed = self._remove_rules_if(_refers)
         if removed > 0:
             self.dirty = True
         return removed
 
     def empty_chain(self, chain, wrap=True):
         """Remove all rules from a chain."""
-        chained_rules = [rule for rule in self.rules
-                              if rule.chain == chain and rule.wrap == wrap]
-        if chained_rules:
+        if self._remove_rules_if(
+                lambda r: r.chain == chain and r.wrap == wrap):
             self.dirty = True
-        for rule in chained_rules:
-            self.rules.remove(rule)
 
 
 class IptablesManager(object):
@@ -359,6 +434,8 @@ class IptablesManager(object):
         self.ipv6 = {'filter': IptablesTable()}
 
         self.iptables_apply_deferred = False
+        self._apply_pending = False
+        self._last_apply = 0
 
         # Add a nova-filter-top chain. It's intended to be shared
         # among the various nova components. It sits at the very top
@@ -430,10 +507,36 @@ class IptablesManager(object):
     def apply(self):
         if self.iptables_apply_deferred:
             return
-        if self.dirty():
-            self._apply()
-        else:
+        if not self.dirty():
             LOG.debug("Skipping apply due to lack of new rules")
+            return
+        if self._apply_pending:
+            LOG.debug("Coalescing apply with the one already scheduled")
+            return
+        delay = self._last_apply + CONF.iptables_apply_interval - time.time()
+        if delay > 0:
+            LOG.debug("Scheduling apply in %.2f seconds", delay)
+            self._apply_pending = True
+            greenthread.spawn_after(delay, self._scheduled_apply)
+        else:
+            self._apply()
+
+    def _scheduled_apply(self):
+        self._apply_pending = False
+        try:
+            self.apply()
+        except Exception:
+            # Nobody waits on a scheduled apply, so retry it after the
+            # interval rather than leave the rules out of date until the
+            # next change.
+            LOG.exception(_('Scheduled iptables apply failed, retrying in '
+                            '%.2f seconds'), CONF.iptables_apply_interval)
+            for tables in (self.ipv4, self.ipv6):
+                for table in tables.itervalues():
+                    table.dirty = True
+            self._apply_pending = True
+            greenthread.spawn_after(CONF.iptables_apply_interval,
+                                    self._scheduled_apply)
 
     @utils.synchronized('iptables', external=True)
     def _apply(self):
@@ -461,6 +564,7 @@ class IptablesManager(object):
             self.execute('%s-restore' % (cmd,), '-c', run_as_root=True,
                          process_input='\n'.join(all_lines),
                          attempts=5)
+        self._last_apply = time.time()
         LOG.debug("IPTablesManager.apply completed with success")
 
     def _find_table(self, lines, table_name):
@@ -497,19 +601,17 @@ class IptablesManager(object):
 
         if CONF.iptables_top_regex:
             regex = re.compile(CONF.iptables_top_regex)
-            temp_filter = filter(lambda line: regex.search(line), new_filter)
-            for rule_str in temp_filter:
-                new_filter = filter(lambda s: s.strip() != rule_str.strip(),
-                                    new_filter)
-            top_rules = temp_filter
+            top_rules = filter(lambda line: regex.search(line), new_filter)
+            matched = set(line.strip() for line in top_rules)
+            new_filter = filter(lambda s: s.strip() not in matched,
+                                new_filter)
 
         if CONF.iptables_bottom_regex:
             regex = re.compile(CONF.iptables_bottom_regex)
-            temp_filter = filter(lambda line: regex.search(line), new_filter)
-            for rule_str in temp_filter:
-                new_filter = filter(lambda s: s.strip() != rule_str.strip(),
-                    new_filter)
-            bottom_rules = temp_filter
+            bottom_rules = filter(lambda line: regex.search(line), new_filter)
+            matched = set(line.strip() for line in bottom_rules)
+            new_filter = filter(lambda s: s.strip() not in matched,
+                                new_filter)
 
         seen_chains = False
         rules_index = 0
@@ -574,6 +676,14 @@ class IptablesManager(object):
         new_filter[commit_index:commit_index] = bottom_rules
         seen_lines = set()
 
+        # Index the pending removals by the text they will match, so each
+        # line is checked in constant time rather than against every one.
+        remove_rule_strs = {}
+        for rule in remove_rules:
+            # ignore [packet:byte] counts at beginning of rules
+            rule_str = str(rule).split(' ', 1)[1].strip()
+            remove_rule_strs[rule_str] = remove_rule_strs.get(rule_str, 0) + 1
+
         def _weed_out_duplicates(line):
             # ignore [packet:byte] counts at beginning of lines
             if line.startswith('['):
@@ -593,23 +703,17 @@ class IptablesManager(object):
                 line = line.split(':')[1]
                 line = line.split('- [')[0]
                 line = line.strip()
-                for chain in remove_chains:
-                    if chain == line:
-                        remove_chains.remove(chain)
-                        return False
+                if line in remove_chains:
+                    remove_chains.remove(line)
+                    return False
             elif line.startswith('['):
                 # it's a rule
                 # ignore [packet:byte] counts at beginning of lines
                 line = line.split(']', 1)[1]
                 line = line.strip()
-                for rule in remove_rules:
-                    # ignore [packet:byte] counts at beginning of rules
-                    rule_str = str(rule)
-                    rule_str = rule_str.split(' ', 1)[1]
-                    rule_str = rule_str.strip()
-                    if rule_str == line:
-                        remove_rules.remove(rule)
-                        return False
+                if remove_rule_strs.get(line):
+                    remove_rule_strs[line] -= 1
+                    return False
 
             # Leave it alone
             return True
@@ -624,12 +728,87 @@ class IptablesManager(object):
 
         # flush lists, just in case we didn't find something
         remove_chains.clear()
-        for rule in remove_rules:
-            remove_rules.remove(rule)
+        del remove_rules[:]
 
         return new_filter
 
 
+class IpsetManager(object):
+    """Wrapper for ipset.
+
+    Keeps a copy of the members of every set it manages so that changes
+    are applied as a single ``ipset restore`` containing only the
+    entries which were actually added or removed.
+    """
+
+    def __init__(self, execute=None):
+        if not execute:
+            self.execute = _execute
+        else:
+            self.execute = execute
+
+        self.sets = {}
+        # Sets which could not be destroyed yet, usually because a rule
+        # still referring to them has not been removed from iptables.
+        self.stale_sets = set()
+
+    def has_set(self, name):
+        return name in self.sets
+
+    @utils.synchronized('ipset', external=False)
+    def set_members(self, name, members, family='inet'):
+        """Make the set called name contain exactly members.
+
+        The set is created if it is not known yet.  Returns True if
+        anything had to be changed.
+        """
+        members = set(members)
+        current = self.sets.get(name)
+        commands = []
+        if current is None:
+            # NOTE: the set may survive a nova-compute restart, so flush
+            # whatever the kernel still holds before repopulating it.
+            commands.append('create %s hash:ip family %s' % (name, family))
+            commands.append('flush %s' % name)
+            current = set()
+        added = members - current
+        removed = current - members
+        commands.extend('add %s %s' % (name, ip) for ip in sorted(added))
+        commands.extend('del %s %s' % (name, ip) for ip in sorted(removed))
+        if not (added or removed) and name in self.sets:
+            return False
+
+        self.execute('ipset', '-exist', 'restore',
+                     process_input='\n'.join(commands) + '\n',
+                     run_as_root=True, attempts=5)
+        self.sets[name] = members
+        self.stale_sets.discard(name)
+        LOG.debug('ipset %(name)s updated: %(added)d added, '
+                  '%(removed)d removed',
+                  {'name': name, 'added': len(added),
+                   'removed': len(removed)})
+        return True
+
+    @utils.synchronized('ipset', external=False)
+    def destroy_set(self, name):
+        """Destroy the set called name.
+
+        The kernel refuses to destroy a set which is still referenced by
+        an iptables rule, e.g. while an iptables apply is deferred, so
+        such sets are retried on the next call.
+        """
+        self.sets.pop(name, None)
+        self.stale_sets.add(name)
+        for stale in sorted(self.stale_sets):
+            try:
+                self.execute('ipset', 'destroy', stale, run_as_root=True)
+            except processutils.ProcessExecutionError as exc:
+                LOG.debug('Unable to destroy ipset %(name)s yet: %(exc)s',
+                          {'name': stale, 'exc': exc})
+            else:
+                self.stale_sets.discard(stale)
+
+
 # NOTE(jkoelker) This is just a nice little stub point since mocking
 #                builtins with mox is a nightmare
 def write_to_file(file, data, mode='w'):
@@ -729,6 +908,26 @@ def bind_floating_ip(floating_ip, device):
         send_arp_for_ip(floating_ip, device, CONF.send_arp_for_ha_count)
 
 
+def bind_floating_ips(floating_ips, device):
+    """Bind a batch of ips to public interface with a single ip call."""
+    if not floating_ips:
+        return
+    cmds = ''.join('addr add %s/32 dev %s\n' % (floating_ip, device)
+                   for floating_ip in floating_ips)
+    # -force keeps going past addresses that are already bound, the exit
+    # code then only says that some command failed.
+    out, err = _execute('ip', '-force', '-batch', '-',
+                        process_input=cmds,
+                        run_as_root=True, check_exit_code=[0, 1, 2, 254])
+    if err and 'Cannot find device' in err:
+        raise processutils.ProcessExecutionError(
+            stdout=out, stderr=err, cmd='ip -force -batch -')
+
+    if CONF.send_arp_for_ha and CONF.send_arp_for_ha_count > 0:
+        for floating_ip in floating_ips:
+            send_arp_for_ip(floating_ip, device, CONF.send_arp_for_ha_count)
+
+
 def unbind_floating_ip(floating_ip, device):
     """Unbind a public ip from public interface."""
     _execute('ip', 'addr', 'del', str(floating_ip) + '/32',
@@ -775,6 +974,30 @@ def ensure_floating_forward(floating_ip, fixed_ip, device, network):
         ensure_ebtables_rules(*floating_ebtables_rules(fixed_ip, network))
 
 
+def ensure_floating_forwards(forwards):
+    """Ensure forwarding rules for a batch of floating ips.
+
+    :param forwards: list of (floating_ip, fixed_ip, device, network)
+                     tuples, as passed to ensure_floating_forward()
+    """
+    if not forwards:
+        return
+    table = iptables_manager.ipv4['nat']
+    num_rules = table.remove_address_rules(
+        [floating_ip for floating_ip, _fixed, _dev, _net in forwards])
+    if num_rules:
+        LOG.warn(_('Removed %(num)d duplicate rules for %(count)d floating '
+                   'ips'), {'num': num_rules, 'count': len(forwards)})
+    for floating_ip, fixed_ip, device, network in forwards:
+        for chain, rule in floating_forward_rules(floating_ip, fixed_ip,
+                                                  device):
+            table.add_rule(chain, rule)
+    iptables_manager.apply()
+    for floating_ip, fixed_ip, device, network in forwards:
+        if device != network['bridge']:
+            ensure_ebtables_rules(*floating_ebtables_rules(fixed_ip, network))
+
+
 def remove_floating_forward(floating_ip, fixed_ip, device, network):
     """Remove forwarding for floating ip."""
     for chain, rule in floating_forward_rules(floating_ip, fixed_ip, device):
@@ -976,12 +1199,11 @@ def get_dhcp_opts(context, network_ref):
     if fixedips:
         instance_set = set([fixedip.instance_uuid for fixedip in fixedips])
         default_gw_vif = {}
-        for instance_uuid in instance_set:
-            vifs = objects.VirtualInterfaceList.get_by_instance_uuid(
-                    context, instance_uuid)
-            if vifs:
-                #offer a default gateway to the first virtual interface
-                default_gw_vif[instance_uuid] = vifs[0].id
+        vifs = objects.VirtualInterfaceList.get_by_instance_uuids(
+                context, list(instance_set))
+        for vif in vifs:
+            #offer a default gateway to the first virtual interface
+            default_gw_vif.setdefault(vif.instance_uuid, vif.id)
 
         for fixedip in fixedips:
             if fixedip.allocated:
@@ -998,16 +1220,27 @@ def release_dhcp(dev, address, mac_address):
     utils.execute('dhcp_release', dev, address, mac_address, run_as_root=True)
 
 
-def update_dhcp(context, dev, network_ref):
+def update_dhcp(context, dev, network_ref, address=None):
+    """Write the dhcp-host file of a network and make dnsmasq reload it.
+
+    With address, only the entry of that fixed IP is read from the
+    database. Otherwise, or if nothing was loaded for the device yet, the
+    entries of every fixed IP of the network are regenerated.
+    """
+    hosts = _dhcp_hosts.get(dev)
+    if address is None or hosts is None:
+        hosts = _dhcp_hosts[dev] = _load_dhcp_hosts(context, network_ref)
+    else:
+        _update_dhcp_host(context, network_ref, hosts, address)
     conffile = _dhcp_file(dev, 'conf')
-    write_to_file(conffile, get_dhcp_hosts(context, network_ref))
-    restart_dhcp(context, dev, network_ref)
+    changed = _update_dhcp_file(conffile, _render_dhcp_hosts(hosts))
+    restart_dhcp(context, dev, network_ref, reload=changed)
 
 
 def update_dns(context, dev, network_ref):
     hostsfile = _dhcp_file(dev, 'hosts')
-    write_to_file(hostsfile, get_dns_hosts(context, network_ref))
-    restart_dhcp(context, dev, network_ref)
+    changed = _update_dhcp_file(hostsfile, get_dns_hosts(context, network_ref))
+    restart_dhcp(context, dev, network_ref, reload=changed)
 
 
 def update_dhcp_hostfile_with_text(dev, hosts_text):
@@ -1015,6 +1248,141 @@ def update_dhcp_hostfile_with_text(dev, hosts_text):
     write_to_file(conffile, hosts_text)
 
 
+# The dhcp-host entries written by update_dhcp(), keyed by device and then
+# by fixed IP address. Each entry is a (sequence, mac address, line) tuple,
+# the sequence keeps the lines in the order they were added.
+_dhcp_hosts = {}
+_dhcp_host_sequence = itertools.count()
+
+
+def _dhcp_host_entry(fixedip):
+    return (next(_dhcp_host_sequence), fixedip.virtual_interface.address,
+            _host_dhcp(fixedip))
+
+
+def _load_dhcp_hosts(context, network_ref):
+    """Read the dhcp-host entries of every fixed IP of a network."""
+    host = None
+    if network_ref['multi_host']:
+        host = CONF.host
+    hosts = {}
+    for fixedip in objects.FixedIPList.get_by_network(context,
+                                                      network_ref,
+                                                      host=host):
+        if fixedip.allocated:
+            hosts[str(fixedip.address)] = _dhcp_host_entry(fixedip)
+    return hosts
+
+
+def _update_dhcp_host(context, network_ref, hosts, address):
+    """Bring the dhcp-host entry of a single fixed IP up to date.
+
+    The entry is kept under the same conditions get_dhcp_hosts() selects
+    the fixed IPs of a network with.
+    """
+    address = str(address)
+    hosts.pop(address, None)
+    try:
+        fixedip = objects.FixedIP.get_by_address(context, address,
+                                                 expected_attrs=['instance'])
+    except exception.FixedIpNotFoundForAddress:
+        return
+    instance = fixedip.instance
+    if (not fixedip.allocated or
+            fixedip.network_id != network_ref['id'] or
+            fixedip.virtual_interface_id is None or
+            instance is None or instance.deleted):
+        return
+    if network_ref['multi_host'] and instance.host != CONF.host:
+        return
+    vif = objects.VirtualInterface.get_by_id(context,
+                                             fixedip.virtual_interface_id)
+    if not vif:
+        return
+    fixedip.virtual_interface = vif
+    hosts[address] = _dhcp_host_entry(fixedip)
+
+
+def _render_dhcp_hosts(hosts):
+    """Return dhcp-host entries in the format of get_dhcp_hosts()."""
+    lines = []
+    macs = set()
+    for _sequence, mac, line in sorted(hosts.values()):
+        if mac not in macs:
+            lines.append(line)
+            macs.add(mac)
+    return '\n'.join(lines)
+
+
+# Size, modification time and digest of the dnsmasq files written by
+# _update_dhcp_file(), keyed by path.
+_dhcp_file_state = {}
+
+# Devices whose dnsmasq has a reload scheduled by _reload_dnsmasq().
+_pending_dnsmasq_reloads = set()
+
+
+def _dhcp_file_stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime
+
+
+def _update_dhcp_file(path, data):
+    """Write data to a dnsmasq file unless the file already holds it.
+
+    Returns True if the file was written. The file is always written if it
+    was changed or removed by anything else since we last wrote it.
+    """
+    digest = hashlib.sha1(six.text_type(data).encode('utf-8')).hexdigest()
+    stat = _dhcp_file_stat(path)
+    if stat is not None and _dhcp_file_state.get(path) == (stat, digest):
+        return False
+    write_to_file(path, data)
+    stat = _dhcp_file_stat(path)
+    if stat is not None:
+        _dhcp_file_state[path] = (stat, digest)
+    else:
+        _dhcp_file_state.pop(path, None)
+    return True
+
+
+def _reload_dnsmasq(dev, pid):
+    """Make a running dnsmasq reload its host files.
+
+    With dnsmasq_reload_delay set, the HUP is deferred and the reloads
+    requested in the meantime for the same device are coalesced into it.
+    """
+    if CONF.dnsmasq_reload_delay <= 0:
+        _execute('kill', '-HUP', pid, run_as_root=True)
+    elif dev not in _pending_dnsmasq_reloads:
+        _pending_dnsmasq_reloads.add(dev)
+        greenthread.spawn_after(CONF.dnsmasq_reload_delay,
+                                _deferred_reload_dnsmasq, dev)
+
+
+@utils.synchronized('dnsmasq_start')
+def _deferred_reload_dnsmasq(dev):
+    _pending_dnsmasq_reloads.discard(dev)
+    # dnsmasq may have been restarted or killed since the reload was
+    # scheduled, so check the pid again before signalling it.
+    pid = _dnsmasq_pid_for(dev)
+    if not pid:
+        return
+    conffile = _dhcp_file(dev, 'conf')
+    out, _err = _execute('cat', '/proc/%d/cmdline' % pid,
+                         check_exit_code=False)
+    if conffile.split('/')[-1] not in out:
+        LOG.debug('Pid %d is stale, skip hupping dnsmasq', pid)
+        return
+    try:
+        _execute('kill', '-HUP', pid, run_as_root=True)
+    except Exception as exc:  # pylint: disable=W0703
+        LOG.error(_('Hupping dnsmasq threw %s'), exc)
+
+
 def kill_dhcp(dev):
     pid = _dnsmasq_pid_for(dev)
     if pid:
@@ -1026,6 +1394,7 @@ def kill_dhcp(dev):
             _execute('kill', '-9', pid, run_as_root=True)
         else:
             LOG.debug('Pid %d is stale, skip killing dnsmasq', pid)
+    _dhcp_hosts.pop(dev, None)
     _remove_dnsmasq_accept_rules(dev)
     _remove_dhcp_mangle_rule(dev)
 
@@ -1034,11 +1403,13 @@ def kill_dhcp(dev):
 #           configuration options (like dchp-range, vlan, ...)
 #           aren't reloaded.
 @utils.synchronized('dnsmasq_start')
-def restart_dhcp(context, dev, network_ref):
+def restart_dhcp(context, dev, network_ref, reload=True):
     """(Re)starts a dnsmasq server for a given network.
 
     If a dnsmasq instance is already running then send a HUP
     signal causing it to reload, otherwise spawn a new instance.
+    The HUP is skipped if reload is False and none of the files
+    written here changed.
 
     """
     conffile = _dhcp_file(dev, 'conf')
@@ -1047,7 +1418,8 @@ def restart_dhcp(context, dev, network_ref):
         # NOTE(vish): this will have serious performance implications if we
         #             are not in multi_host mode.
         optsfile = _dhcp_file(dev, 'opts')
-        write_to_file(optsfile, get_dhcp_opts(context, network_ref))
+        if _update_dhcp_file(optsfile, get_dhcp_opts(context, network_ref)):
+            reload = True
         os.chmod(optsfile, 0o644)
 
     _add_dhcp_mangle_rule(dev)
@@ -1064,8 +1436,10 @@ def restart_dhcp(context, dev, network_ref):
         # Using symlinks can cause problems here so just compare the name
         # of the file itself
         if conffile.split('/')[-1] in out:
+            if not reload:
+                return
             try:
-                _execute('kill', '-HUP', pid, run_as_root=True)
+                _reload_dnsmasq(dev, pid)
                 _add_dnsmasq_accept_rules(dev)
                 return
             except Exception as exc:  # pylint: disable=W0703
@@ -46,6 +46,8 @@ import functools
 import itertools
 import math
 import re
+import socket
+import struct
 import uuid
 
 import eventlet
@@ -162,6 +164,13 @@ CONF.import_opt('share_dhcp_address', 'nova.objects.network')
 CONF.import_opt('network_device_mtu', 'nova.objects.network')
 
 
+def _int_to_ip(value, version):
+    """Format an integer address without building a netaddr object."""
+    if version == 4:
+        return socket.inet_ntoa(struct.pack('!I', value))
+    return str(netaddr.IPAddress(value, version))
+
+
 class RPCAllocateFixedIP(object):
     """Mixin class originally for FlatDCHP and VLAN network managers.
 
@@ -915,10 +924,12 @@ class NetworkManager(manager.Manager):
                         self.instance_dns_manager.delete_entry,
                         instance_id, self.instance_dns_domain))
 
-            self._setup_network_on_host(context, network)
+            fixed_address = fip.address if network['cidr'] else None
+            self._setup_network_on_host(context, network,
+                                        address=fixed_address)
             cleanup.append(functools.partial(
                     self._teardown_network_on_host,
-                    context, network))
+                    context, network, address=fixed_address))
 
             quotas.commit(context)
             LOG.debug('Allocated fixed ip %s on network %s', address,
@@ -999,7 +1010,8 @@ class NetworkManager(manager.Manager):
                 # NOTE(cfb): Call teardown before release_dhcp to ensure
                 #            that the IP can't be re-leased after a release
                 #            packet is sent.
-                self._teardown_network_on_host(context, network)
+                self._teardown_network_on_host(context, network,
+                                               address=address)
                 # NOTE(vish): This forces a packet so that the release_fixed_ip
                 #             callback will get called by nova-dhcpbridge.
                 self.driver.release_dhcp(dev, address, vif.address)
@@ -1015,7 +1027,8 @@ class NetworkManager(manager.Manager):
                     fixed_ip_ref.disassociate()
             else:
                 # We can't try to free the IP address so just call teardown
-                self._teardown_network_on_host(context, network)
+                self._teardown_network_on_host(context, network,
+                                               address=address)
 
         # Commit the reservations
         quotas.commit(context)
@@ -1335,19 +1348,18 @@ class NetworkManager(manager.Manager):
 
         if not fixed_cidr:
             fixed_cidr = netaddr.IPNetwork(network['cidr'])
-        num_ips = len(fixed_cidr)
-        ips = []
-        for index in range(num_ips):
-            address = str(fixed_cidr[index])
-            if (index < bottom_reserved or num_ips - index <= top_reserved or
-                address in extra_reserved):
-                reserved = True
-            else:
-                reserved = False
-
-            ips.append({'network_id': network_id,
-                        'address': address,
-                        'reserved': reserved})
+        extra_reserved = set(netaddr.IPAddress(address).value
+                             for address in extra_reserved)
+        # The addresses are generated from the integer range of the cidr
+        # while they are inserted, so that large networks are not held in
+        # memory. They are all created in one transaction.
+        bottom = fixed_cidr.first + bottom_reserved
+        top = fixed_cidr.last - top_reserved
+        ips = ({'network_id': network_id,
+                'address': _int_to_ip(value, fixed_cidr.version),
+                'reserved': (value < bottom or value > top or
+                             value in extra_reserved)}
+               for value in xrange(fixed_cidr.first, fixed_cidr.last + 1))
         objects.FixedIPList.bulk_create(context, ips)
 
     def _allocate_fixed_ips(self, context, instance_id, host, networks,
@@ -1398,11 +1410,11 @@ class NetworkManager(manager.Manager):
         network = objects.Network.get_by_id(context, network_id)
         call_func(context, network)
 
-    def _setup_network_on_host(self, context, network):
+    def _setup_network_on_host(self, context, network, address=None):
         """Sets up network on this host."""
         raise NotImplementedError()
 
-    def _teardown_network_on_host(self, context, network):
+    def _teardown_network_on_host(self, context, network, address=None):
         """Sets up network on this host."""
         raise NotImplementedError()
 
@@ -1597,7 +1609,7 @@ class FlatManager(NetworkManager):
                                                      instance=instance)
         objects.FixedIP.disassociate_by_address(context, address)
 
-    def _setup_network_on_host(self, context, network):
+    def _setup_network_on_host(self, context, network, address=None):
         """Setup Network on this host."""
         # NOTE(tr3buchet): this does not need to happen on every ip
         # allocation, this functionality makes more sense in create_network
@@ -1605,7 +1617,7 @@ class FlatManager(NetworkManager):
         network.injected = CONF.flat_injected
         network.save()
 
-    def _teardown_network_on_host(self, context, network):
+    def _teardown_network_on_host(self, context, network, address=None):
         """Tear down network on this host."""
         pass
 
@@ -1726,7 +1738,7 @@ class FlatDHCPManager(RPCAllocateFixedIP, floating_ips.FloatingIP,
 
         self.driver.iptables_manager.defer_apply_off()
 
-    def _setup_network_on_host(self, context, network):
+    def _setup_network_on_host(self, context, network, address=None):
         """Sets up network on this host."""
         network['dhcp_server'] = self._get_dhcp_ip(context, network)
 
@@ -1737,20 +1749,20 @@ class FlatDHCPManager(RPCAllocateFixedIP, floating_ips.FloatingIP,
             dev = self.driver.get_dev(network)
             # NOTE(dprince): dhcp DB queries require elevated context
             elevated = context.elevated()
-            self.driver.update_dhcp(elevated, dev, network)
+            self.driver.update_dhcp(elevated, dev, network, address=address)
             if CONF.use_ipv6:
                 self.driver.update_ra(context, dev, network)
                 gateway = utils.get_my_linklocal(dev)
                 network.gateway_v6 = gateway
                 network.save()
 
-    def _teardown_network_on_host(self, context, network):
+    def _teardown_network_on_host(self, context, network, address=None):
         if not CONF.fake_network:
             network['dhcp_server'] = self._get_dhcp_ip(context, network)
             dev = self.driver.get_dev(network)
             # NOTE(dprince): dhcp DB queries require elevated context
             elevated = context.elevated()
-            self.driver.update_dhcp(elevated, dev, network)
+            self.driver.update_dhcp(elevated, dev, network, address=address)
 
     def _get_network_dict(self, network):
         """Returns the dict representing necessary and meta network fields."""
@@ -1858,7 +1870,7 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
                                                    "A",
                                                    self.instance_dns_domain)
 
-        self._setup_network_on_host(context, network)
+        self._setup_network_on_host(context, network, address=address)
         LOG.debug('Allocated fixed ip %s on network %s', address,
                   network['uuid'], instance=instance)
         return address
@@ -1952,14 +1964,14 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
             self, context, vpn=True, **kwargs)
 
     @utils.synchronized('setup_network', external=True)
-    def _setup_network_on_host(self, context, network):
+    def _setup_network_on_host(self, context, network, address=None):
         """Sets up network on this host."""
         if not network.vpn_public_address:
-            address = CONF.vpn_ip
-            network.vpn_public_address = address
+            vpn_address = CONF.vpn_ip
+            network.vpn_public_address = vpn_address
             network.save()
         else:
-            address = network.vpn_public_address
+            vpn_address = network.vpn_public_address
         network.dhcp_server = self._get_dhcp_ip(context, network)
 
         self.l3driver.initialize_network(network.get('cidr'))
@@ -1967,7 +1979,7 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
 
         # NOTE(vish): only ensure this forward if the address hasn't been set
         #             manually.
-        if address == CONF.vpn_ip and hasattr(self.driver,
+        if vpn_address == CONF.vpn_ip and hasattr(self.driver,
                                                "ensure_vpn_forward"):
             self.l3driver.add_vpn(CONF.vpn_ip,
                     network.vpn_public_port,
@@ -1976,7 +1988,7 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
             dev = self.driver.get_dev(network)
             # NOTE(dprince): dhcp DB queries require elevated context
             elevated = context.elevated()
-            self.driver.update_dhcp(elevated, dev, network)
+            self.driver.update_dhcp(elevated, dev, network, address=address)
             if CONF.use_ipv6:
                 self.driver.update_ra(context, dev, network)
                 gateway = utils.get_my_linklocal(dev)
@@ -1984,13 +1996,13 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
                 network.save()
 
     @utils.synchronized('setup_network', external=True)
-    def _teardown_network_on_host(self, context, network):
+    def _teardown_network_on_host(self, context, network, address=None):
         if not CONF.fake_network:
             network['dhcp_server'] = self._get_dhcp_ip(context, network)
             dev = self.driver.get_dev(network)
             # NOTE(dprince): dhcp DB queries require elevated context
             elevated = context.elevated()
-            self.driver.update_dhcp(elevated, dev, network)
+            self.driver.update_dhcp(elevated, dev, network, address=address)
 
             # NOTE(ethuleau): For multi hosted networks, if the network is no
             # more used on this host and if VPN forwarding rule aren't handed
@@ -2010,7 +2022,8 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
                     fip.host = None
                     fip.save()
             else:
-                self.driver.update_dhcp(elevated, dev, network)
+                self.driver.update_dhcp(elevated, dev, network,
+                                        address=address)
 
     def _get_network_dict(self, network):
         """Returns the dict representing necessary and meta network fields."""
@@ -366,25 +366,67 @@ def get_netmask(ip, subnet):
 
 
 class NetworkInfo(list):
-    """Stores and manipulates network information for a Nova instance."""
+    """Stores and manipulates network information for a Nova instance.
+
+    When hydrated from a JSON string the VIF models are only built the
+    first time the list itself is used.  Until then json() hands back the
+    original string and fixed_ips()/floating_ips() are answered from the
+    decoded primitives without hydrating the rest of the model.
+    """
 
     # NetworkInfo is a list of VIFs
 
+    # Serialized form kept until the list is first accessed
+    _raw = None
+    # Decoded form of _raw and the fixed ips found in it
+    _primitive = None
+    _fixed_ips = None
+
+    def _materialize(self):
+        if self._raw is None:
+            return
+        vifs = [VIF.hydrate(vif) for vif in self._decode()]
+        self._raw = self._primitive = self._fixed_ips = None
+        list.extend(self, vifs)
+
+    def _decode(self):
+        if self._primitive is None:
+            self._primitive = jsonutils.loads(self._raw)
+        return self._primitive
+
     def fixed_ips(self):
         """Returns all fixed_ips without floating_ips attached."""
+        if self._raw is not None:
+            if self._fixed_ips is None:
+                self._fixed_ips = [FixedIP.hydrate(ip)
+                                   for vif in self._decode()
+                                   if vif.get('network')
+                                   for subnet in vif['network']['subnets']
+                                   for ip in subnet['ips']]
+            return list(self._fixed_ips)
         return [ip for vif in self for ip in vif.fixed_ips()]
 
     def floating_ips(self):
         """Returns all floating_ips."""
+        if self._raw is not None:
+            return [ip for fixed_ip in self.fixed_ips()
+                    for ip in fixed_ip['floating_ips']]
         return [ip for vif in self for ip in vif.floating_ips()]
 
     @classmethod
     def hydrate(cls, network_info):
         if isinstance(network_info, six.string_types):
-            network_info = jsonutils.loads(network_info)
+            nw_info = cls()
+            nw_info._raw = network_info
+            return nw_info
         return cls([VIF.hydrate(vif) for vif in network_info])
 
+    def __radd__(self, other):
+        return other + list(self)
+
     def json(self):
+        if self._raw is not None:
+            return self._raw
         return jsonutils.dumps(self)
 
     def wait(self, do_raise=True):
@@ -396,6 +438,36 @@ class NetworkInfo(list):
         pass
 
 
+def _materializing(name):
+    fn = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._materialize()
+        # list compares and concatenates using the other list's storage
+        for arg in args:
+            if isinstance(arg, NetworkInfo):
+                arg._materialize()
+        return fn(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+
+# Every list operation has to see the hydrated VIFs, so build them before
+# handing over to the list implementation.
+for _name in ('__add__', '__contains__', '__delitem__', '__delslice__',
+              '__eq__', '__ge__', '__getitem__', '__getslice__', '__gt__',
+              '__iadd__', '__imul__', '__iter__', '__le__', '__len__',
+              '__lt__', '__mul__', '__ne__', '__reduce__', '__reduce_ex__',
+              '__repr__', '__reversed__', '__rmul__', '__setitem__',
+              '__setslice__', '__str__', 'append', 'count', 'extend',
+              'index', 'insert', 'pop', 'remove', 'reverse', 'sort'):
+    if hasattr(list, _name):
+        setattr(NetworkInfo, _name, _materializing(_name))
+del _name
+
+
 class NetworkInfoAsyncWrapper(NetworkInfo):
     """Wrapper around NetworkInfo that allows retrieving NetworkInfo
     in an async manner.
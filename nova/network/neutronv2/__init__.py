@@ -13,12 +13,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+import time
+
+from neutronclient import client as neutron_client
 from neutronclient.common import exceptions
 from neutronclient.v2_0 import client as clientv20
 from oslo.config import cfg
+import requests
 
 from nova.openstack.common import lockutils
 from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
 
 CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
@@ -30,6 +36,28 @@ class AdminTokenStore(object):
 
     def __init__(self):
         self.admin_auth_token = None
+        self.admin_auth_token_expires = None
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+
+class ClientPool(object):
+    """Per process cache of neutron clients keyed by auth scope.
+
+    A client handed out from the pool keeps its token, its endpoint and
+    its HTTP connections between calls. When the pool is full the least
+    recently used client is dropped.
+    """
+
+    _instance = None
+
+    def __init__(self):
+        self._clients = {}
+        self._last_used = {}
 
     @classmethod
     def get(cls):
@@ -37,8 +65,106 @@ class AdminTokenStore(object):
             cls._instance = cls()
         return cls._instance
 
+    def get_client(self, key):
+        client = self._clients.get(key)
+        if client is not None:
+            self._last_used[key] = time.time()
+        return client
+
+    def put_client(self, key, client):
+        if (key not in self._clients and
+                len(self._clients) >= CONF.neutron.client_pool_size):
+            oldest = min(self._last_used, key=self._last_used.get)
+            _close(self._clients.pop(oldest))
+            del self._last_used[oldest]
+        self._clients[key] = client
+        self._last_used[key] = time.time()
+
+    def clear(self):
+        for client in self._clients.values():
+            _close(client)
+        self._clients.clear()
+        self._last_used.clear()
+
+
+class _KeepAliveHTTPClient(neutron_client.HTTPClient):
+    """HTTPClient sending all its requests through one requests session.
+
+    The session keeps the connections to neutron and keystone open, so
+    the calls made by a pooled client do not each pay for a new TCP (and
+    TLS) handshake.
+    """
+
+    def __init__(self, **kwargs):
+        super(_KeepAliveHTTPClient, self).__init__(**kwargs)
+        self.session = requests.Session()
+
+    def _request(self, url, method, body=None, headers=None, **kwargs):
+        headers = headers or {}
+        headers['User-Agent'] = self.USER_AGENT
+        resp = self.session.request(method, url, data=body, headers=headers,
+                                    verify=self.verify_cert,
+                                    timeout=self.timeout, **kwargs)
+        return resp, resp.text
+
+
+def _close(client):
+    client = getattr(client, 'base_client', client)
+    session = getattr(getattr(client, 'httpclient', None), 'session', None)
+    if session is not None:
+        session.close()
+
 
-def _get_client(token=None, admin=False):
+_CALL_STATS = {}
+
+
+def get_call_stats():
+    """Return the number, failures and total latency of neutron calls.
+
+    The result maps each HTTP method to a dict with the 'count',
+    'errors' and 'time' (in seconds) of the requests made by this
+    process so far.
+    """
+    return dict((method, dict(stats))
+                for method, stats in _CALL_STATS.iteritems())
+
+
+def reset_call_stats():
+    _CALL_STATS.clear()
+
+
+def _record_call(method, elapsed, failed):
+    stats = _CALL_STATS.setdefault(method,
+                                   {'count': 0, 'errors': 0, 'time': 0.0})
+    stats['count'] += 1
+    stats['time'] += elapsed
+    if failed:
+        stats['errors'] += 1
+
+
+def _timed_request(do_request, url, method, **kwargs):
+    """Wrapper of HTTPClient.do_request recording call metrics."""
+    start = time.time()
+    failed = True
+    try:
+        resp, body = do_request(url, method, **kwargs)
+        failed = resp.status_code >= 400
+    finally:
+        _record_call(method, time.time() - start, failed)
+    return resp, body
+
+
+def _instrument(client):
+    # The client may not be fully initialized when its constructor is
+    # stubbed out.
+    httpclient = getattr(client, 'httpclient', None)
+    if httpclient is not None:
+        httpclient.do_request = functools.partial(_timed_request,
+                                                  httpclient.do_request)
+    return client
+
+
+def _get_client(token=None, admin=False, keep_alive=False):
     params = {
         'endpoint_url': CONF.neutron.url,
         'timeout': CONF.neutron.url_timeout,
@@ -56,7 +182,10 @@ def _get_client(token=None, admin=False):
             params['tenant_name'] = CONF.neutron.admin_tenant_name
         params['password'] = CONF.neutron.admin_password
         params['auth_url'] = CONF.neutron.admin_auth_url
-    return clientv20.Client(**params)
+    client = clientv20.Client(**params)
+    if keep_alive:
+        client.httpclient = _KeepAliveHTTPClient(**params)
+    return _instrument(client)
 
 
 class ClientWrapper(clientv20.Client):
@@ -80,32 +209,80 @@ class ClientWrapper(clientv20.Client):
         def wrapper(*args, **kwargs):
             ret = obj(*args, **kwargs)
             new_token = self.base_client.get_auth_info()['auth_token']
-            _update_token(new_token)
+            _update_token(new_token, _token_expires(self.base_client,
+                                                    new_token))
             return ret
         return wrapper
 
 
-def _update_token(new_token):
+def _token_expires(client, token):
+    """Return the expiry time of token if the client authenticated it."""
+    auth_ref = getattr(getattr(client, 'httpclient', None), 'auth_ref', None)
+    if auth_ref is not None and auth_ref.auth_token == token:
+        return auth_ref.expires
+    return None
+
+
+def _expiring(expires):
+    if expires is None:
+        return False
+    return timeutils.is_soon(expires, CONF.neutron.admin_token_expiry_margin)
+
+
+def _update_token(new_token, expires=None):
     with lockutils.lock('neutron_admin_auth_token_lock'):
         token_store = AdminTokenStore.get()
+        if token_store.admin_auth_token != new_token or expires is not None:
+            token_store.admin_auth_token_expires = expires
         token_store.admin_auth_token = new_token
 
 
+def _get_admin_token():
+    with lockutils.lock('neutron_admin_auth_token_lock'):
+        token_store = AdminTokenStore.get()
+        if _expiring(token_store.admin_auth_token_expires):
+            # Let the client authenticate again rather than have the
+            # token rejected part way through an operation.
+            return None
+        return token_store.admin_auth_token
+
+
+def _get_pooled_client(token=None, admin=False):
+    pool = ClientPool.get()
+    key = (CONF.neutron.url, 'admin' if admin else token)
+    client = pool.get_client(key)
+    if client is None:
+        if admin:
+            client = ClientWrapper(_get_client(_get_admin_token(),
+                                               admin=True, keep_alive=True))
+        else:
+            client = _get_client(token=token, keep_alive=True)
+        pool.put_client(key, client)
+    elif admin:
+        httpclient = client.base_client.httpclient
+        if _expiring(_token_expires(client.base_client,
+                                    httpclient.auth_token)):
+            httpclient.auth_token = None
+    return client
+
+
 def get_client(context, admin=False):
+    pooled = CONF.neutron.client_pool_size > 0
     # NOTE(dprince): In the case where no auth_token is present
     # we allow use of neutron admin tenant credentials if
     # it is an admin context.
     # This is to support some services (metadata API) where
     # an admin context is used without an auth token.
     if admin or (context.is_admin and not context.auth_token):
-        with lockutils.lock('neutron_admin_auth_token_lock'):
-            orig_token = AdminTokenStore.get().admin_auth_token
-        client = _get_client(orig_token, admin=True)
-        return ClientWrapper(client)
+        if pooled:
+            return _get_pooled_client(admin=True)
+        return ClientWrapper(_get_client(_get_admin_token(), admin=True))
 
     # We got a user token that we can use that as-is
     if context.auth_token:
         token = context.auth_token
+        if pooled:
+            return _get_pooled_client(token=token)
         return _get_client(token=token)
 
     # We did not get a user token and we should not be using
@@ -104,6 +104,21 @@ neutron_opts = [
                      'neutron client requests.',
                deprecated_group='DEFAULT',
                deprecated_name='neutron_ca_certificates_file'),
+    cfg.IntOpt('subnet_cache_ttl',
+               default=0,
+               help='Number of seconds subnets and DHCP ports looked up '
+                    'while building instance network info are cached for. '
+                    '0 disables the cache'),
+    cfg.IntOpt('client_pool_size',
+               default=0,
+               help='Number of neutron clients, keyed by auth scope, that '
+                    'are kept per process and reused together with their '
+                    'tokens and keep-alive HTTP connections. 0 disables '
+                    'pooling'),
+    cfg.IntOpt('admin_token_expiry_margin',
+               default=60,
+               help='Number of seconds before its expiry at which a '
+                    'cached neutron admin token is replaced by a new one'),
    ]
 
 CONF = cfg.CONF
@@ -113,6 +128,10 @@ CONF.import_opt('default_floating_pool', 'nova.network.floating_ips')
 CONF.import_opt('flat_injected', 'nova.network.manager')
 LOG = logging.getLogger(__name__)
 
+# Maximum number of IDs to filter on in a single list request, to keep the
+# request URI of bulk lookups within the limits of the neutron server.
+_BULK_QUERY_SIZE = 100
+
 
 class API(base_api.NetworkAPI):
     """API for interacting with the neutron 2.x API."""
@@ -121,6 +140,9 @@ class API(base_api.NetworkAPI):
         super(API, self).__init__()
         self.last_neutron_extension_sync = None
         self.extensions = {}
+        # Subnets by ID and DHCP ports by network ID, see subnet_cache_ttl.
+        self._subnet_cache = {}
+        self._dhcp_ports_cache = {}
         self.conductor_api = conductor.API()
         self.security_group_api = (
             openstack_driver.get_openstack_security_group_driver())
@@ -502,6 +524,15 @@ class API(base_api.NetworkAPI):
                                                     result, update_cells=False)
         return result
 
+    def get_instances_nw_info(self, context, instances):
+        """Returns the network info of several instances, keyed by uuid.
+
+        The info caches of the instances are not updated.
+        """
+        nw_infos = self._build_network_info_models(context, instances)
+        return dict((uuid, network_model.NetworkInfo.hydrate(nw_info))
+                    for uuid, nw_info in nw_infos.iteritems())
+
     def _get_instance_nw_info(self, context, instance, networks=None,
                               port_ids=None):
         # keep this caching-free version of the get_instance_nw_info method
@@ -1187,25 +1218,205 @@ class API(base_api.NetworkAPI):
                 subnets = self._nw_info_get_subnets(context,
                                                     current_neutron_port,
                                                     network_IPs)
+                nw_info.append(self._nw_info_build_vif(
+                    current_neutron_port, networks, subnets, vif_active))
 
-                devname = "tap" + current_neutron_port['id']
-                devname = devname[:network_model.NIC_NAME_LEN]
+        return nw_info
 
-                network, ovs_interfaceid = (
-                    self._nw_info_build_network(current_neutron_port,
-                                                networks, subnets))
+    def _nw_info_build_vif(self, port, networks, subnets, vif_active):
+        devname = "tap" + port['id']
+        devname = devname[:network_model.NIC_NAME_LEN]
+
+        network, ovs_interfaceid = self._nw_info_build_network(port,
+                                                               networks,
+                                                               subnets)
+
+        return network_model.VIF(
+            id=port['id'],
+            address=port['mac_address'],
+            network=network,
+            type=port.get('binding:vif_type'),
+            details=port.get('binding:vif_details'),
+            ovs_interfaceid=ovs_interfaceid,
+            devname=devname,
+            active=vif_active)
+
+    def _build_network_info_models(self, context, instances):
+        """Return the list of ordered VIFs of several instances.
+
+        The result is a dict keyed by instance uuid, holding what
+        _build_network_info_model() returns for each instance when
+        networks and port_ids are populated from the cached values.  The
+        ports, networks, floating IPs, subnets and DHCP ports of all the
+        instances are looked up with a few bulk requests, rather than
+        several requests per port.
 
-                nw_info.append(network_model.VIF(
-                    id=current_neutron_port['id'],
-                    address=current_neutron_port['mac_address'],
-                    network=network,
-                    type=current_neutron_port.get('binding:vif_type'),
-                    details=current_neutron_port.get('binding:vif_details'),
-                    ovs_interfaceid=ovs_interfaceid,
-                    devname=devname,
-                    active=vif_active))
+        :param context - request context.
+        :param instances - instances to return network info for.
+        """
+        client = neutronv2.get_client(context, admin=True)
 
-        return nw_info
+        uuids = [instance['uuid'] for instance in instances]
+        neutron_ports = self._list_by_ids(client.list_ports, 'ports',
+                                          'device_id', uuids)
+        ifaces = dict((instance['uuid'],
+                       compute_utils.get_nw_info_for_instance(instance))
+                      for instance in instances)
+        net_ids = set(iface['network']['id']
+                      for inst_ifaces in ifaces.values()
+                      for iface in inst_ifaces)
+        nets = self._list_by_ids(client.list_networks, 'networks', 'id',
+                                 net_ids)
+        nets = dict((net['id'], net) for net in nets)
+
+        # Only the ports of the instances which are also in their cached
+        # network info are reported, as by _build_network_info_model().
+        projects = dict((instance['uuid'], instance['project_id'])
+                        for instance in instances)
+        port_map = dict((port['id'], port) for port in neutron_ports
+                        if port['tenant_id'] == projects[port['device_id']])
+        ports = [port_map[iface['id']]
+                 for inst_ifaces in ifaces.values()
+                 for iface in inst_ifaces if iface['id'] in port_map]
+
+        floating_ips = {}
+        for fip in self._list_floating_ips_by_port(
+                client, [port['id'] for port in ports]):
+            key = (fip['port_id'], fip['fixed_ip_address'])
+            floating_ips.setdefault(key, []).append(fip)
+        subnet_ids = set(ip['subnet_id'] for port in ports
+                         for ip in port['fixed_ips'])
+        ipam_subnets = self._get_subnets_by_id(client, subnet_ids)
+        dhcp_ports = self._get_dhcp_ports_by_network(
+            client, set(subnet['network_id']
+                        for subnet in ipam_subnets.values()))
+
+        nw_infos = {}
+        for instance in instances:
+            networks = [nets[iface['network']['id']]
+                        for iface in ifaces[instance['uuid']]
+                        if iface['network']['id'] in nets]
+            nw_info = network_model.NetworkInfo()
+            for iface in ifaces[instance['uuid']]:
+                port = port_map.get(iface['id'])
+                if not port:
+                    continue
+                vif_active = (port['admin_state_up'] is False or
+                              port['status'] == 'ACTIVE')
+
+                network_IPs = []
+                for fixed_ip in port['fixed_ips']:
+                    fixed = network_model.FixedIP(
+                        address=fixed_ip['ip_address'])
+                    for ip in floating_ips.get((port['id'],
+                                                fixed_ip['ip_address']), []):
+                        fixed.add_floating_ip(network_model.IP(
+                            address=ip['floating_ip_address'],
+                            type='floating'))
+                    network_IPs.append(fixed)
+
+                subnets = []
+                for subnet_id in self._unique(ip['subnet_id']
+                                              for ip in port['fixed_ips']):
+                    subnet = ipam_subnets.get(subnet_id)
+                    if subnet is None:
+                        continue
+                    subnet = self._nw_info_build_subnet(
+                        subnet, dhcp_ports.get(subnet['network_id'], []))
+                    subnet['ips'] = [fixed_ip for fixed_ip in network_IPs
+                                     if fixed_ip.is_in_subnet(subnet)]
+                    subnets.append(subnet)
+
+                nw_info.append(self._nw_info_build_vif(port, networks,
+                                                       subnets, vif_active))
+            nw_infos[instance['uuid']] = nw_info
+
+        return nw_infos
+
+    @staticmethod
+    def _unique(items):
+        seen = set()
+        for item in items:
+            if item not in seen:
+                seen.add(item)
+                yield item
+
+    def _list_by_ids(self, list_method, resource, field, ids,
+                     **search_opts):
+        """List the resources whose field matches any of ids.
+
+        The IDs are split over as many requests as needed to keep each
+        request URI reasonably short.  No request is made for an empty
+        list of IDs, which neutron would treat as no filter at all.
+        """
+        ids = list(ids)
+        results = []
+        for i in range(0, len(ids), _BULK_QUERY_SIZE):
+            search_opts[field] = ids[i:i + _BULK_QUERY_SIZE]
+            results.extend(list_method(**search_opts).get(resource, []))
+        return results
+
+    def _list_floating_ips_by_port(self, client, port_ids):
+        try:
+            return self._list_by_ids(client.list_floatingips, 'floatingips',
+                                     'port_id', port_ids)
+        # If a neutron plugin does not implement the L3 API a 404 from
+        # list_floatingips will be raised.
+        except neutronv2.exceptions.NeutronClientException as e:
+            if e.status_code == 404:
+                return []
+            with excutils.save_and_reraise_exception():
+                LOG.exception(_('Unable to access floating IPs for ports'))
+
+    @staticmethod
+    def _cache_get(cache, keys):
+        """Return the unexpired cached values of keys and the missing keys."""
+        now = time.time()
+        found = {}
+        missing = []
+        for key in keys:
+            entry = cache.get(key)
+            if entry is not None and entry[0] > now:
+                found[key] = entry[1]
+            else:
+                missing.append(key)
+        return found, missing
+
+    @staticmethod
+    def _cache_set(cache, values):
+        ttl = CONF.neutron.subnet_cache_ttl
+        if ttl <= 0 or not values:
+            return
+        now = time.time()
+        for key, entry in cache.items():
+            if entry[0] <= now:
+                del cache[key]
+        for key, value in values.iteritems():
+            cache[key] = (now + ttl, value)
+
+    def _get_subnets_by_id(self, client, subnet_ids):
+        subnets, missing = self._cache_get(self._subnet_cache, subnet_ids)
+        fetched = {}
+        for subnet in self._list_by_ids(client.list_subnets, 'subnets', 'id',
+                                        missing):
+            fetched[subnet['id']] = subnet
+        self._cache_set(self._subnet_cache, fetched)
+        subnets.update(fetched)
+        return subnets
+
+    def _get_dhcp_ports_by_network(self, client, network_ids):
+        dhcp_ports, missing = self._cache_get(self._dhcp_ports_cache,
+                                              network_ids)
+        fetched = {}
+        for port in self._list_by_ids(client.list_ports, 'ports',
+                                      'network_id', missing,
+                                      device_owner='network:dhcp'):
+            fetched.setdefault(port['network_id'], []).append(port)
+        # NOTE: networks without a DHCP port are not cached, as the port
+        # of a new network may only be created after the first lookup.
+        self._cache_set(self._dhcp_ports_cache, fetched)
+        dhcp_ports.update(fetched)
+        return dhcp_ports
 
     def _get_subnets_from_port(self, context, port):
         """Return the subnets for a given port."""
@@ -1218,44 +1429,65 @@ class API(base_api.NetworkAPI):
         # related to the port. To avoid this, the method returns here.
         if not fixed_ips:
             return []
-        search_opts = {'id': [ip['subnet_id'] for ip in fixed_ips]}
-        data = neutronv2.get_client(context).list_subnets(**search_opts)
-        ipam_subnets = data.get('subnets', [])
+        subnet_ids = [ip['subnet_id'] for ip in fixed_ips]
+        ipam_subnets, missing = self._cache_get(self._subnet_cache,
+                                                subnet_ids)
+        if missing:
+            search_opts = {'id': missing}
+            data = neutronv2.get_client(context).list_subnets(**search_opts)
+            fetched = dict((subnet['id'], subnet)
+                           for subnet in data.get('subnets', []))
+            self._cache_set(self._subnet_cache, fetched)
+            ipam_subnets.update(fetched)
         subnets = []
 
-        for subnet in ipam_subnets:
-            subnet_dict = {'cidr': subnet['cidr'],
-                           'gateway': network_model.IP(
-                                address=subnet['gateway_ip'],
-                                type='gateway'),
-            }
+        for subnet_id in self._unique(subnet_ids):
+            subnet = ipam_subnets.get(subnet_id)
+            if subnet is None:
+                continue
 
             # attempt to populate DHCP server field
-            search_opts = {'network_id': subnet['network_id'],
-                           'device_owner': 'network:dhcp'}
-            data = neutronv2.get_client(context).list_ports(**search_opts)
-            dhcp_ports = data.get('ports', [])
-            for p in dhcp_ports:
-                for ip_pair in p['fixed_ips']:
-                    if ip_pair['subnet_id'] == subnet['id']:
-                        subnet_dict['dhcp_server'] = ip_pair['ip_address']
-                        break
-
-            subnet_object = network_model.Subnet(**subnet_dict)
-            for dns in subnet.get('dns_nameservers', []):
-                subnet_object.add_dns(
-                    network_model.IP(address=dns, type='dns'))
-
-            for route in subnet.get('host_routes', []):
-                subnet_object.add_route(
-                    network_model.Route(cidr=route['destination'],
-                                        gateway=network_model.IP(
-                                            address=route['nexthop'],
-                                            type='gateway')))
-
-            subnets.append(subnet_object)
+            cached, missing = self._cache_get(self._dhcp_ports_cache,
+                                              [subnet['network_id']])
+            dhcp_ports = cached.get(subnet['network_id'])
+            if missing:
+                search_opts = {'network_id': subnet['network_id'],
+                               'device_owner': 'network:dhcp'}
+                data = neutronv2.get_client(context).list_ports(**search_opts)
+                dhcp_ports = data.get('ports', [])
+                if dhcp_ports:
+                    self._cache_set(self._dhcp_ports_cache,
+                                    {subnet['network_id']: dhcp_ports})
+
+            subnets.append(self._nw_info_build_subnet(subnet, dhcp_ports))
         return subnets
 
+    def _nw_info_build_subnet(self, subnet, dhcp_ports):
+        subnet_dict = {'cidr': subnet['cidr'],
+                       'gateway': network_model.IP(
+                            address=subnet['gateway_ip'],
+                            type='gateway'),
+        }
+
+        for p in dhcp_ports:
+            for ip_pair in p['fixed_ips']:
+                if ip_pair['subnet_id'] == subnet['id']:
+                    subnet_dict['dhcp_server'] = ip_pair['ip_address']
+                    break
+
+        subnet_object = network_model.Subnet(**subnet_dict)
+        for dns in subnet.get('dns_nameservers', []):
+            subnet_object.add_dns(
+                network_model.IP(address=dns, type='dns'))
+
+        for route in subnet.get('host_routes', []):
+            subnet_object.add_route(
+                network_model.Route(cidr=route['destination'],
+                                    gateway=network_model.IP(
+                                        address=route['nexthop'],
+                                        type='gateway')))
+        return subnet_object
+
     def get_dns_domains(self, context):
         """Return a list of available dns domains.
 
@@ -24,6 +24,7 @@ from webob import exc
 from nova.compute import api as compute_api
 from nova import exception
 from nova.i18n import _
+from nova import metadata_documents
 from nova.network import neutronv2
 from nova.network.security_group import security_group_base
 from nova import objects
@@ -439,6 +440,7 @@ class SecurityGroupAPI(security_group_base.SecurityGroupBase):
             except Exception:
                 with excutils.save_and_reraise_exception():
                     LOG.exception(_("Neutron Error:"))
+        metadata_documents.invalidate_document(instance['uuid'])
 
     @compute_api.wrap_check_security_groups_policy
     def remove_from_instance(self, context, instance, security_group_name):
@@ -499,6 +501,7 @@ class SecurityGroupAPI(security_group_base.SecurityGroupBase):
                    {'security_group_name': security_group_name,
                     'instance': instance['uuid']})
             self.raise_not_found(msg)
+        metadata_documents.invalidate_document(instance['uuid'])
 
     def populate_security_groups(self, instance, security_groups):
         # Setting to empty list since we do not want to populate this field
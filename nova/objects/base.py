@@ -17,6 +17,7 @@
 import collections
 import copy
 import functools
+import types
 
 import netaddr
 from oslo import messaging
@@ -627,6 +628,10 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
         if isinstance(entity, (tuple, list, set)):
             entity = self._process_iterable(context, self.serialize_entity,
                                             entity)
+        elif isinstance(entity, types.GeneratorType):
+            # NOTE: Generators can only be sent over RPC as a list
+            entity = [self.serialize_entity(context, value)
+                      for value in entity]
         elif (hasattr(entity, 'obj_to_primitive') and
               callable(entity.obj_to_primitive)):
             entity = entity.obj_to_primitive()
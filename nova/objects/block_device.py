@@ -18,6 +18,7 @@ from nova.cells import rpcapi as cells_rpcapi
 from nova import db
 from nova import exception
 from nova.i18n import _
+from nova import metadata_documents
 from nova import objects
 from nova.objects import base
 from nova.objects import fields
@@ -99,6 +100,7 @@ class BlockDeviceMapping(base.NovaPersistentObject, base.NovaObject):
 
         db_bdm = db.block_device_mapping_create(context, updates, legacy=False)
         self._from_db_object(context, self, db_bdm)
+        metadata_documents.invalidate_document(self.instance_uuid)
         if cell_type == 'compute':
             cells_api = cells_rpcapi.CellsAPI()
             cells_api.bdm_update_or_create_at_top(context, self, create=True)
@@ -110,6 +112,7 @@ class BlockDeviceMapping(base.NovaPersistentObject, base.NovaObject):
                                               reason='already destroyed')
         db.block_device_mapping_destroy(context, self.id)
         delattr(self, base.get_attrname('id'))
+        metadata_documents.invalidate_document(self.instance_uuid)
 
         cell_type = cells_opts.get_cell_type()
         if cell_type == 'compute':
@@ -128,6 +131,7 @@ class BlockDeviceMapping(base.NovaPersistentObject, base.NovaObject):
         updated = db.block_device_mapping_update(self._context, self.id,
                                                  updates, legacy=False)
         self._from_db_object(context, self, updated)
+        metadata_documents.invalidate_document(self.instance_uuid)
         cell_type = cells_opts.get_cell_type()
         if cell_type == 'compute':
             cells_api = cells_rpcapi.CellsAPI()
@@ -189,7 +193,8 @@ class BlockDeviceMappingList(base.ObjectListBase, base.NovaObject):
     # Version 1.0: Initial version
     # Version 1.1: BlockDeviceMapping <= version 1.1
     # Version 1.2: Added use_slave to get_by_instance_uuid
-    VERSION = '1.2'
+    # Version 1.3: Added get_by_instance_uuids
+    VERSION = '1.3'
 
     fields = {
         'objects': fields.ListOfObjectsField('BlockDeviceMapping'),
@@ -198,6 +203,7 @@ class BlockDeviceMappingList(base.ObjectListBase, base.NovaObject):
         '1.0': '1.0',
         '1.1': '1.1',
         '1.2': '1.1',
+        '1.3': '1.1',
     }
 
     @base.remotable_classmethod
@@ -207,6 +213,13 @@ class BlockDeviceMappingList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(
                 context, cls(), objects.BlockDeviceMapping, db_bdms or [])
 
+    @base.remotable_classmethod
+    def get_by_instance_uuids(cls, context, instance_uuids, use_slave=False):
+        db_bdms = db.block_device_mapping_get_all_by_instances(
+                context, instance_uuids, use_slave=use_slave)
+        return base.obj_make_list(
+                context, cls(), objects.BlockDeviceMapping, db_bdms or [])
+
     def root_bdm(self):
         try:
             return (bdm_obj for bdm_obj in self if bdm_obj.is_root).next()
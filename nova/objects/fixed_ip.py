@@ -231,11 +231,14 @@ class FixedIPList(obj_base.ObjectListBase, obj_base.NovaObject):
 
     @obj_base.remotable_classmethod
     def bulk_create(self, context, fixed_ips):
-        ips = []
-        for fixedip in fixed_ips:
-            ip = obj_base.obj_to_primitive(fixedip)
-            if 'id' in ip:
-                raise exception.ObjectActionError(action='create',
-                                                  reason='already created')
-            ips.append(ip)
-        db.fixed_ip_bulk_create(context, ips)
+        def _primitives():
+            for fixedip in fixed_ips:
+                ip = obj_base.obj_to_primitive(fixedip)
+                if 'id' in ip:
+                    raise exception.ObjectActionError(
+                        action='create', reason='already created')
+                yield ip
+
+        # fixed_ips is only read while the rows are inserted, so it can be
+        # a generator of rows for a large network.
+        db.fixed_ip_bulk_create(context, _primitives())
@@ -18,6 +18,7 @@ from nova.compute import flavors
 from nova import db
 from nova import exception
 from nova.i18n import _
+from nova import metadata_documents
 from nova import notifications
 from nova import objects
 from nova.objects import base
@@ -361,6 +362,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject):
             raise exception.ObjectActionError(action='destroy',
                                               reason='host changed')
         delattr(self, base.get_attrname('id'))
+        metadata_documents.invalidate_document(self.uuid)
 
     def _save_info_cache(self, context):
         self.info_cache.save(context)
@@ -476,6 +478,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject):
 
         self._from_db_object(context, self, inst_ref, expected_attrs)
         notifications.send_update(context, old_ref, inst_ref)
+        metadata_documents.invalidate_document(self.uuid)
         self.obj_reset_changes()
 
     @base.remotable
@@ -563,6 +566,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject):
         self._orig_metadata.pop(key, None)
         instance_dict = base.obj_to_primitive(self)
         notifications.send_update(context, instance_dict, instance_dict)
+        metadata_documents.invalidate_document(self.uuid)
         if not md_was_changed:
             self.obj_reset_changes(['metadata'])
 
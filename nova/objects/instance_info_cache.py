@@ -17,6 +17,7 @@ from nova.cells import rpcapi as cells_rpcapi
 from nova import db
 from nova import exception
 from nova.i18n import _
+from nova import metadata_documents
 from nova.objects import base
 from nova.objects import fields
 from nova.openstack.common import log as logging
@@ -91,6 +92,7 @@ class InstanceInfoCache(base.NovaPersistentObject, base.NovaObject):
                                                {'network_info': nw_info_json})
             if update_cells and rv:
                 self._info_cache_cells_update(context, rv)
+            metadata_documents.invalidate_document(self.instance_uuid)
         self.obj_reset_changes()
 
     @base.remotable
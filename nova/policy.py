@@ -15,18 +15,51 @@
 
 """Policy Engine For Nova."""
 
+import ast
+import itertools
+import re
+
 from nova import exception
 from nova.openstack.common import policy
 
 
 _ENFORCER = None
 
+# Credential and target keys read by each rule, see _get_dependencies()
+_DEPENDENCIES = {}
+_DEPENDENCIES_GENERATION = None
+
+# Upper bound on the decisions memoized on a single context
+_MAX_CACHED_DECISIONS = 1000
+
+_TARGET_KEY_RE = re.compile(r'%\(([^)]*)\)')
+
+# Source of Enforcer.generation values, unique across enforcers
+_GENERATIONS = itertools.count()
+
+
+class Enforcer(policy.Enforcer):
+    """Policy enforcer whose generation changes whenever its rules do.
+
+    Memoized decisions and rule dependencies are only valid for the
+    generation they were computed with.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.generation = next(_GENERATIONS)
+        super(Enforcer, self).__init__(*args, **kwargs)
+
+    def set_rules(self, rules, overwrite=True, use_conf=False):
+        super(Enforcer, self).set_rules(rules, overwrite, use_conf)
+        self.generation = next(_GENERATIONS)
+
 
 def reset():
     global _ENFORCER
     if _ENFORCER:
         _ENFORCER.clear()
         _ENFORCER = None
+    _DEPENDENCIES.clear()
 
 
 def init(policy_file=None, rules=None, default_rule=None, use_conf=True):
@@ -43,10 +76,10 @@ def init(policy_file=None, rules=None, default_rule=None, use_conf=True):
 
     global _ENFORCER
     if not _ENFORCER:
-        _ENFORCER = policy.Enforcer(policy_file=policy_file,
-                                    rules=rules,
-                                    default_rule=default_rule,
-                                    use_conf=use_conf)
+        _ENFORCER = Enforcer(policy_file=policy_file,
+                             rules=rules,
+                             default_rule=default_rule,
+                             use_conf=use_conf)
 
 
 def set_rules(rules, overwrite=True, use_conf=False):
@@ -85,11 +118,137 @@ def enforce(context, action, target, do_raise=True, exc=None):
            do_raise is False.
     """
     init()
-    credentials = context.to_dict()
     if not exc:
         exc = exception.PolicyNotAuthorized
-    return _ENFORCER.enforce(action, target, credentials, do_raise=do_raise,
-                             exc=exc, action=action)
+
+    # Decisions are memoized on the context by the values of the
+    # credentials and target keys the rule reads
+    cache = getattr(context, '_policy_cache', None)
+    key = None
+    if isinstance(cache, dict):
+        _ENFORCER.load_rules()
+        key = _get_decision_key(context, action, target)
+    if key is None:
+        return _ENFORCER.enforce(action, target, context.to_dict(),
+                                 do_raise=do_raise, exc=exc, action=action)
+
+    try:
+        result = cache[key]
+    except KeyError:
+        result = _ENFORCER.enforce(action, target, context.to_dict())
+        if len(cache) >= _MAX_CACHED_DECISIONS:
+            cache.clear()
+        cache[key] = result
+    if do_raise and not result:
+        raise exc(action=action)
+    return result
+
+
+def _get_decision_key(context, action, target):
+    """Return a hashable key identifying a policy decision, or None.
+
+    None is returned when the decision cannot be memoized, e.g. for rules
+    calling out to other services.
+    """
+
+    dependencies = _get_dependencies(action)
+    if dependencies is None:
+        return None
+    cred_keys, target_keys = dependencies
+    key = [_ENFORCER.generation, action]
+    try:
+        for cred_key in cred_keys:
+            value = getattr(context, cred_key)
+            if cred_key == 'roles':
+                value = tuple(value)
+            key.append(value)
+        for target_key in target_keys:
+            try:
+                key.append(target[target_key])
+            except KeyError:
+                key.append(KeyError)
+        key = tuple(key)
+        hash(key)
+    except Exception:
+        return None
+    return key
+
+
+def _get_dependencies(action):
+    """Return the credential and target keys read by the rule of action.
+
+    Returns a tuple of the sorted credential and target keys, or None when
+    the rule uses a check whose inputs are not known.
+    """
+
+    global _DEPENDENCIES_GENERATION
+    if _DEPENDENCIES_GENERATION != _ENFORCER.generation:
+        _DEPENDENCIES.clear()
+        _DEPENDENCIES_GENERATION = _ENFORCER.generation
+    try:
+        return _DEPENDENCIES[action]
+    except KeyError:
+        pass
+
+    cred_keys = set()
+    target_keys = set()
+    if _ENFORCER.rules:
+        try:
+            rule = _ENFORCER.rules[action]
+        except KeyError:
+            rule = None
+        if (rule is not None and
+                not _collect_dependencies(rule, cred_keys, target_keys,
+                                          set([action]))):
+            _DEPENDENCIES[action] = None
+            return None
+    dependencies = (sorted(cred_keys), sorted(target_keys))
+    _DEPENDENCIES[action] = dependencies
+    return dependencies
+
+
+def _collect_dependencies(check, cred_keys, target_keys, seen):
+    """Add the keys read by check to cred_keys and target_keys.
+
+    Returns False if check may read anything else.
+    """
+
+    check_type = type(check)
+    if check_type in (policy.TrueCheck, policy.FalseCheck):
+        return True
+    if check_type is policy.NotCheck:
+        return _collect_dependencies(check.rule, cred_keys, target_keys, seen)
+    if check_type in (policy.AndCheck, policy.OrCheck):
+        return all(_collect_dependencies(rule, cred_keys, target_keys, seen)
+                   for rule in check.rules)
+    if check_type is policy.RuleCheck:
+        if check.match in seen:
+            return True
+        try:
+            rule = _ENFORCER.rules[check.match]
+        except KeyError:
+            return True
+        return _collect_dependencies(rule, cred_keys, target_keys,
+                                     seen | set([check.match]))
+    if check_type is policy.RoleCheck:
+        cred_keys.add('roles')
+        return True
+    if check_type is IsAdminCheck:
+        cred_keys.add('is_admin')
+        return True
+    if check_type is policy.GenericCheck:
+        keys = _TARGET_KEY_RE.findall(check.match)
+        if check.match.count('%') != len(keys):
+            return False
+        target_keys.update(keys)
+        try:
+            ast.literal_eval(check.kind)
+        except ValueError:
+            cred_keys.add(check.kind)
+        except SyntaxError:
+            return False
+        return True
+    return False
 
 
 def check_is_admin(context):
@@ -950,6 +950,92 @@ class CloudTestCase(test.TestCase):
         db.service_destroy(self.context, comp1['id'])
         db.service_destroy(self.context, comp2['id'])
 
+    def test_describe_instances_batched_lookups(self):
+        # Makes sure per instance lookups are done once for all instances.
+        self._stub_instance_get_with_fixed_ips('get_all')
+
+        image_uuid = 'cedef40a-ed67-4d10-800e-17455edce175'
+        sys_meta = flavors.save_flavor_info(
+            {}, flavors.get_flavor(1))
+        insts = []
+        for i in range(3):
+            sys_meta['EC2_client_token'] = 'client-token-%d' % i
+            insts.append(db.instance_create(self.context,
+                                            {'reservation_id': 'a',
+                                             'image_ref': image_uuid,
+                                             'instance_type_id': 1,
+                                             'host': 'host%d' % (i % 2),
+                                             'vm_state': 'active',
+                                             'system_metadata': sys_meta}))
+        agg = db.aggregate_create(self.context,
+                {'name': 'agg1'}, {'availability_zone': 'zone1'})
+        db.aggregate_host_add(self.context, agg['id'], 'host1')
+
+        self.mox.StubOutWithMock(db,
+                                 'block_device_mapping_get_all_by_instance')
+        self.mox.StubOutWithMock(db, 'aggregate_metadata_get_by_host')
+        self.mox.StubOutWithMock(objects.Instance, 'get_by_uuid')
+        self.mox.StubOutWithMock(db,
+                                 'block_device_mapping_get_all_by_instances')
+        db.block_device_mapping_get_all_by_instances(
+            self.context, [inst['uuid'] for inst in insts],
+            use_slave=False).AndReturn([])
+        self.mox.ReplayAll()
+
+        result = self.cloud.describe_instances(self.context)
+        instances = result['reservationSet'][0]['instancesSet']
+        self.assertEqual(['client-token-0', 'client-token-1',
+                          'client-token-2'],
+                         [i['clientToken'] for i in instances])
+        self.assertEqual(['nova', 'zone1', 'nova'],
+                         [i['placement']['availabilityZone']
+                          for i in instances])
+        self.assertEqual(['instance-store'] * 3,
+                         [i['rootDeviceType'] for i in instances])
+
+    def test_format_instance_bdm_prefetched_volumes(self):
+        bdm = objects.BlockDeviceMapping(volume_id='vol-uuid',
+                                         device_name='/dev/vda',
+                                         source_type='volume',
+                                         destination_type='volume',
+                                         no_device=False,
+                                         delete_on_termination=True)
+        volume = {'id': 'vol-uuid', 'attach_time': '13:56:24',
+                  'attach_status': 'attached'}
+        self.mox.StubOutWithMock(self.cloud.volume_api, 'get')
+        self.mox.StubOutWithMock(ec2utils, 'id_to_ec2_vol_id')
+        ec2utils.id_to_ec2_vol_id('vol-uuid').AndReturn('vol-00000001')
+        self.mox.ReplayAll()
+
+        result = {}
+        self.cloud._format_instance_bdm(self.context, 'fake-uuid',
+                                        '/dev/vda', result, bdms=[bdm],
+                                        volumes={'vol-uuid': volume})
+        self.assertEqual('ebs', result['rootDeviceType'])
+        self.assertEqual([{'deviceName': '/dev/vda',
+                           'ebs': {'volumeId': 'vol-00000001',
+                                   'deleteOnTermination': True,
+                                   'attachTime': '13:56:24',
+                                   'status': 'attached'}}],
+                         result['blockDeviceMapping'])
+
+    def test_get_bdm_volumes(self):
+        bdms = [objects.BlockDeviceMapping(volume_id=volume_id,
+                                           no_device=False)
+                for volume_id in ('vol1', 'vol2', 'vol1', None)]
+        bdms.append(objects.BlockDeviceMapping(volume_id='vol3',
+                                               no_device=True))
+        self.mox.StubOutWithMock(self.cloud.volume_api, 'get_all')
+        self.mox.StubOutWithMock(self.cloud.volume_api, 'get')
+        self.cloud.volume_api.get(self.context, 'vol1').InAnyOrder(
+            ).AndReturn({'id': 'vol1'})
+        self.cloud.volume_api.get(self.context, 'vol2').InAnyOrder(
+            ).AndReturn({'id': 'vol2'})
+        self.mox.ReplayAll()
+
+        self.assertEqual({'vol1': {'id': 'vol1'}, 'vol2': {'id': 'vol2'}},
+                         self.cloud._get_bdm_volumes(self.context, bdms))
+
     def test_describe_instances_all_invalid(self):
         # Makes sure describe_instances works and filters results.
         self.flags(use_ipv6=True)
@@ -14,6 +14,7 @@
 #    under the License.
 
 from lxml import etree
+import mock
 import webob
 
 from nova.api.openstack.compute.contrib import extended_volumes
@@ -38,20 +39,26 @@ def fake_compute_get(*args, **kwargs):
 
 
 def fake_compute_get_all(*args, **kwargs):
-    db_list = [fakes.stub_instance(1), fakes.stub_instance(2)]
+    db_list = [fakes.stub_instance(1, uuid=UUID1),
+               fakes.stub_instance(2, uuid=UUID2)]
     fields = instance_obj.INSTANCE_DEFAULT_FIELDS
     return instance_obj._make_instance_list(args[1],
                                             objects.InstanceList(),
                                             db_list, fields)
 
 
-def fake_bdms_get_all_by_instance(*args, **kwargs):
-    return [fake_block_device.FakeDbBlockDeviceDict(
-            {'volume_id': UUID1, 'source_type': 'volume',
-             'destination_type': 'volume', 'id': 1}),
-            fake_block_device.FakeDbBlockDeviceDict(
-            {'volume_id': UUID2, 'source_type': 'volume',
-             'destination_type': 'volume', 'id': 2})]
+def fake_bdms_get_all_by_instances(context, instance_uuids, **kwargs):
+    bdms = []
+    for instance_uuid in instance_uuids:
+        bdms.extend([fake_block_device.FakeDbBlockDeviceDict(
+                     {'volume_id': UUID1, 'source_type': 'volume',
+                      'destination_type': 'volume', 'id': 1,
+                      'instance_uuid': instance_uuid}),
+                     fake_block_device.FakeDbBlockDeviceDict(
+                     {'volume_id': UUID2, 'source_type': 'volume',
+                      'destination_type': 'volume', 'id': 2,
+                      'instance_uuid': instance_uuid})])
+    return bdms
 
 
 class ExtendedVolumesTest(test.TestCase):
@@ -63,8 +70,8 @@ class ExtendedVolumesTest(test.TestCase):
         fakes.stub_out_nw_api(self.stubs)
         self.stubs.Set(compute.api.API, 'get', fake_compute_get)
         self.stubs.Set(compute.api.API, 'get_all', fake_compute_get_all)
-        self.stubs.Set(db, 'block_device_mapping_get_all_by_instance',
-                       fake_bdms_get_all_by_instance)
+        self.stubs.Set(db, 'block_device_mapping_get_all_by_instances',
+                       fake_bdms_get_all_by_instances)
         self.flags(
             osapi_compute_extension=[
                 'nova.api.openstack.compute.contrib.select_extensions'],
@@ -112,6 +119,16 @@ class ExtendedVolumesTest(test.TestCase):
                           server.findall('%svolume_attached' % self.prefix)]
             self.assertEqual(exp_volumes, actual)
 
+    def test_detail_loads_bdms_once(self):
+        with mock.patch.object(db, 'block_device_mapping_get_all_by_instances',
+                               side_effect=fake_bdms_get_all_by_instances
+                               ) as get_bdms:
+            res = self._make_request('/v2/fake/servers/detail')
+        self.assertEqual(200, res.status_int)
+        self.assertEqual(1, get_bdms.call_count)
+        self.assertEqual(set([UUID1, UUID2]),
+                         set(get_bdms.call_args[0][1]))
+
 
 class ExtendedVolumesXmlTest(ExtendedVolumesTest):
     content_type = 'application/xml'
@@ -61,6 +61,15 @@ def fake_bdms_get_all_by_instance(*args, **kwargs):
              'destination_type': 'volume', 'id': 2})]
 
 
+def fake_bdms_get_all_by_instances(context, instance_uuids, **kwargs):
+    bdms = []
+    for instance_uuid in instance_uuids:
+        for bdm in fake_bdms_get_all_by_instance():
+            bdm['instance_uuid'] = instance_uuid
+            bdms.append(bdm)
+    return bdms
+
+
 def fake_attach_volume(self, context, instance, volume_id,
                        device, disk_bus, device_type):
     pass
@@ -139,6 +148,8 @@ class ExtendedVolumesTest(test.TestCase):
         self.stubs.Set(compute.api.API, 'get_all', fake_compute_get_all)
         self.stubs.Set(db, 'block_device_mapping_get_all_by_instance',
                        fake_bdms_get_all_by_instance)
+        self.stubs.Set(db, 'block_device_mapping_get_all_by_instances',
+                       fake_bdms_get_all_by_instances)
         self.stubs.Set(volume.cinder.API, 'get', fake_volume_get)
         self.stubs.Set(compute.api.API, 'detach_volume', fake_detach_volume)
         self.stubs.Set(compute.api.API, 'attach_volume', fake_attach_volume)
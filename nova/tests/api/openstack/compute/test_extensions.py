@@ -14,8 +14,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
+
+import fixtures
 import iso8601
 from lxml import etree
+import mock
 from oslo.config import cfg
 import webob
 
@@ -25,9 +29,11 @@ from nova.api.openstack import extensions as base_extensions
 from nova.api.openstack import wsgi
 from nova.api.openstack import xmlutil
 from nova import exception
+from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
 import nova.policy
 from nova import test
+from nova.tests.api.openstack.compute.extensions import foxinsocks
 from nova.tests.api.openstack import fakes
 from nova.tests import matchers
 
@@ -637,6 +643,157 @@ class ControllerExtensionTest(ExtensionTestCase):
         self.assertEqual(extension_body, response.body)
 
 
+class ExtensionManifestTest(ExtensionTestCase):
+    def setUp(self):
+        super(ExtensionManifestTest, self).setUp()
+        self.manifest_path = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'manifest.json')
+        self.flags(osapi_compute_extension=[
+            'nova.tests.api.openstack.compute.extensions.'
+            'foxinsocks.Foxinsocks'],
+            osapi_compute_extension_manifest=self.manifest_path)
+
+    def _read_manifest(self):
+        with open(self.manifest_path) as manifest_file:
+            return jsonutils.load(manifest_file)
+
+    def _load_from_manifest(self):
+        compute_extensions.ExtensionManager()
+        with mock.patch.object(importutils, 'import_class') as import_class:
+            ext_mgr = compute_extensions.ExtensionManager()
+            self.assertFalse(import_class.called)
+        self.assertIsInstance(ext_mgr.extensions['FOXNSOX'],
+                              base_extensions.LazyExtension)
+        return ext_mgr
+
+    def test_manifest_written(self):
+        compute_extensions.ExtensionManager()
+        entry, = self._read_manifest()['extensions']
+        self.assertEqual('FOXNSOX', entry['alias'])
+        self.assertEqual('The Fox In Socks Extension.', entry['description'])
+        self.assertFalse(entry['eager'])
+        self.assertEqual(['foxnsocks'],
+                         [res['collection'] for res in entry['resources']])
+        self.assertEqual(['servers', 'flavors', 'flavors'],
+                         entry['controller_extensions'])
+
+    def test_list_extensions_from_manifest(self):
+        ext_mgr = self._load_from_manifest()
+        app = compute.APIRouter(ext_mgr)
+        request = webob.Request.blank("/fake/extensions/FOXNSOX")
+        response = request.get_response(app)
+        self.assertEqual(200, response.status_int)
+        ext = jsonutils.loads(response.body)['extension']
+        self.assertEqual('Fox In Socks', ext['name'])
+        self.assertEqual('The Fox In Socks Extension.', ext['description'])
+        self.assertIsInstance(ext_mgr.extensions['FOXNSOX'],
+                              base_extensions.LazyExtension)
+
+    def test_resource_loaded_on_first_request(self):
+        ext_mgr = self._load_from_manifest()
+        app = compute.APIRouter(ext_mgr)
+        self.assertIsNone(app.resources['foxnsocks'].controller)
+        request = webob.Request.blank("/fake/foxnsocks")
+        response = request.get_response(app)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(response_body, response.body)
+        self.assertIsInstance(ext_mgr.extensions['FOXNSOX'],
+                              foxinsocks.Foxinsocks)
+
+    def test_controller_extension_loaded_on_first_request(self):
+        ext_mgr = self._load_from_manifest()
+        app = compute.APIRouter(ext_mgr, init_only=('servers',))
+        self.assertEqual(1, len(app.resources['servers'].deferred))
+        request = webob.Request.blank("/fake/servers/abcd/action")
+        request.method = 'POST'
+        request.content_type = 'application/json'
+        request.body = jsonutils.dumps(dict(add_tweedle=dict(name="test")))
+        response = request.get_response(app)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual("Tweedle Beetle Added.", response.body)
+        self.assertEqual([], app.resources['servers'].deferred)
+
+    def _break_manifest(self):
+        compute_extensions.ExtensionManager()
+        manifest = self._read_manifest()
+        manifest['extensions'][0]['class'] = 'nova.tests.nonexistent.Fox'
+        with open(self.manifest_path, 'w') as manifest_file:
+            manifest_file.write(jsonutils.dumps(manifest))
+
+    def test_failed_lazy_extension(self):
+        self._break_manifest()
+        ext_mgr = self._load_from_manifest()
+        lazy_ext = ext_mgr.extensions['FOXNSOX']
+        app = compute.APIRouter(ext_mgr)
+        request = webob.Request.blank("/fake/foxnsocks")
+        response = request.get_response(app)
+        self.assertEqual(404, response.status_int)
+        self.assertNotIn('FOXNSOX', ext_mgr.extensions)
+        request = webob.Request.blank("/fake/extensions")
+        response = request.get_response(app)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual([], jsonutils.loads(response.body)['extensions'])
+        # The loader is kept and retried on the next request
+        self.assertEqual(1, len(app.resources['foxnsocks'].deferred))
+        lazy_ext.classpath = ('nova.tests.api.openstack.compute.extensions.'
+                              'foxinsocks.Foxinsocks')
+        request = webob.Request.blank("/fake/foxnsocks")
+        response = request.get_response(app)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(response_body, response.body)
+        self.assertIsInstance(ext_mgr.extensions['FOXNSOX'],
+                              foxinsocks.Foxinsocks)
+
+    def test_failed_lazy_controller_extension(self):
+        self._break_manifest()
+        ext_mgr = self._load_from_manifest()
+        lazy_ext = ext_mgr.extensions['FOXNSOX']
+        app = compute.APIRouter(ext_mgr, init_only=('servers',))
+
+        def add_tweedle():
+            request = webob.Request.blank("/fake/servers/abcd/action")
+            request.method = 'POST'
+            request.content_type = 'application/json'
+            request.body = jsonutils.dumps(dict(add_tweedle=dict(
+                name="test")))
+            return request.get_response(app)
+
+        response = add_tweedle()
+        # The servers resource still works, but without the broken
+        # extension's action
+        self.assertEqual(400, response.status_int)
+        self.assertNotIn('FOXNSOX', ext_mgr.extensions)
+        # The loader is kept and retried on the next request
+        self.assertEqual(1, len(app.resources['servers'].deferred))
+        lazy_ext.classpath = ('nova.tests.api.openstack.compute.extensions.'
+                              'foxinsocks.Foxinsocks')
+        response = add_tweedle()
+        self.assertEqual(200, response.status_int)
+        self.assertEqual("Tweedle Beetle Added.", response.body)
+        self.assertEqual([], app.resources['servers'].deferred)
+        self.assertIsInstance(ext_mgr.extensions['FOXNSOX'],
+                              foxinsocks.Foxinsocks)
+
+    def test_stale_manifest_ignored(self):
+        compute_extensions.ExtensionManager()
+        manifest = self._read_manifest()
+        with open(self.manifest_path, 'w') as manifest_file:
+            manifest_file.write(jsonutils.dumps(
+                dict(manifest, fingerprint='stale')))
+
+        ext_mgr = compute_extensions.ExtensionManager()
+        self.assertIsInstance(ext_mgr.extensions['FOXNSOX'],
+                              foxinsocks.Foxinsocks)
+        self.assertEqual(manifest, self._read_manifest())
+
+    def test_missing_manifest_directory(self):
+        self.flags(osapi_compute_extension_manifest=os.path.join(
+            self.manifest_path, 'missing', 'manifest.json'))
+        ext_mgr = compute_extensions.ExtensionManager()
+        self.assertIsInstance(ext_mgr.extensions['FOXNSOX'],
+                              foxinsocks.Foxinsocks)
+
+
 class ExtensionsXMLSerializerTest(test.TestCase):
 
     def test_serialize_extension(self):
@@ -17,16 +17,19 @@
 Tests dealing with HTTP rate-limiting.
 """
 
+import contextlib
 import httplib
 import StringIO
 from xml.dom import minidom
 
 from lxml import etree
+import mock
 import webob
 
 from nova.api.openstack.compute import limits
 from nova.api.openstack.compute import views
 from nova.api.openstack import xmlutil
+from nova import cache_utils
 import nova.context
 from nova.openstack.common import jsonutils
 from nova import test
@@ -649,6 +652,107 @@ class LimiterTest(BaseLimitTestSuite):
         results = list(self._check(2, "PUT", "/anything", "user0"))
         self.assertEqual(expected, results)
 
+    def test_matcher_shared_between_users(self):
+        self.limiter.check_for_delay("PUT", "/anything", "user1")
+        self.limiter.check_for_delay("PUT", "/anything", "user2")
+        self.limiter.check_for_delay("PUT", "/anything", "user0")
+        self.assertIs(self.limiter._matchers['user1'][1],
+                      self.limiter._matchers['user2'][1])
+        self.assertIsNot(self.limiter._matchers['user1'][1],
+                         self.limiter._matchers['user0'][1])
+
+
+class LimitMatcherTest(test.NoDBTestCase):
+    """Tests for the `limits._LimitMatcher` class."""
+
+    def test_combined(self):
+        matcher = limits._LimitMatcher(TEST_LIMITS)
+        self.assertIsNotNone(matcher._patterns['POST'][0])
+        self.assertEqual([1, 2], sorted(matcher("POST", "/servers/1")))
+        self.assertEqual([1], matcher("POST", "/images"))
+        self.assertEqual([3], matcher("PUT", "/images"))
+        self.assertEqual([], matcher("GET", "/images"))
+        self.assertEqual([], matcher("DELETE", "/servers"))
+
+    def test_uncombinable_regex(self):
+        test_limits = [
+            limits.Limit("GET", "*", r"^/(a)\1", 1, utils.TIME_UNITS['HOUR']),
+            limits.Limit("GET", "*", "(?i)^/B", 1, utils.TIME_UNITS['HOUR']),
+            limits.Limit("GET", "*", "^/a", 1, utils.TIME_UNITS['HOUR']),
+        ]
+        matcher = limits._LimitMatcher(test_limits)
+        self.assertIsNone(matcher._patterns['GET'][0])
+        self.assertEqual([0, 2], matcher("GET", "/aa"))
+        self.assertEqual([1], matcher("GET", "/b"))
+
+
+class SharedLimiterTest(BaseLimitTestSuite):
+    """Tests for the memcached backed `limits.SharedLimiter` class."""
+
+    def setUp(self):
+        super(SharedLimiterTest, self).setUp()
+        self.cache = cache_utils.Client()
+        self.stubs.Set(cache_utils, 'get_client', lambda: self.cache)
+        userlimits = {'limits.user0': '(get, *, .*, 4, minute)'}
+        self.limiter = limits.SharedLimiter(TEST_LIMITS, **userlimits)
+
+    def _check(self, limiter, num, verb, url, username=None):
+        return [limiter.check_for_delay(verb, url, username)[0]
+                for x in xrange(num)]
+
+    def test_delay_until_next_window(self):
+        self.time = 10.0
+        expected = [None] * 4 + [50.0]
+        self.assertEqual(expected, self._check(self.limiter, 5, "GET",
+                                               "/foo", "user0"))
+        self.assertEqual(0, self.limiter.get_limits("user0")[0]['remaining'])
+        self.assertEqual(60, self.limiter.get_limits("user0")[0]['resetTime'])
+
+        self.time = 60.0
+        self.assertEqual([None], self._check(self.limiter, 1, "GET",
+                                             "/foo", "user0"))
+
+    def test_counters_shared_between_limiters(self):
+        # Another API worker using the same memcached servers
+        other = limits.SharedLimiter(TEST_LIMITS)
+        self.assertEqual([None] * 2, self._check(self.limiter, 2, "POST",
+                                                 "/servers"))
+        self.assertEqual([None, 60.0], self._check(other, 2, "POST",
+                                                   "/servers"))
+
+    def test_users_counted_separately(self):
+        self.assertEqual([None, 60.0], self._check(self.limiter, 2, "GET",
+                                                   "/delayed", "user1"))
+        self.assertEqual([None], self._check(self.limiter, 1, "GET",
+                                             "/delayed", "user2"))
+
+    def test_unreachable_cache_allows_requests(self):
+        # python-memcached does no I/O when no server can be reached
+        self.stubs.Set(self.cache, 'incr', lambda *args, **kwargs: None)
+        self.stubs.Set(self.cache, 'add', lambda *args, **kwargs: 0)
+        self.assertEqual([None] * 3, self._check(self.limiter, 3, "GET",
+                                                 "/delayed", "user1"))
+
+    def test_unreachable_cache_logged_once(self):
+        incr, add = self.cache.incr, self.cache.add
+        self.stubs.Set(self.cache, 'incr', lambda *args, **kwargs: None)
+        self.stubs.Set(self.cache, 'add', lambda *args, **kwargs: 0)
+        with contextlib.nested(
+            mock.patch.object(limits.LOG, 'warn'),
+            mock.patch.object(limits.LOG, 'info'),
+        ) as (mock_warn, mock_info):
+            self._check(self.limiter, 3, "GET", "/delayed", "user1")
+            self._check(self.limiter, 3, "POST", "/servers", "user1")
+            self.assertEqual(1, mock_warn.call_count)
+            self.assertFalse(mock_info.called)
+
+            # The recovery is logged once as well
+            self.stubs.Set(self.cache, 'incr', incr)
+            self.stubs.Set(self.cache, 'add', add)
+            self._check(self.limiter, 2, "GET", "/delayed", "user1")
+            self.assertEqual(1, mock_info.call_count)
+            self.assertEqual(1, mock_warn.call_count)
+
 
 class WsgiLimiterTest(BaseLimitTestSuite):
     """Tests for `limits.WsgiLimiter` class."""
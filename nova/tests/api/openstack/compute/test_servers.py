@@ -16,7 +16,9 @@
 #    under the License.
 
 import base64
+import contextlib
 import datetime
+import hashlib
 import uuid
 
 import iso8601
@@ -566,6 +568,24 @@ class ServersControllerTest(ControllerTest):
         expected = {'limit': ['3'], 'marker': [fakes.get_fake_uuid(2)]}
         self.assertThat(params, matchers.DictMatches(expected))
 
+    def test_get_server_details_max_limit_streamed(self):
+        server = fakes.stub_instance(1)
+
+        def return_servers(context, *args, **kwargs):
+            return [dict(server, id=i + 1, uuid=fakes.get_fake_uuid(i))
+                    for i in xrange(CONF.osapi_max_limit)]
+
+        self.stubs.Set(db, 'instance_get_all_by_filters', return_servers)
+        req = webob.Request.blank('/v2/fake/servers/detail')
+        res = req.get_response(fakes.wsgi_app(init_only=('servers',)))
+
+        self.assertEqual(200, res.status_int)
+        # A full page is sent in chunks rather than as a single string
+        self.assertNotIsInstance(res.app_iter, list)
+        self.assertIsNone(res.content_length)
+        servers = jsonutils.loads(res.body)['servers']
+        self.assertEqual(CONF.osapi_max_limit, len(servers))
+
     def test_get_server_details_with_limit_bad_value(self):
         req = fakes.HTTPRequest.blank('/fake/servers/detail?limit=aaa')
         self.assertRaises(webob.exc.HTTPBadRequest,
@@ -4115,6 +4135,53 @@ class ServersViewBuilderTest(test.TestCase):
         result = self.view_builder._get_flavor(self.request, self.instance)
         self.assertEqual(result, expected)
 
+    def test_get_flavor_extracted_once_per_flavor(self):
+        with mock.patch.object(flavors, 'extract_flavor',
+                               wraps=flavors.extract_flavor) as extract:
+            first = self.view_builder._get_flavor(self.request, self.instance)
+            second = self.view_builder._get_flavor(self.request,
+                                                   self.instance)
+        self.assertEqual(1, extract.call_count)
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+
+    def test_get_host_id_memoized(self):
+        self.instance['host'] = 'fake_host'
+        expected = hashlib.sha224('fake_project' + 'fake_host').hexdigest()
+        with mock.patch.object(views.servers.hashlib, 'sha224',
+                               wraps=hashlib.sha224) as sha224:
+            self.assertEqual(expected, self.view_builder._get_host_id(
+                self.instance, self.request))
+            self.assertEqual(expected, self.view_builder._get_host_id(
+                self.instance, self.request))
+        self.assertEqual(1, sha224.call_count)
+
+    def test_build_server_detail_list_prefetches_faults(self):
+        instance = fake_instance.fake_instance_obj(self.request.context,
+                                                   uuid=self.uuid)
+        self.assertFalse(instance.obj_attr_is_set('fault'))
+        instances = objects.InstanceList(objects=[instance])
+        with contextlib.nested(
+            mock.patch.object(instances, 'fill_faults'),
+            mock.patch.object(self.view_builder, '_list_view')
+        ) as (fill_faults, list_view):
+            self.view_builder.detail(self.request, instances)
+        fill_faults.assert_called_once_with()
+        list_view.assert_called_once_with(self.view_builder.show,
+                                          self.request, instances,
+                                          'servers/detail')
+
+    def test_build_server_detail_list_faults_already_loaded(self):
+        self.instance.fault = None
+        instances = objects.InstanceList(objects=[self.instance])
+        with mock.patch.object(instances, 'fill_faults') as fill_faults:
+            output = self.view_builder.detail(self.request, instances)
+        self.assertFalse(fill_faults.called)
+        self.assertEqual(self.self_link,
+                         output['servers'][0]['links'][0]['href'])
+        self.assertEqual(self.bookmark_link,
+                         output['servers'][0]['links'][1]['href'])
+
     def test_build_server(self):
         output = self.view_builder.basic(self.request, self.instance)
         self.assertThat(output,
@@ -18,6 +18,7 @@ from nova.api.openstack import extensions
 from nova.api.openstack import wsgi
 from nova import exception
 from nova import i18n
+from nova.openstack.common import jsonutils
 from nova import test
 from nova.tests.api.openstack import fakes
 from nova.tests import utils
@@ -131,6 +132,27 @@ class RequestTest(test.NoDBTestCase):
                  'id1': compute_nodes[1],
                  'id2': compute_nodes[2]})
 
+    def test_get_db_instance_items(self):
+        request = wsgi.Request.blank('/foo')
+        request.cache_db_instances([{'uuid': 'uuid0'}, {'uuid': 'uuid1'}])
+        loads = []
+
+        def loader(instance_uuids):
+            loads.append(sorted(instance_uuids))
+            return dict((uuid, 'item-%s' % uuid) for uuid in instance_uuids
+                        if uuid != 'uuid1')
+
+        self.assertEqual('item-uuid0',
+                         request.get_db_instance_items('foo', 'uuid0', loader))
+        self.assertIsNone(request.get_db_instance_items('foo', 'uuid1',
+                                                        loader))
+        self.assertEqual([['uuid0', 'uuid1']], loads)
+
+        # Instances which were not cached are loaded on their own
+        self.assertEqual('item-uuid2',
+                         request.get_db_instance_items('foo', 'uuid2', loader))
+        self.assertEqual([['uuid0', 'uuid1'], ['uuid2']], loads)
+
     def test_from_request(self):
         self.stubs.Set(i18n, 'get_available_languages',
                        fakes.fake_get_available_languages)
@@ -232,6 +254,32 @@ class JSONDictSerializerTest(test.NoDBTestCase):
         result = result.replace('\n', '').replace(' ', '')
         self.assertEqual(result, expected_json)
 
+    def test_json_serialize_iter(self):
+        self.flags(osapi_json_stream_threshold=2,
+                   osapi_json_stream_batch_size=2)
+        input_dict = {'servers': [{'id': i, 'name': u'server\u2603'}
+                                  for i in range(5)],
+                      'servers_links': [{'rel': 'next', 'href': 'fake'}],
+                      'empty': []}
+        serializer = wsgi.JSONDictSerializer()
+        chunks = list(serializer.serialize_iter(input_dict))
+        # one chunk per batch of servers and one per other key
+        self.assertEqual(8, len(chunks))
+        self.assertEqual(serializer.serialize(input_dict), ''.join(chunks))
+
+    def test_json_serialize_iter_below_threshold(self):
+        self.flags(osapi_json_stream_threshold=5)
+        serializer = wsgi.JSONDictSerializer()
+        self.assertIsNone(serializer.serialize_iter(
+            {'servers': range(5)}))
+        self.assertIsNone(serializer.serialize_iter(range(10)))
+
+    def test_json_serialize_iter_disabled(self):
+        self.flags(osapi_json_stream_threshold=0)
+        serializer = wsgi.JSONDictSerializer()
+        self.assertIsNone(serializer.serialize_iter(
+            {'servers': range(5000)}))
+
 
 class TextDeserializerTest(test.NoDBTestCase):
     def test_dispatch_default(self):
@@ -1206,6 +1254,17 @@ class ResponseObjectTest(test.NoDBTestCase):
             self.assertEqual(response.status_int, 202)
             self.assertEqual(response.body, mtype)
 
+    def test_serialize_streams_large_json(self):
+        self.flags(osapi_json_stream_threshold=10)
+        body = {'servers': [{'id': i} for i in range(20)]}
+        robj = wsgi.ResponseObject(body, json=wsgi.JSONDictSerializer)
+        request = wsgi.Request.blank('/tests/123')
+        response = robj.serialize(request, 'application/json')
+
+        self.assertNotIsInstance(response.app_iter, list)
+        self.assertIsNone(response.content_length)
+        self.assertEqual(body, jsonutils.loads(response.body))
+
 
 class ValidBodyTest(test.NoDBTestCase):
 
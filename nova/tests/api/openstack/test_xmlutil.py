@@ -516,6 +516,52 @@ class TemplateElementTest(test.NoDBTestCase):
                          "<test2 !selector=Selector()>"
                          "<child !selector=Selector()/></test2>")
 
+    def test_render_plan_cached(self):
+        master = xmlutil.TemplateElement('test', a='a')
+        slave = xmlutil.TemplateElement('test', b='b')
+        plan = master._get_plan([slave])
+        self.assertIs(plan, master._get_plan([slave]))
+        self.assertIsNot(plan, master._get_plan([]))
+        self.assertEqual([('a', 'a', master.get('a')),
+                          ('b', 'b', slave.get('b'))], plan.attrs)
+
+    def test_render_plan_rebuilt_after_change(self):
+        master = xmlutil.TemplateElement('test', a='a')
+        slave = xmlutil.TemplateElement('test')
+        master._get_plan([slave])
+        slave.set('b')
+        xmlutil.SubTemplateElement(slave, 'child')
+
+        plan = master._get_plan([slave])
+        self.assertEqual(['a', 'b'], [key for key, _i, _s in plan.attrs])
+        self.assertEqual([[slave['child']]], plan.children)
+
+        elems = master.render(None, dict(a=1, b=2), [slave])
+        self.assertEqual({'a': '1', 'b': '2'}, dict(elems[0][0].items()))
+
+    def test_render_plan_kept_after_unrelated_change(self):
+        master = xmlutil.TemplateElement('test', a='a')
+        child = xmlutil.SubTemplateElement(master, 'child')
+        plan = master._get_plan([])
+        # Neither a change of a child nor of another template affects
+        # the plan of this element
+        child.set('c')
+        xmlutil.TemplateElement('other').set('d')
+        self.assertIs(plan, master._get_plan([]))
+
+    def test_render_overridden_apply(self):
+        class UpperTemplateElement(xmlutil.TemplateElement):
+            def apply(self, elem, obj):
+                elem.set('upper', obj['a'].upper())
+
+        master = xmlutil.TemplateElement('test', a='a')
+        slave = UpperTemplateElement('test')
+        self.assertIsNone(master._get_plan([slave]).attrs)
+
+        elems = master.render(None, dict(a='x'), [slave])
+        self.assertEqual({'a': 'x', 'upper': 'X'},
+                         dict(elems[0][0].items()))
+
 
 class TemplateTest(test.NoDBTestCase):
     def test_tree(self):
@@ -6030,6 +6030,54 @@ class ComputeTestCase(BaseTestCase):
         # Stays the same because we didn't find anything to process
         self.assertEqual(3, call_info['get_nw_info'])
 
+    def test_heal_instance_info_cache_bulk(self):
+        self.flags(heal_instance_info_cache_interval=-1,
+                   heal_instance_info_cache_bulk=True)
+        ctxt = context.get_admin_context()
+        vif = fake_network_cache_model.new_vif()
+        stale_vif = fake_network_cache_model.new_vif({'id': 'stale-vif'})
+
+        instances = []
+        for x in xrange(4):
+            info_cache = objects.InstanceInfoCache(
+                network_info=network_model.NetworkInfo([stale_vif]))
+            instances.append(objects.Instance(uuid='fake-uuid-%s' % x,
+                                              vm_state=vm_states.ACTIVE,
+                                              task_state=None,
+                                              info_cache=info_cache))
+        # A building instance is skipped, an up to date cache is left
+        # alone and no network info was found for the last one.
+        instances[0].vm_state = vm_states.BUILDING
+        cached = jsonutils.loads(network_model.NetworkInfo([vif]).json())
+        instances[1].info_cache.network_info = (
+            network_model.NetworkInfo.hydrate(cached))
+        nw_infos = dict((inst.uuid, network_model.NetworkInfo([vif]))
+                        for inst in instances[1:3])
+
+        with contextlib.nested(
+            mock.patch.object(objects.InstanceList, 'get_by_host',
+                              return_value=instances),
+            mock.patch.object(self.compute.network_api,
+                              'get_instances_nw_info',
+                              return_value=nw_infos),
+            mock.patch.object(objects.InstanceInfoCache, 'save',
+                              autospec=True),
+            mock.patch.object(self.compute, '_get_instance_nw_info'),
+        ) as (mock_get_by_host, mock_nw_infos, mock_save, mock_nw_info):
+            self.compute._heal_instance_info_cache(ctxt)
+
+        mock_get_by_host.assert_called_once_with(
+            ctxt, self.compute.host,
+            expected_attrs=['system_metadata', 'info_cache'],
+            use_slave=True)
+        mock_nw_infos.assert_called_once_with(ctxt, instances[1:])
+        self.assertFalse(mock_nw_info.called)
+        self.assertEqual(1, mock_save.call_count)
+        info_cache = mock_save.call_args[0][0]
+        self.assertEqual('fake-uuid-2', info_cache.instance_uuid)
+        self.assertEqual(nw_infos['fake-uuid-2'], info_cache.network_info)
+        self.assertEqual({'update_cells': False}, mock_save.call_args[1])
+
     @mock.patch('nova.objects.InstanceList.get_by_filters')
     @mock.patch('nova.compute.api.API.unrescue')
     def test_poll_rescued_instances(self, unrescue, get):
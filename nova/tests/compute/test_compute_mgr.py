@@ -1702,6 +1702,31 @@ class ComputeManagerBuildInstanceTestCase(test.NoDBTestCase):
         self.compute._notify_about_instance_usage(self.context, self.instance,
                 event, **kwargs)
 
+    @mock.patch('nova.api.metadata.base.store_metadata_document')
+    @mock.patch('nova.api.metadata.base.InstanceMetadata')
+    def test_precompute_metadata_document(self, mock_md, mock_store):
+        self.flags(precompute_metadata_documents=True)
+        self.compute._precompute_metadata_document(self.instance,
+                                                   self.network_info)
+        mock_md.assert_called_once_with(self.instance,
+                                        network_info=self.network_info)
+        mock_store.assert_called_once_with(mock_md.return_value)
+
+    @mock.patch('nova.api.metadata.base.store_metadata_document')
+    def test_precompute_metadata_document_disabled(self, mock_store):
+        self.compute._precompute_metadata_document(self.instance,
+                                                   self.network_info)
+        self.assertFalse(mock_store.called)
+
+    @mock.patch('nova.api.metadata.base.InstanceMetadata',
+                side_effect=test.TestingException)
+    def test_precompute_metadata_document_failure(self, mock_md):
+        self.flags(precompute_metadata_documents=True)
+        # The build goes on, the metadata API renders the document instead
+        self.compute._precompute_metadata_document(self.instance,
+                                                   self.network_info)
+        self.assertTrue(mock_md.called)
+
     def _instance_action_events(self):
         self.mox.StubOutWithMock(objects.InstanceActionEvent, 'event_start')
         self.mox.StubOutWithMock(objects.InstanceActionEvent,
@@ -3416,6 +3416,47 @@ class FixedIPTestCase(BaseInstanceTypeTestCase):
         fixed_ip = db.fixed_ip_get_by_address(self.ctxt, address)
         self.assertEqual(fixed_ip['instance_uuid'], instance_uuid)
 
+    def test_fixed_ip_associate_pool_claims_unassigned_network(self):
+        network = db.network_create_safe(self.ctxt, {})
+        address = self.create_fixed_ip(network_id=None)
+
+        fixed_ip = db.fixed_ip_associate_pool(self.ctxt, network['id'],
+                                              host='myhost')
+
+        self.assertEqual(address, fixed_ip['address'])
+        self.assertEqual(network['id'], fixed_ip['network_id'])
+        self.assertEqual('myhost', fixed_ip['host'])
+        self.assertIsNone(fixed_ip['instance_uuid'])
+
+    def test_fixed_ip_associate_pool_lost_race(self):
+        instance_uuid = self._create_instance()
+        other_uuid = self._create_instance()
+        network = db.network_create_safe(self.ctxt, {})
+        addresses = [self.create_fixed_ip(address='192.168.1.%d' % i,
+                                          network_id=network['id'])
+                     for i in range(5, 8)]
+        claimed = []
+
+        def fake_shuffle(candidates):
+            # Another allocation takes the first candidate between the
+            # lookup of the free addresses and the claim.
+            if not claimed:
+                address = candidates[0]['address']
+                db.fixed_ip_update(self.ctxt, address,
+                                   {'instance_uuid': other_uuid})
+                claimed.append(address)
+
+        self.stubs.Set(sqlalchemy_api.random, 'shuffle', fake_shuffle)
+
+        fixed_ip = db.fixed_ip_associate_pool(self.ctxt, network['id'],
+                                              instance_uuid)
+
+        self.assertEqual(instance_uuid, fixed_ip['instance_uuid'])
+        self.assertNotEqual(claimed[0], fixed_ip['address'])
+        self.assertIn(fixed_ip['address'], addresses)
+        self.assertEqual(other_uuid, db.fixed_ip_get_by_address(
+            self.ctxt, claimed[0])['instance_uuid'])
+
     def test_fixed_ip_create_same_address(self):
         address = '192.168.1.5'
         params = {'address': address}
@@ -3472,6 +3513,42 @@ class FixedIPTestCase(BaseInstanceTypeTestCase):
         self.assertRaises(exception.FixedIpNotFoundForAddress,
                           db.fixed_ip_get_by_address, self.ctxt, address_2)
 
+    def test_fixed_ip_bulk_create_existing_address(self):
+        network_id = db.network_create_safe(self.ctxt, {})['id']
+        db.fixed_ip_create(self.ctxt, {'address': '192.168.1.6'})
+        params = [{'address': '192.168.1.%d' % i, 'network_id': network_id}
+                  for i in range(5, 8)]
+
+        exc = self.assertRaises(exception.FixedIpExists,
+                                db.fixed_ip_bulk_create, self.ctxt, params)
+        self.assertIn('192.168.1.6', six.text_type(exc))
+        self.assertRaises(exception.FixedIpNotFoundForAddress,
+                          db.fixed_ip_get_by_address, self.ctxt,
+                          '192.168.1.5')
+
+    def test_fixed_ip_bulk_create_chunks_in_one_transaction(self):
+        self.stubs.Set(sqlalchemy_api, '_FIXED_IP_BULK_CREATE_CHUNK', 2)
+        network_id = db.network_create_safe(self.ctxt, {})['id']
+        db.fixed_ip_create(self.ctxt, {'address': '192.168.1.9'})
+        params = ({'address': '192.168.1.%d' % i, 'network_id': network_id}
+                  for i in range(5, 10))
+
+        self.assertRaises(exception.FixedIpExists,
+                          db.fixed_ip_bulk_create, self.ctxt, params)
+        # The chunks inserted before the clash are rolled back as well
+        for i in range(5, 9):
+            self.assertRaises(exception.FixedIpNotFoundForAddress,
+                              db.fixed_ip_get_by_address, self.ctxt,
+                              '192.168.1.%d' % i)
+
+        params = ({'address': '192.168.1.%d' % i, 'network_id': network_id}
+                  for i in range(5, 9))
+        db.fixed_ip_bulk_create(self.ctxt, params)
+        for i in range(5, 9):
+            fixed_ip = db.fixed_ip_get_by_address(self.ctxt,
+                                                  '192.168.1.%d' % i)
+            self.assertEqual(network_id, fixed_ip['network_id'])
+
     def test_fixed_ip_bulk_create_success(self):
         address_1 = '192.168.1.5'
         address_2 = '192.168.1.6'
@@ -4633,6 +4710,29 @@ class BlockDeviceMappingTestCase(test.TestCase):
         bmd = db.block_device_mapping_get_all_by_instance(self.ctxt, uuid2)
         self.assertEqual(len(bmd), 2)
 
+    def test_block_device_mapping_get_all_by_instances(self):
+        uuid1 = self.instance['uuid']
+        uuid2 = db.instance_create(self.ctxt, {})['uuid']
+        uuid3 = db.instance_create(self.ctxt, {})['uuid']
+
+        bmds_values = [{'instance_uuid': uuid1,
+                        'device_name': 'first'},
+                       {'instance_uuid': uuid2,
+                        'device_name': 'second'},
+                       {'instance_uuid': uuid3,
+                        'device_name': 'third'}]
+
+        for bdm in bmds_values:
+            self._create_bdm(bdm)
+
+        bmd = db.block_device_mapping_get_all_by_instances(self.ctxt,
+                                                            [uuid1, uuid2])
+        self.assertEqual(['first', 'second'],
+                         sorted(bdm['device_name'] for bdm in bmd))
+        self.assertEqual([],
+                         db.block_device_mapping_get_all_by_instances(
+                             self.ctxt, []))
+
     def test_block_device_mapping_destroy(self):
         bdm = self._create_bdm({})
         db.block_device_mapping_destroy(self.ctxt, bdm['id'])
@@ -4830,6 +4930,22 @@ class VirtualInterfaceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self._assertEqualListsOfObjects(vifs1, vifs1_real)
         self._assertEqualOrderedListOfObjects(vifs2, vifs2_real)
 
+    def test_virtual_interface_get_by_instances(self):
+        inst_uuid2 = db.instance_create(self.ctxt, {})['uuid']
+        inst_uuid3 = db.instance_create(self.ctxt, {})['uuid']
+        vifs = [self._create_virt_interface({'address': 'fake1'}),
+                self._create_virt_interface({'address': 'fake2',
+                                             'instance_uuid': inst_uuid2}),
+                self._create_virt_interface({'address': 'fake3',
+                                             'instance_uuid': inst_uuid2})]
+        self._create_virt_interface({'address': 'fake4',
+                                     'instance_uuid': inst_uuid3})
+        real_vifs = db.virtual_interface_get_by_instances(
+            self.ctxt, [self.instance_uuid, inst_uuid2])
+        self._assertEqualOrderedListOfObjects(vifs, real_vifs)
+        self.assertEqual([], db.virtual_interface_get_by_instances(
+            self.ctxt, []))
+
     def test_virtual_interface_get_by_instance_and_network(self):
         inst_uuid2 = db.instance_create(self.ctxt, {})['uuid']
         values = {'host': 'localhost', 'project_id': 'project2'}
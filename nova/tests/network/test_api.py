@@ -339,6 +339,14 @@ class ApiTestCase(test.TestCase):
                                                        'fake-addr')
         self.assertIsInstance(fip, objects.FixedIP)
 
+    @mock.patch('nova.network.api.API._get_instance_nw_info')
+    def test_get_instances_nw_info(self, mock_nw_info):
+        mock_nw_info.side_effect = lambda ctxt, inst: 'nw-' + inst['uuid']
+        instances = [{'uuid': 'uuid1'}, {'uuid': 'uuid2'}]
+        self.assertEqual({'uuid1': 'nw-uuid1', 'uuid2': 'nw-uuid2'},
+                         self.network_api.get_instances_nw_info(self.context,
+                                                                instances))
+
 
 @mock.patch('nova.network.api.API')
 @mock.patch('nova.db.instance_info_cache_update')
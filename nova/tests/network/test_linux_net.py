@@ -18,6 +18,7 @@ import contextlib
 import datetime
 import os
 
+import fixtures
 import mock
 import mox
 from oslo.config import cfg
@@ -283,10 +284,16 @@ class LinuxNetworkTestCase(test.NoDBTestCase):
             return [vif for vif in vifs if vif['instance_uuid'] ==
                         instance_uuid]
 
+        def get_vifs_by_instances(_context, instance_uuids, use_slave):
+            return [vif for vif in vifs if vif['instance_uuid'] in
+                        instance_uuids]
+
         def get_instance(_context, instance_id):
             return instances[instance_id]
 
         self.stubs.Set(db, 'virtual_interface_get_by_instance', get_vifs)
+        self.stubs.Set(db, 'virtual_interface_get_by_instances',
+                       get_vifs_by_instances)
         self.stubs.Set(db, 'instance_get', get_instance)
         self.stubs.Set(db, 'network_get_associated_fixed_ips', get_associated)
 
@@ -358,6 +365,142 @@ class LinuxNetworkTestCase(test.NoDBTestCase):
 
         self.driver.update_dhcp(self.context, "eth0", networks[0])
 
+    def test_update_dhcp_unchanged_skips_reload(self):
+        self.flags(networks_path=self.useFixture(fixtures.TempDir()).path,
+                   use_single_default_gateway=True)
+        self.stubs.Set(linux_net, '_dhcp_file_state', {})
+        self.stubs.Set(linux_net, '_add_dhcp_mangle_rule',
+                       lambda *a, **kw: None)
+        self.stubs.Set(linux_net, '_add_dnsmasq_accept_rules',
+                       lambda *a, **kw: None)
+        self.stubs.Set(linux_net, '_dnsmasq_pid_for', lambda *a, **kw: 42)
+        executes = []
+
+        def fake_execute(*args, **kwargs):
+            executes.append(args)
+            if args[0] == 'cat':
+                return linux_net._dhcp_file('eth0', 'conf'), ''
+            return '', ''
+
+        self.stubs.Set(linux_net, '_execute', fake_execute)
+
+        linux_net.update_dhcp(self.context, 'eth0', networks[0])
+        self.assertIn(('kill', '-HUP', 42), executes)
+        with open(linux_net._dhcp_file('eth0', 'conf')) as f:
+            self.assertEqual(linux_net.get_dhcp_hosts(self.context,
+                                                      networks[0]),
+                             f.read())
+
+        executes = []
+        linux_net.update_dhcp(self.context, 'eth0', networks[0])
+        self.assertNotIn(('kill', '-HUP', 42), executes)
+
+        # A file changed behind our back is rewritten.
+        os.unlink(linux_net._dhcp_file('eth0', 'opts'))
+        linux_net.update_dhcp(self.context, 'eth0', networks[0])
+        self.assertIn(('kill', '-HUP', 42), executes)
+        self.assertTrue(os.path.exists(linux_net._dhcp_file('eth0', 'opts')))
+
+    @mock.patch.object(linux_net, 'restart_dhcp')
+    @mock.patch.object(linux_net, '_update_dhcp_file')
+    @mock.patch.object(linux_net, '_dhcp_file', return_value='/fake/conf')
+    def test_update_dhcp_with_address(self, mock_file, mock_update,
+                                      mock_restart):
+        self.stubs.Set(linux_net, '_dhcp_hosts', {})
+        linux_net.update_dhcp(self.context, 'eth0', networks[0])
+        mock_update.assert_called_once_with(
+            '/fake/conf', linux_net.get_dhcp_hosts(self.context, networks[0]))
+
+        instance = objects.Instance(hostname='fake_instance01',
+                                    host='fake_instance01', deleted=False)
+        fixedip = objects.FixedIP(address='192.168.1.101', network_id=0,
+                                  virtual_interface_id=3, allocated=False,
+                                  instance=instance)
+        vif = objects.VirtualInterface(id=3, address='DE:AD:BE:EF:00:03')
+        with contextlib.nested(
+            mock.patch.object(objects.FixedIPList, 'get_by_network'),
+            mock.patch.object(objects.FixedIP, 'get_by_address',
+                              return_value=fixedip),
+            mock.patch.object(objects.VirtualInterface, 'get_by_id',
+                              return_value=vif)
+        ) as (mock_get_all, mock_get, mock_get_vif):
+            # Released
+            linux_net.update_dhcp(self.context, 'eth0', networks[0],
+                                  address='192.168.1.101')
+            mock_update.assert_called_with(
+                '/fake/conf',
+                'DE:AD:BE:EF:00:00,fake_instance00.novalocal,192.168.0.100\n'
+                'DE:AD:BE:EF:00:04,fake_instance00.novalocal,192.168.0.102')
+
+            # Allocated again
+            fixedip.allocated = True
+            linux_net.update_dhcp(self.context, 'eth0', networks[0],
+                                  address='192.168.1.101')
+            mock_update.assert_called_with(
+                '/fake/conf',
+                'DE:AD:BE:EF:00:00,fake_instance00.novalocal,192.168.0.100\n'
+                'DE:AD:BE:EF:00:04,fake_instance00.novalocal,192.168.0.102\n'
+                'DE:AD:BE:EF:00:03,fake_instance01.novalocal,192.168.1.101')
+
+            mock_get.assert_called_with(self.context, '192.168.1.101',
+                                        expected_attrs=['instance'])
+            self.assertFalse(mock_get_all.called)
+
+    def test_update_dhcp_with_address_on_other_network(self):
+        self.stubs.Set(linux_net, '_dhcp_hosts', {'eth0': {}})
+        fixedip = objects.FixedIP(address='192.168.1.100', network_id=1,
+                                  virtual_interface_id=1, allocated=True,
+                                  instance=objects.Instance(deleted=False))
+        with contextlib.nested(
+            mock.patch.object(linux_net, 'restart_dhcp'),
+            mock.patch.object(linux_net, '_update_dhcp_file'),
+            mock.patch.object(linux_net, '_dhcp_file'),
+            mock.patch.object(objects.FixedIP, 'get_by_address',
+                              return_value=fixedip)
+        ) as (mock_restart, mock_update, mock_file, mock_get):
+            linux_net.update_dhcp(self.context, 'eth0', networks[0],
+                                  address='192.168.1.100')
+            mock_update.assert_called_once_with(mock_file.return_value, '')
+
+    def test_reload_dnsmasq_coalesced(self):
+        self.flags(dnsmasq_reload_delay=2)
+        self.stubs.Set(linux_net, '_pending_dnsmasq_reloads', set())
+        self.stubs.Set(linux_net, '_dnsmasq_pid_for', lambda *a, **kw: 43)
+        with contextlib.nested(
+            mock.patch.object(linux_net, '_execute',
+                              return_value=('dnsmasq nova-eth0.conf', '')),
+            mock.patch.object(linux_net, '_dhcp_file',
+                              return_value='/fake/nova-eth0.conf'),
+            mock.patch.object(linux_net.greenthread, 'spawn_after')
+        ) as (mock_execute, mock_file, mock_spawn):
+            linux_net._reload_dnsmasq('eth0', 42)
+            linux_net._reload_dnsmasq('eth0', 42)
+            mock_spawn.assert_called_once_with(
+                2, linux_net._deferred_reload_dnsmasq, 'eth0')
+            self.assertFalse(mock_execute.called)
+
+            linux_net._deferred_reload_dnsmasq('eth0')
+            self.assertEqual(
+                [mock.call('cat', '/proc/43/cmdline', check_exit_code=False),
+                 mock.call('kill', '-HUP', 43, run_as_root=True)],
+                mock_execute.call_args_list)
+            linux_net._reload_dnsmasq('eth0', 43)
+            self.assertEqual(2, mock_spawn.call_count)
+
+    def test_deferred_reload_dnsmasq_stale_pid(self):
+        self.stubs.Set(linux_net, '_pending_dnsmasq_reloads', set(['eth0']))
+        self.stubs.Set(linux_net, '_dnsmasq_pid_for', lambda *a, **kw: 43)
+        with contextlib.nested(
+            mock.patch.object(linux_net, '_execute',
+                              return_value=('/usr/sbin/sshd', '')),
+            mock.patch.object(linux_net, '_dhcp_file',
+                              return_value='/fake/nova-eth0.conf')
+        ) as (mock_execute, mock_file):
+            linux_net._deferred_reload_dnsmasq('eth0')
+            mock_execute.assert_called_once_with('cat', '/proc/43/cmdline',
+                                                 check_exit_code=False)
+        self.assertEqual(set(), linux_net._pending_dnsmasq_reloads)
+
     def test_get_dhcp_hosts_for_nw00(self):
         self.flags(use_single_default_gateway=True)
 
@@ -847,6 +990,69 @@ class LinuxNetworkTestCase(test.NoDBTestCase):
         dup_forward_rules = len(linux_net.iptables_manager.ipv4['nat'].rules)
         self.assertEqual(two_forward_rules, dup_forward_rules)
 
+    def test_ensure_floating_forwards_single_apply(self):
+        ln = linux_net
+        applies = []
+        self.stubs.Set(ln.iptables_manager, 'apply',
+                       lambda: applies.append(True))
+        self.stubs.Set(ln, 'ensure_ebtables_rules', lambda *a, **kw: None)
+        net = {'bridge': 'br100', 'cidr': '10.0.0.0/24'}
+        ln.ensure_floating_forward('10.10.10.10', '10.0.0.1', 'eth0', net)
+        one_forward_rules = len(ln.iptables_manager.ipv4['nat'].rules)
+        del applies[:]
+
+        ln.ensure_floating_forwards([
+            ('10.10.10.10', '10.0.0.3', 'eth0', net),
+            ('10.10.10.11', '10.0.0.10', 'eth0', net),
+            ('10.10.10.12', '10.0.0.11', 'eth0', net)])
+        rules = [(rule.chain, rule.rule)
+                 for rule in ln.iptables_manager.ipv4['nat'].rules]
+        self.assertEqual([True], applies)
+        self.assertEqual(one_forward_rules + 10, len(rules))
+        self.assertIn(('PREROUTING', '-d 10.10.10.10 -j DNAT --to 10.0.0.3'),
+                      rules)
+        self.assertNotIn(('PREROUTING',
+                          '-d 10.10.10.10 -j DNAT --to 10.0.0.1'), rules)
+
+    def test_remove_address_rules(self):
+        table = linux_net.IptablesTable()
+        table.add_chain('PREROUTING')
+        table.add_rule('PREROUTING', '-d 10.10.10.1 -j DNAT --to 10.0.0.1')
+        table.add_rule('PREROUTING', '-d 10.10.10.10/32 -j DNAT --to 10.0.0.2')
+        table.add_rule('PREROUTING', '-d 10.10.10.100 -j DNAT --to 10.0.0.3')
+        table.dirty = False
+        self.assertEqual(2, table.remove_address_rules(['10.10.10.1',
+                                                        '10.10.10.10']))
+        self.assertTrue(table.dirty)
+        self.assertEqual(['-d 10.10.10.100 -j DNAT --to 10.0.0.3'],
+                         [rule.rule for rule in table.rules])
+
+    def test_bind_floating_ips(self):
+        self.flags(send_arp_for_ha=True, send_arp_for_ha_count=3)
+        executes = []
+
+        def fake_execute(*args, **kwargs):
+            executes.append((args, kwargs.get('process_input')))
+            return '', ''
+
+        self.stubs.Set(linux_net, '_execute', fake_execute)
+        linux_net.bind_floating_ips(['1.2.3.4', '1.2.3.5'], 'eth0')
+        self.assertEqual(
+            [(('ip', '-force', '-batch', '-'),
+              'addr add 1.2.3.4/32 dev eth0\n'
+              'addr add 1.2.3.5/32 dev eth0\n'),
+             (('arping', '-U', '1.2.3.4', '-A', '-I', 'eth0', '-c', '3'),
+              None),
+             (('arping', '-U', '1.2.3.5', '-A', '-I', 'eth0', '-c', '3'),
+              None)],
+            executes)
+
+    def test_bind_floating_ips_no_device(self):
+        self.stubs.Set(linux_net, '_execute', lambda *a, **kw: (
+            '', 'Cannot find device "eth9"\nCommand failed -:1\n'))
+        self.assertRaises(processutils.ProcessExecutionError,
+                          linux_net.bind_floating_ips, ['1.2.3.4'], 'eth9')
+
     def test_apply_ran(self):
         manager = linux_net.IptablesManager()
         manager.iptables_apply_deferred = False
@@ -334,6 +334,26 @@ class FlatNetworkTestCase(test.TestCase):
         self.assertEqual(3, db.network_count_reserved_ips(context_admin,
                         network['id']))
 
+    def test_create_fixed_ips_in_one_call(self):
+        context_admin = context.RequestContext('testuser', 'testproject',
+                                              is_admin=True)
+        with mock.patch.object(objects.FixedIPList, 'bulk_create',
+                               wraps=objects.FixedIPList.bulk_create) as bulk:
+            nets = self.network.create_networks(context_admin, 'fake',
+                                                '192.168.0.0/24', False, 1,
+                                                256, None, None, None, None,
+                                                None)
+        self.assertEqual(1, bulk.call_count)
+        fixed_ips = db.fixed_ip_get_all(context_admin)
+        self.assertEqual(256, len(fixed_ips))
+        reserved = sorted(ip['address'] for ip in fixed_ips
+                          if ip['reserved'])
+        self.assertEqual(['192.168.0.0', '192.168.0.1', '192.168.0.255'],
+                         reserved)
+        self.assertEqual(set(str(address) for address in
+                             netaddr.IPNetwork(nets[0]['cidr'])),
+                         set(ip['address'] for ip in fixed_ips))
+
     def test_validate_networks_none_requested_networks(self):
         self.network.validate_networks(self.context, None)
 
@@ -829,6 +849,26 @@ class VlanNetworkTestCase(test.TestCase):
         self.network.allocate_fixed_ip(self.context, FAKEUUID, network,
                                        vpn=True)
 
+    def test_setup_network_on_host_updates_dhcp_with_address(self):
+        self.flags(fake_network=False, use_ipv6=False)
+        network = objects.Network._from_db_object(
+            self.context, objects.Network(),
+            dict(test_network.fake_network, **networks[1]))
+        with contextlib.nested(
+            mock.patch.object(self.network, 'driver'),
+            mock.patch.object(self.network, 'l3driver'),
+            mock.patch.object(self.network, '_get_dhcp_ip',
+                              return_value='192.168.1.1'),
+            mock.patch.object(network, 'save'),
+        ) as (mock_driver, mock_l3driver, mock_get_dhcp_ip, mock_save):
+            self.network._setup_network_on_host(self.context, network,
+                                                address='192.168.1.100')
+        # The dhcp host of the allocated address is updated, not the one
+        # of the VPN address
+        mock_driver.update_dhcp.assert_called_once_with(
+            mock.ANY, mock_driver.get_dev.return_value, network,
+            address='192.168.1.100')
+
     def test_vpn_allocate_fixed_ip_no_network_id(self):
         network = dict(networks[0])
         network['vpn_private_address'] = '192.168.0.2'
@@ -1289,6 +1329,20 @@ class VlanNetworkTestCase(test.TestCase):
                                               'fakeiface',
                                               'fakenet')
 
+    def test_add_floating_ips_batched(self):
+        network = {'bridge': 'br100'}
+        self.mox.StubOutWithMock(linux_net, 'ensure_floating_forwards')
+        self.mox.StubOutWithMock(linux_net, 'bind_floating_ips')
+        self.mox.StubOutWithMock(linux_net, 'ensure_floating_forward')
+        self.mox.StubOutWithMock(linux_net, 'bind_floating_ip')
+        floating_ips = [('1.2.3.4', '10.0.0.2', 'eth0', network),
+                        ('1.2.3.5', '10.0.0.3', 'eth0', network)]
+        linux_net.ensure_floating_forwards(floating_ips)
+        linux_net.bind_floating_ips(['1.2.3.4', '1.2.3.5'], 'eth0')
+        self.mox.ReplayAll()
+
+        self.network.l3driver.add_floating_ips(floating_ips)
+
     @mock.patch('nova.db.floating_ip_get_all_by_host')
     @mock.patch('nova.db.fixed_ip_get')
     def _test_floating_ip_init_host(self, fixed_get, floating_get,
@@ -1316,12 +1370,11 @@ class VlanNetworkTestCase(test.TestCase):
             raise exception.FixedIpNotFound(id=fixed_ip_id)
         fixed_get.side_effect = fixed_ip_get
 
-        self.mox.StubOutWithMock(self.network.l3driver, 'add_floating_ip')
+        self.mox.StubOutWithMock(self.network.l3driver, 'add_floating_ips')
         self.flags(public_interface=public_interface)
-        self.network.l3driver.add_floating_ip(netaddr.IPAddress('1.2.3.5'),
-                                              netaddr.IPAddress('1.2.3.4'),
-                                              expected_arg,
-                                              mox.IsA(objects.Network))
+        self.network.l3driver.add_floating_ips(
+            [(netaddr.IPAddress('1.2.3.5'), netaddr.IPAddress('1.2.3.4'),
+              expected_arg, mox.IsA(objects.Network))])
         self.mox.ReplayAll()
         self.network.init_host_floating_ips()
         self.mox.UnsetStubs()
@@ -1579,7 +1632,7 @@ class VlanNetworkTestCase(test.TestCase):
     def test_deallocate_fixed_deleted(self):
         # Verify doesn't deallocate deleted fixed_ip from deleted network.
 
-        def teardown_network_on_host(_context, network):
+        def teardown_network_on_host(_context, network, address=None):
             if network['id'] == 0:
                 raise test.TestingException()
 
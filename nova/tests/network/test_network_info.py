@@ -14,8 +14,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+
 from nova import exception
 from nova.network import model
+from nova.openstack.common import jsonutils
 from nova import test
 from nova.tests import fake_network_cache_model
 from nova.virt import netutils
@@ -503,6 +506,53 @@ class NetworkInfoTests(test.NoDBTestCase):
                  fake_network_cache_model.new_fixed_ip(
                         {'address': '10.10.0.3'})] * 4)
 
+    def _new_json_model(self):
+        vif = fake_network_cache_model.new_vif()
+        vif['network']['subnets'][0]['ips'][0].add_floating_ip(
+            fake_network_cache_model.new_ip({'address': '192.168.1.1',
+                                             'type': 'floating'}))
+        ninfo = model.NetworkInfo([vif,
+                fake_network_cache_model.new_vif(
+                        {'address': 'bb:bb:bb:bb:bb:bb'})])
+        return ninfo, ninfo.json()
+
+    def test_hydrate_json_is_lazy(self):
+        ninfo, nw_json = self._new_json_model()
+        self.mox.StubOutWithMock(model.VIF, 'hydrate')
+        self.mox.ReplayAll()
+
+        lazy = model.NetworkInfo.hydrate(nw_json)
+        self.assertIs(nw_json, lazy.json())
+        self.assertEqual(ninfo.fixed_ips(), lazy.fixed_ips())
+        self.assertEqual(ninfo.floating_ips(), lazy.floating_ips())
+        self.assertEqual(['192.168.1.1'],
+                         [ip['address'] for ip in lazy.floating_ips()])
+
+    def test_hydrate_json_materializes_on_access(self):
+        ninfo, nw_json = self._new_json_model()
+        lazy = model.NetworkInfo.hydrate(nw_json)
+        self.assertEqual(2, len(lazy))
+        self.assertEqual(ninfo, lazy)
+        self.assertEqual('bb:bb:bb:bb:bb:bb', lazy[1]['address'])
+        self.assertIsInstance(lazy[0], model.VIF)
+
+        lazy = model.NetworkInfo.hydrate(nw_json)
+        self.assertEqual(lazy, ninfo)
+        self.assertEqual(ninfo, copy.deepcopy(model.NetworkInfo.hydrate(
+            nw_json)))
+        self.assertEqual(4, len(ninfo + model.NetworkInfo.hydrate(nw_json)))
+        self.assertEqual(2, len([] + model.NetworkInfo.hydrate(nw_json)))
+        self.assertFalse(model.NetworkInfo.hydrate('[]'))
+
+    def test_hydrate_json_modified(self):
+        ninfo, nw_json = self._new_json_model()
+        lazy = model.NetworkInfo.hydrate(nw_json)
+        lazy.append(fake_network_cache_model.new_vif(
+            {'address': 'cc:cc:cc:cc:cc:cc'}))
+        self.assertEqual(3, len(lazy))
+        self.assertEqual(12, len(lazy.fixed_ips()))
+        self.assertEqual(3, len(jsonutils.loads(lazy.json())))
+
     def _setup_injected_network_scenario(self, should_inject=True,
                                         use_ipv4=True, use_ipv6=False,
                                         gateway=True, dns=True,
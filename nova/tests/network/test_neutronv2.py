@@ -16,8 +16,10 @@
 
 import contextlib
 import copy
+import datetime
 import uuid
 
+import fixtures
 import mock
 import mox
 from neutronclient.common import exceptions
@@ -33,6 +35,7 @@ from nova.network import neutronv2
 from nova.network.neutronv2 import api as neutronapi
 from nova.network.neutronv2 import constants
 from nova.openstack.common import jsonutils
+from nova.openstack.common import timeutils
 from nova import test
 from nova import utils
 
@@ -186,6 +189,110 @@ class TestNeutronClient(test.TestCase):
             client1.list_networks(retrieve_all=False)
             self.assertEqual('new_token1', token_store.admin_auth_token)
 
+    def test_admin_token_expiring(self):
+        self.flags(admin_token_expiry_margin=60, group='neutron')
+        token_store = neutronv2.AdminTokenStore.get()
+        token_store.admin_auth_token = 'old_token'
+        token_store.admin_auth_token_expires = (
+            timeutils.utcnow() + datetime.timedelta(seconds=30))
+        self.addCleanup(setattr, token_store, 'admin_auth_token_expires',
+                        None)
+        my_context = context.get_admin_context()
+        with mock.patch.object(neutronv2, '_get_client') as mock_get:
+            neutronv2.get_client(my_context)
+            mock_get.assert_called_once_with(None, admin=True)
+
+            token_store.admin_auth_token_expires = (
+                timeutils.utcnow() + datetime.timedelta(seconds=3600))
+            mock_get.reset_mock()
+            neutronv2.get_client(my_context)
+            mock_get.assert_called_once_with('old_token', admin=True)
+
+    def test_pooled_client(self):
+        self.flags(url='http://anyhost/', client_pool_size=2,
+                   group='neutron')
+        self.addCleanup(neutronv2.ClientPool.get().clear)
+        contexts = [context.RequestContext('userid', 'my_tenantid',
+                                           auth_token=token)
+                    for token in ('token1', 'token2', 'token3')]
+
+        client1 = neutronv2.get_client(contexts[0])
+        client2 = neutronv2.get_client(contexts[1])
+        self.assertIs(client1, neutronv2.get_client(contexts[0]))
+        self.assertIsNot(client1, client2)
+        self.assertEqual('token1', client1.httpclient.auth_token)
+
+        # The least recently used client is dropped when the pool is full.
+        neutronv2.get_client(contexts[2])
+        self.assertIs(client1, neutronv2.get_client(contexts[0]))
+        self.assertIsNot(client2, neutronv2.get_client(contexts[1]))
+
+    def test_pooled_client_keep_alive(self):
+        self.flags(url='http://anyhost', client_pool_size=1,
+                   group='neutron')
+        self.addCleanup(neutronv2.ClientPool.get().clear)
+        my_context = context.RequestContext('userid', 'my_tenantid',
+                                            auth_token='token')
+        neutron = neutronv2.get_client(my_context)
+        response = mock.Mock(status_code=200, text='{"ports": []}')
+        with contextlib.nested(
+            mock.patch('requests.Session.request', return_value=response),
+            mock.patch('requests.request'),
+        ) as (mock_session_request, mock_request):
+            neutron.list_ports()
+            neutron.list_ports()
+
+        self.assertEqual(2, mock_session_request.call_count)
+        self.assertFalse(mock_request.called)
+        self.assertEqual(('GET', 'http://anyhost/v2.0/ports.json'),
+                         mock_session_request.call_args[0])
+
+        # Dropping the client from the pool closes its connections.
+        with mock.patch.object(neutron.httpclient.session,
+                               'close') as mock_close:
+            neutronv2.ClientPool.get().clear()
+            mock_close.assert_called_once_with()
+
+    def test_pooled_admin_client_expiring_token(self):
+        self.flags(url='http://anyhost/', client_pool_size=2,
+                   admin_token_expiry_margin=60, group='neutron')
+        self.addCleanup(neutronv2.ClientPool.get().clear)
+        my_context = context.get_admin_context()
+
+        client1 = neutronv2.get_client(my_context)
+        httpclient = client1.base_client.httpclient
+        httpclient.auth_token = 'admin_token'
+        httpclient.auth_ref = mock.Mock(
+            auth_token='admin_token',
+            expires=timeutils.utcnow() + datetime.timedelta(seconds=3600))
+        self.assertIs(client1, neutronv2.get_client(my_context))
+        self.assertEqual('admin_token', httpclient.auth_token)
+
+        httpclient.auth_ref.expires = (timeutils.utcnow() +
+                                       datetime.timedelta(seconds=30))
+        self.assertIs(client1, neutronv2.get_client(my_context))
+        self.assertIsNone(httpclient.auth_token)
+
+    def test_call_stats(self):
+        self.flags(url='http://anyhost/', group='neutron')
+        neutronv2.reset_call_stats()
+        self.addCleanup(neutronv2.reset_call_stats)
+        my_context = context.RequestContext('userid', 'my_tenantid',
+                                            auth_token='token')
+        neutron = neutronv2.get_client(my_context)
+        responses = [mock.Mock(status_code=200, text='{}'),
+                     mock.Mock(status_code=404, text='')]
+        with mock.patch('requests.request',
+                        side_effect=responses) as mock_request:
+            neutron.httpclient.do_request('/v2.0/ports', 'GET')
+            neutron.httpclient.do_request('/v2.0/ports/x', 'GET')
+            self.assertEqual(2, mock_request.call_count)
+
+        stats = neutronv2.get_call_stats()
+        self.assertEqual(['GET'], stats.keys())
+        self.assertEqual(2, stats['GET']['count'])
+        self.assertEqual(1, stats['GET']['errors'])
+
 
 class TestNeutronv2Base(test.TestCase):
 
@@ -2328,6 +2435,184 @@ class TestNeutronv2WithMock(test.TestCase):
                           self.context, pool_name)
 
 
+class FakeNeutronClient(object):
+    """In-memory neutron client implementing the list calls it is given
+    data for, filtering like the neutron API and recording each call.
+    """
+
+    def __init__(self, **resources):
+        self.resources = resources
+        self.calls = []
+
+    def _list(self, resource, **search_opts):
+        self.calls.append((resource, search_opts))
+        results = []
+        for item in self.resources.get(resource, []):
+            for key, value in search_opts.items():
+                if not isinstance(value, list):
+                    value = [value]
+                if item.get(key) not in value:
+                    break
+            else:
+                results.append(item)
+        return {resource: results}
+
+    def __getattr__(self, name):
+        if not name.startswith('list_'):
+            raise AttributeError(name)
+        return lambda **search_opts: self._list(name[5:], **search_opts)
+
+    def call_count(self, resource):
+        return len([call for call in self.calls if call[0] == resource])
+
+
+class TestNeutronv2BulkNetworkInfo(test.NoDBTestCase):
+
+    def setUp(self):
+        super(TestNeutronv2BulkNetworkInfo, self).setUp()
+        self.api = neutronapi.API()
+        self.context = context.get_admin_context()
+        self.instances = []
+        ports = []
+        subnets = []
+        networks = []
+        floatingips = []
+        for i in range(3):
+            net_id = 'net%d' % i
+            subnet_id = 'subnet%d' % i
+            networks.append({'id': net_id, 'name': 'net %d' % i,
+                             'tenant_id': 'project'})
+            subnets.append({'id': subnet_id, 'network_id': net_id,
+                            'cidr': '10.0.%d.0/24' % i,
+                            'gateway_ip': '10.0.%d.1' % i,
+                            'dns_nameservers': ['8.8.8.8'],
+                            'host_routes': []})
+            ports.append({'id': 'dhcp%d' % i, 'network_id': net_id,
+                          'device_id': 'dhcp', 'tenant_id': 'project',
+                          'device_owner': 'network:dhcp',
+                          'fixed_ips': [{'subnet_id': subnet_id,
+                                         'ip_address': '10.0.%d.2' % i}]})
+        for i in range(4):
+            inst_uuid = 'instance%d' % i
+            info_cache = []
+            for n in range(2):
+                port_id = 'port%d-%d' % (i, n)
+                address = '10.0.%d.%d' % (n, 10 + i)
+                ports.append({'id': port_id, 'network_id': 'net%d' % n,
+                              'device_id': inst_uuid,
+                              'tenant_id': 'project',
+                              'device_owner': 'compute:nova',
+                              'admin_state_up': True, 'status': 'ACTIVE',
+                              'mac_address': 'fa:16:3e:00:%02d:%02d' % (i, n),
+                              'binding:vif_type': model.VIF_TYPE_OVS,
+                              'fixed_ips': [{'subnet_id': 'subnet%d' % n,
+                                             'ip_address': address}]})
+                floatingips.append({'id': 'fip%d-%d' % (i, n),
+                                    'port_id': port_id,
+                                    'fixed_ip_address': address,
+                                    'floating_ip_address':
+                                        '172.24.%d.%d' % (n, i)})
+                info_cache.append({'id': port_id,
+                                   'network': {'id': 'net%d' % n}})
+            self.instances.append({'uuid': inst_uuid,
+                                   'project_id': 'project',
+                                   'info_cache': {'network_info':
+                                                  info_cache}})
+        self.client = FakeNeutronClient(ports=ports, subnets=subnets,
+                                        networks=networks,
+                                        floatingips=floatingips)
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.network.neutronv2.get_client',
+            lambda context, admin=False: self.client))
+
+    def test_build_network_info_models(self):
+        nw_infos = self.api._build_network_info_models(self.context,
+                                                       self.instances)
+
+        # One for the instance ports and one for the DHCP ports.
+        self.assertEqual(2, self.client.call_count('ports'))
+        self.assertEqual(1, self.client.call_count('networks'))
+        self.assertEqual(1, self.client.call_count('floatingips'))
+        self.assertEqual(1, self.client.call_count('subnets'))
+
+        for instance in self.instances:
+            expected = self.api._build_network_info_model(self.context,
+                                                          instance)
+            self.assertEqual(expected.json(),
+                             nw_infos[instance['uuid']].json())
+            nw_info = nw_infos[instance['uuid']]
+            self.assertEqual(2, len(nw_info))
+            subnet = nw_info[1]['network']['subnets'][0]
+            self.assertEqual('10.0.1.2', subnet['meta']['dhcp_server'])
+            self.assertEqual(1, len(nw_info[1].floating_ips()))
+
+    def test_get_instances_nw_info(self):
+        nw_infos = self.api.get_instances_nw_info(self.context,
+                                                  self.instances)
+        self.assertEqual(set(inst['uuid'] for inst in self.instances),
+                         set(nw_infos))
+        for nw_info in nw_infos.values():
+            self.assertIsInstance(nw_info, model.NetworkInfo)
+            self.assertEqual(2, len(nw_info))
+
+    def test_build_network_info_models_ignores_other_tenants(self):
+        self.instances[0]['project_id'] = 'other'
+        nw_infos = self.api._build_network_info_models(self.context,
+                                                       self.instances)
+        self.assertEqual(0, len(nw_infos['instance0']))
+        self.assertEqual(2, len(nw_infos['instance1']))
+
+    def test_list_by_ids_splits_requests(self):
+        self.stubs.Set(neutronapi, '_BULK_QUERY_SIZE', 2)
+        ports = self.api._list_by_ids(self.client.list_ports, 'ports',
+                                      'device_id',
+                                      ['instance%d' % i for i in range(3)])
+        self.assertEqual(6, len(ports))
+        self.assertEqual([['instance0', 'instance1'], ['instance2']],
+                         [call[1]['device_id'] for call in self.client.calls])
+
+        self.assertEqual([], self.api._list_by_ids(self.client.list_ports,
+                                                   'ports', 'device_id', []))
+        self.assertEqual(2, len(self.client.calls))
+
+    @mock.patch('time.time')
+    def test_subnet_cache(self, mock_time):
+        self.flags(subnet_cache_ttl=60, group='neutron')
+        mock_time.return_value = 1000
+        port = self.client.resources['ports'][3]
+
+        subnets = self.api._get_subnets_from_port(self.context, port)
+        self.assertEqual('10.0.0.2', subnets[0]['meta']['dhcp_server'])
+        self.assertEqual(1, self.client.call_count('subnets'))
+        self.assertEqual(1, self.client.call_count('ports'))
+
+        self.api._get_subnets_from_port(self.context, port)
+        self.assertEqual(1, self.client.call_count('subnets'))
+        self.assertEqual(1, self.client.call_count('ports'))
+
+        # Only the subnet and DHCP ports of the second network are missing.
+        self.client.calls = []
+        self.api._build_network_info_models(self.context, self.instances[:1])
+        self.assertEqual([('subnets', {'id': ['subnet1']}),
+                          ('ports', {'network_id': ['net1'],
+                                     'device_owner': 'network:dhcp'})],
+                         [call for call in self.client.calls
+                          if call[0] == 'subnets' or
+                          'device_owner' in call[1]])
+
+        mock_time.return_value = 1061
+        self.client.calls = []
+        self.api._get_subnets_from_port(self.context, port)
+        self.assertEqual(1, self.client.call_count('subnets'))
+
+    def test_subnet_cache_disabled(self):
+        port = self.client.resources['ports'][3]
+        self.api._get_subnets_from_port(self.context, port)
+        self.api._get_subnets_from_port(self.context, port)
+        self.assertEqual(2, self.client.call_count('subnets'))
+        self.assertEqual({}, self.api._subnet_cache)
+
+
 class TestNeutronv2ModuleMethods(test.TestCase):
 
     def test_gather_port_ids_and_networks_wrong_params(self):
@@ -281,6 +281,19 @@ class _TestBlockDeviceMappingListObject(object):
                     self.context, 'fake_instance_uuid'))
         self.assertEqual(0, len(bdm_list))
 
+    @mock.patch.object(db, 'block_device_mapping_get_all_by_instances')
+    def test_get_by_instance_uuids(self, get_all_by_insts):
+        fakes = [self.fake_bdm(123), self.fake_bdm(456)]
+        get_all_by_insts.return_value = fakes
+        bdm_list = (
+                objects.BlockDeviceMappingList.get_by_instance_uuids(
+                    self.context, ['fake_uuid1', 'fake_uuid2']))
+        get_all_by_insts.assert_called_once_with(
+                self.context, ['fake_uuid1', 'fake_uuid2'], use_slave=False)
+        for faked, got in zip(fakes, bdm_list):
+            self.assertIsInstance(got, objects.BlockDeviceMapping)
+            self.assertEqual(faked['id'], got.id)
+
     def test_root_volume_metadata(self):
         fake_volume = {
                 'volume_image_metadata': {'vol_test_key': 'vol_test_value'}}
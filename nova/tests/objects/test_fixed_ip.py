@@ -251,12 +251,23 @@ class _TestFixedIPObject(object):
 
     @mock.patch('nova.db.fixed_ip_bulk_create')
     def test_bulk_create(self, bulk):
+        created = []
+        bulk.side_effect = lambda context, ips: created.extend(ips)
         fixed_ips = [fixed_ip.FixedIP(address='192.168.1.1'),
                      fixed_ip.FixedIP(address='192.168.1.2')]
         fixed_ip.FixedIPList.bulk_create(self.context, fixed_ips)
-        bulk.assert_called_once_with(self.context,
-                                     [{'address': '192.168.1.1'},
-                                      {'address': '192.168.1.2'}])
+        bulk.assert_called_once_with(self.context, mock.ANY)
+        self.assertEqual([{'address': '192.168.1.1'},
+                          {'address': '192.168.1.2'}], created)
+
+    @mock.patch('nova.db.fixed_ip_bulk_create')
+    def test_bulk_create_from_generator(self, bulk):
+        created = []
+        bulk.side_effect = lambda context, ips: created.extend(ips)
+        fixed_ips = ({'address': '192.168.1.%d' % i} for i in range(1, 3))
+        fixed_ip.FixedIPList.bulk_create(self.context, fixed_ips)
+        self.assertEqual([{'address': '192.168.1.1'},
+                          {'address': '192.168.1.2'}], created)
 
     @mock.patch('nova.db.network_get_associated_fixed_ips')
     def test_get_by_network(self, get):
@@ -23,6 +23,7 @@ from nova.cells import rpcapi as cells_rpcapi
 from nova.compute import flavors
 from nova import db
 from nova import exception
+from nova import metadata_documents
 from nova.network import model as network_model
 from nova import notifications
 from nova.objects import instance
@@ -356,6 +357,7 @@ class _TestInstanceObject(object):
         self.mox.StubOutWithMock(db, 'instance_get_by_uuid')
         self.mox.StubOutWithMock(db, 'instance_update_and_get_original')
         self.mox.StubOutWithMock(notifications, 'send_update')
+        self.mox.StubOutWithMock(metadata_documents, 'invalidate_document')
         db.instance_get_by_uuid(self.context, fake_uuid,
                                 columns_to_join=['info_cache',
                                                  'security_groups'],
@@ -368,6 +370,7 @@ class _TestInstanceObject(object):
                 ).AndReturn((old_ref, new_ref))
         notifications.send_update(self.context, mox.IgnoreArg(),
                                   mox.IgnoreArg())
+        metadata_documents.invalidate_document(fake_uuid)
 
         self.mox.ReplayAll()
 
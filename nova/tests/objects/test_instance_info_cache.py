@@ -16,6 +16,7 @@ from nova.cells import opts as cells_opts
 from nova.cells import rpcapi as cells_rpcapi
 from nova import db
 from nova import exception
+from nova import metadata_documents
 from nova.network import model as network_model
 from nova.objects import instance_info_cache
 from nova.tests.objects import test_objects
@@ -71,6 +72,7 @@ class _TestInstanceInfoCacheObject(object):
                                  use_mock_anything=True)
         self.mox.StubOutWithMock(cells_api,
                                  'instance_info_cache_update_at_top')
+        self.mox.StubOutWithMock(metadata_documents, 'invalidate_document')
         nwinfo = network_model.NetworkInfo.hydrate([{'address': 'foo'}])
         db.instance_info_cache_update(
                 self.context, 'fake-uuid',
@@ -81,6 +83,7 @@ class _TestInstanceInfoCacheObject(object):
                 cells_rpcapi.CellsAPI().AndReturn(cells_api)
                 cells_api.instance_info_cache_update_at_top(
                     self.context, 'foo')
+        metadata_documents.invalidate_document('fake-uuid')
         self.mox.ReplayAll()
         obj._context = self.context
         obj.instance_uuid = 'fake-uuid'
@@ -852,6 +852,12 @@ class TestObjectSerializer(_BaseTestCase):
         for thing in (1, 'foo', [1, 2], {'foo': 'bar'}):
             self.assertEqual(thing, ser.serialize_entity(None, thing))
 
+    def test_serialize_entity_generator(self):
+        ser = base.NovaObjectSerializer()
+        obj = MyObj()
+        result = ser.serialize_entity(None, (thing for thing in (1, obj)))
+        self.assertEqual([1, obj.obj_to_primitive()], result)
+
     def test_deserialize_entity_primitive(self):
         ser = base.NovaObjectSerializer()
         for thing in (1, 'foo', [1, 2], {'foo': 'bar'}):
@@ -903,7 +909,7 @@ object_data = {
     'Aggregate': '1.1-f5d477be06150529a9b2d27cc49030b5',
     'AggregateList': '1.1-3e67b6a4840b19c797504cc6056b27ff',
     'BlockDeviceMapping': '1.1-9968ffe513e7672484b0f528b034cd0f',
-    'BlockDeviceMappingList': '1.2-d6d7df540ca149dda78b22b4b10bdef3',
+    'BlockDeviceMappingList': '1.3-20efb11dcdf0b4985cc2da4b94f989c4',
     'ComputeNode': '1.4-ed20e7a7c1a4612fe7d2836d5887c726',
     'ComputeNodeList': '1.3-ff59187056eaa96f6fd3fb70693d818c',
     'DNSDomain': '1.0-5bdc288d7c3b723ce86ede998fd5c9ba',
@@ -947,7 +953,7 @@ object_data = {
     'ServiceList': '1.0-ae64b4922df28d7cd11c59cddddf926c',
     'TestSubclassedObject': '1.6-1629421d83f474b7fadc41d3fc0e4998',
     'VirtualInterface': '1.0-10fdac4c704102b6d57d6936d6d790d2',
-    'VirtualInterfaceList': '1.0-dc9e9d5bce522d28f96092c49119b3e0',
+    'VirtualInterfaceList': '1.1-9e1871bcfc25d0f389532a3874c488dc',
 }
 
 
@@ -115,6 +115,17 @@ class _TestVirtualInterfaceList(object):
             self.assertEqual(1, len(vifs))
             _TestVirtualInterface._compare(self, fake_vif, vifs[0])
 
+    def test_get_by_instance_uuids(self):
+        with mock.patch.object(db,
+                               'virtual_interface_get_by_instances') as get:
+            get.return_value = [fake_vif]
+            vifs = vif_obj.VirtualInterfaceList.get_by_instance_uuids(
+                    self.context, ['fake-uuid'])
+            self.assertEqual(1, len(vifs))
+            _TestVirtualInterface._compare(self, fake_vif, vifs[0])
+            get.assert_called_once_with(self.context, ['fake-uuid'],
+                                        use_slave=False)
+
 
 class TestVirtualInterfaceList(test_objects._LocalTest,
                                _TestVirtualInterfaceList):
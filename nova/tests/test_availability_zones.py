@@ -150,6 +150,40 @@ class AvailabilityZoneTestCases(test.TestCase):
         self.assertEqual(self.availability_zone,
                         az.get_host_availability_zone(self.context, self.host))
 
+    def test_get_hosts_availability_zones(self):
+        """Test availability zones of several hosts are looked up at once."""
+        service = self._create_service_with_topic('compute', self.host)
+        self._add_to_aggregate(service, self.agg)
+        self._create_service_with_topic('compute', 'host2')
+
+        self.assertEqual({self.host: self.availability_zone,
+                          'host2': self.default_az,
+                          None: self.default_az},
+                         az.get_hosts_availability_zones(
+                             self.context, [self.host, 'host2', None]))
+
+    def test_get_instances_availability_zones(self):
+        """Test availability zones of instances are looked up at once."""
+        service = self._create_service_with_topic('compute', self.host)
+        self._add_to_aggregate(service, self.agg)
+        az.reset_cache()
+        az._get_cache().set(az._make_cache_key('host3'), 'cached-az')
+        instances = [{'uuid': 'uuid1', 'host': self.host},
+                     {'uuid': 'uuid2', 'host': 'host2'},
+                     {'uuid': 'uuid3', 'host': 'host3'},
+                     {'uuid': 'uuid4', 'host': ''}]
+
+        self.mox.StubOutWithMock(az, 'get_host_availability_zone')
+        self.mox.ReplayAll()
+        self.assertEqual({'uuid1': self.availability_zone,
+                          'uuid2': self.default_az,
+                          'uuid3': 'cached-az',
+                          'uuid4': None},
+                         az.get_instances_availability_zones(self.context,
+                                                             instances))
+        self.assertEqual(self.availability_zone,
+                         az._get_cache().get(az._make_cache_key(self.host)))
+
     def test_update_host_availability_zone(self):
         """Test availability zone could be update by given host."""
         service = self._create_service_with_topic('compute', self.host)
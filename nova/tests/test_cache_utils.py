@@ -0,0 +1,122 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Tests for the in process memcached client
+"""
+
+from nova import cache_utils
+from nova.openstack.common import timeutils
+from nova import test
+
+
+class CacheClientTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(CacheClientTestCase, self).setUp()
+        self.useFixture(test.TimeOverride())
+        self.client = cache_utils.Client()
+
+    def _stats(self):
+        return self.client.get_stats()[0][1]
+
+    def test_get_client(self):
+        self.assertIsInstance(cache_utils.get_client(), cache_utils.Client)
+
+    def test_get_set(self):
+        self.assertIsNone(self.client.get('foo'))
+        self.assertTrue(self.client.set('foo', 'bar'))
+        self.assertEqual('bar', self.client.get('foo'))
+        self.client.set('foo', 'baz')
+        self.assertEqual('baz', self.client.get('foo'))
+
+    def test_add(self):
+        self.assertTrue(self.client.add('foo', 'bar'))
+        self.assertFalse(self.client.add('foo', 'baz'))
+        self.assertEqual('bar', self.client.get('foo'))
+
+    def test_incr(self):
+        self.assertIsNone(self.client.incr('foo'))
+        self.client.set('foo', '1')
+        self.assertEqual(2, self.client.incr('foo'))
+        self.assertEqual(5, self.client.incr('foo', delta=3))
+        self.assertEqual('5', self.client.get('foo'))
+
+    def test_delete(self):
+        self.client.set('foo', 'bar')
+        self.client.delete('foo')
+        self.assertIsNone(self.client.get('foo'))
+        # Deleting a missing key is not an error
+        self.client.delete('foo')
+
+    def test_expiry(self):
+        self.client.set('foo', 'bar', time=10)
+        self.client.set('baz', 'qux')
+        timeutils.advance_time_seconds(9)
+        self.assertEqual('bar', self.client.get('foo'))
+        timeutils.advance_time_seconds(1)
+        self.assertIsNone(self.client.get('foo'))
+        self.assertEqual('qux', self.client.get('baz'))
+        self.assertEqual(1, self._stats()['reclaimed'])
+
+    def test_expiry_reset_by_set(self):
+        self.client.set('foo', 'bar', time=10)
+        timeutils.advance_time_seconds(5)
+        self.client.set('foo', 'baz', time=10)
+        timeutils.advance_time_seconds(5)
+        self.assertEqual('baz', self.client.get('foo'))
+        timeutils.advance_time_seconds(5)
+        self.assertIsNone(self.client.get('foo'))
+
+    def test_add_after_expiry(self):
+        self.client.set('foo', 'bar', time=10)
+        timeutils.advance_time_seconds(10)
+        self.assertIsNone(self.client.incr('foo'))
+        self.assertTrue(self.client.add('foo', 'baz'))
+
+    def test_lru_eviction(self):
+        client = cache_utils.Client(max_size=2)
+        client.set('a', 1)
+        client.set('b', 2)
+        # Using a makes b the least recently used entry
+        client.get('a')
+        client.set('c', 3)
+        self.assertIsNone(client.get('b'))
+        self.assertEqual(1, client.get('a'))
+        self.assertEqual(3, client.get('c'))
+        self.assertEqual(2, len(client.cache))
+        self.assertEqual(1, client.get_stats()[0][1]['evictions'])
+
+    def test_max_size_option(self):
+        self.flags(memorycache_max_size=1)
+        client = cache_utils.Client()
+        client.set('a', 1)
+        client.set('b', 2)
+        self.assertIsNone(client.get('a'))
+        self.assertEqual(2, client.get('b'))
+
+    def test_unbounded(self):
+        client = cache_utils.Client(max_size=0)
+        for i in range(100):
+            client.set(i, i)
+        self.assertEqual(100, len(client.cache))
+
+    def test_stats(self):
+        self.client.set('foo', 'bar')
+        self.client.get('foo')
+        self.client.get('baz')
+        self.assertEqual({'cmd_get': 2, 'cmd_set': 1, 'get_hits': 1,
+                          'get_misses': 1, 'evictions': 0, 'reclaimed': 0,
+                          'curr_items': 1}, self._stats())
@@ -15,7 +15,10 @@
 #    under the License.
 """Unit Tests for network code."""
 
+import mock
+
 from nova.network import linux_net
+from nova.openstack.common import processutils
 from nova import test
 
 
@@ -99,6 +102,111 @@ class IptablesManagerTestCase(test.NoDBTestCase):
         self.assertEqual(len(table.rules), num_rules)
         self.assertFalse(table.dirty)
 
+    def test_add_rule_after_remove(self):
+        table = self.manager.ipv4['filter']
+        num_rules = len(table.rules)
+        table.add_rule('FORWARD', '-s 1.2.3.4/5 -j DROP')
+        table.remove_rule('FORWARD', '-s 1.2.3.4/5 -j DROP')
+        self.assertEqual(len(table.rules), num_rules)
+        table.add_rule('FORWARD', '-s 1.2.3.4/5 -j DROP')
+        self.assertEqual(len(table.rules), num_rules + 1)
+
+    def test_remove_chain_removes_rules_and_jumps(self):
+        table = self.manager.ipv4['filter']
+        num_rules = len(table.rules)
+        table.add_chain('inst-1')
+        table.add_rule('inst-1', '-j ACCEPT')
+        table.add_rule('local', '-d 10.0.0.2 -j $inst-1')
+        table.remove_chain('inst-1')
+        self.assertEqual(len(table.rules), num_rules)
+        self.assertFalse(table.has_chain('inst-1'))
+
+        # The rules can be added back once the chain is recreated
+        table.add_chain('inst-1')
+        table.add_rule('inst-1', '-j ACCEPT')
+        self.assertEqual(len(table.rules), num_rules + 1)
+
+    def test_bulk_remove_chains(self):
+        table = self.manager.ipv4['filter']
+        num_rules = len(table.rules)
+        for name in ('inst-1', 'inst-2', 'inst-10'):
+            table.add_chain(name)
+            table.add_rule(name, '-j ACCEPT')
+            table.add_rule('local', '-d 10.0.0.2 -j $%s' % name)
+        table.bulk_remove_chains(['inst-1', 'inst-2', 'inst-3'])
+        self.assertFalse(table.has_chain('inst-1'))
+        self.assertFalse(table.has_chain('inst-2'))
+        # Only exact jump targets are removed.
+        self.assertEqual(num_rules + 2, len(table.rules))
+        self.assertTrue(table.has_chain('inst-10'))
+
+    def test_empty_chain(self):
+        table = self.manager.ipv4['filter']
+        table.add_chain('provider')
+        table.add_rule('provider', '-s 1.2.3.4 -j DROP')
+        table.add_rule('provider', '-s 1.2.3.5 -j DROP')
+        table.dirty = False
+        table.empty_chain('provider')
+        self.assertTrue(table.dirty)
+        self.assertEqual([], [r for r in table.rules
+                              if r.chain == 'provider'])
+
+    def test_remove_unwrapped_rules(self):
+        current_lines = list(self.sample_filter)
+        table = self.manager.ipv4['filter']
+        table.add_rule('FORWARD', '-s 1.2.3.4/5 -j DROP', wrap=False)
+        current_lines = self.manager._modify_rules(current_lines, table,
+                                                   'filter')
+        self.assertIn('[0:0] -A FORWARD -s 1.2.3.4/5 -j DROP', current_lines)
+
+        table.remove_rule('FORWARD', '-s 1.2.3.4/5 -j DROP', wrap=False)
+        new_lines = self.manager._modify_rules(current_lines, table,
+                                               'filter')
+        self.assertNotIn('[0:0] -A FORWARD -s 1.2.3.4/5 -j DROP', new_lines)
+        self.assertEqual([], table.remove_rules)
+
+    @mock.patch('eventlet.greenthread.spawn_after')
+    @mock.patch('time.time', return_value=100.0)
+    def test_apply_coalesced(self, mock_time, mock_spawn_after):
+        self.flags(iptables_apply_interval=5)
+        self.manager._last_apply = 98.0
+        with mock.patch.object(self.manager, '_apply') as mock_apply:
+            self.manager.apply()
+            self.manager.apply()
+            self.assertFalse(mock_apply.called)
+            mock_spawn_after.assert_called_once_with(
+                3.0, self.manager._scheduled_apply)
+
+            mock_time.return_value = 103.0
+            self.manager._scheduled_apply()
+            mock_apply.assert_called_once_with()
+
+    @mock.patch('eventlet.greenthread.spawn_after')
+    @mock.patch('time.time', return_value=100.0)
+    def test_scheduled_apply_failure_rescheduled(self, mock_time,
+                                                 mock_spawn_after):
+        self.flags(iptables_apply_interval=5)
+        self.manager._last_apply = 95.0
+        self.manager._apply_pending = True
+        with mock.patch.object(self.manager, 'execute',
+                               side_effect=RuntimeError):
+            self.manager._scheduled_apply()
+        mock_spawn_after.assert_called_once_with(
+            5, self.manager._scheduled_apply)
+        self.assertTrue(self.manager._apply_pending)
+        self.assertTrue(self.manager.dirty())
+
+    @mock.patch('eventlet.greenthread.spawn_after')
+    @mock.patch('time.time', return_value=100.0)
+    def test_apply_after_interval_is_immediate(self, mock_time,
+                                               mock_spawn_after):
+        self.flags(iptables_apply_interval=5)
+        self.manager._last_apply = 90.0
+        with mock.patch.object(self.manager, '_apply') as mock_apply:
+            self.manager.apply()
+            mock_apply.assert_called_once_with()
+        self.assertFalse(mock_spawn_after.called)
+
     def test_clean_tables_no_apply(self):
         for table in self.manager.ipv4.itervalues():
             table.dirty = False
@@ -275,3 +383,72 @@ class IptablesManagerTestCase(test.NoDBTestCase):
                                                self.manager.ipv4['filter'],
                                                'filter')
         self.assertEqual(current_lines, new_lines)
+
+
+class IpsetManagerTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(IpsetManagerTestCase, self).setUp()
+        self.execute = mock.Mock(return_value=('', ''))
+        self.manager = linux_net.IpsetManager(self.execute)
+
+    def _restore_input(self, call):
+        self.assertEqual(('ipset', '-exist', 'restore'), call[0])
+        return call[1]['process_input'].splitlines()
+
+    def test_set_members_creates_set(self):
+        self.assertTrue(self.manager.set_members('sg', ['10.0.0.2',
+                                                        '10.0.0.1']))
+        self.assertEqual(['create sg hash:ip family inet',
+                          'flush sg',
+                          'add sg 10.0.0.1',
+                          'add sg 10.0.0.2'],
+                         self._restore_input(self.execute.call_args))
+        self.assertTrue(self.manager.has_set('sg'))
+
+    def test_set_members_empty_set(self):
+        self.manager.set_members('sg', [], family='inet6')
+        self.assertEqual(['create sg hash:ip family inet6', 'flush sg'],
+                         self._restore_input(self.execute.call_args))
+
+    def test_set_members_applies_difference(self):
+        self.manager.set_members('sg', ['10.0.0.1', '10.0.0.2'])
+        self.manager.set_members('sg', ['10.0.0.2', '10.0.0.3'])
+        self.assertEqual(2, self.execute.call_count)
+        self.assertEqual(['add sg 10.0.0.3', 'del sg 10.0.0.1'],
+                         self._restore_input(self.execute.call_args))
+
+    def test_set_members_unchanged(self):
+        self.manager.set_members('sg', ['10.0.0.1'])
+        self.assertFalse(self.manager.set_members('sg', ['10.0.0.1']))
+        self.assertEqual(1, self.execute.call_count)
+
+    def test_destroy_set(self):
+        self.manager.set_members('sg', ['10.0.0.1'])
+        self.manager.destroy_set('sg')
+        self.execute.assert_called_with('ipset', 'destroy', 'sg',
+                                        run_as_root=True)
+        self.assertFalse(self.manager.has_set('sg'))
+        self.assertEqual(set(), self.manager.stale_sets)
+
+    def test_destroy_set_in_use_retried(self):
+        self.execute.side_effect = processutils.ProcessExecutionError
+        self.manager.destroy_set('sg1')
+        self.assertEqual(set(['sg1']), self.manager.stale_sets)
+
+        self.execute.side_effect = None
+        self.execute.reset_mock()
+        self.manager.destroy_set('sg2')
+        self.assertEqual([mock.call('ipset', 'destroy', 'sg1',
+                                    run_as_root=True),
+                          mock.call('ipset', 'destroy', 'sg2',
+                                    run_as_root=True)],
+                         self.execute.call_args_list)
+        self.assertEqual(set(), self.manager.stale_sets)
+
+    def test_set_members_recreates_stale_set(self):
+        self.execute.side_effect = processutils.ProcessExecutionError
+        self.manager.destroy_set('sg')
+        self.execute.side_effect = None
+        self.manager.set_members('sg', ['10.0.0.1'])
+        self.assertEqual(set(), self.manager.stale_sets)
@@ -41,8 +41,10 @@ from nova import context
 from nova import db
 from nova.db.sqlalchemy import api
 from nova import exception
+from nova import metadata_documents
 from nova.network import api as network_api
 from nova import objects
+from nova.openstack.common import jsonutils
 from nova import test
 from nova.tests import fake_block_device
 from nova.tests import fake_instance
@@ -158,6 +160,24 @@ class MetadataTestCase(test.TestCase):
         md = fake_InstanceMetadata(self.stubs, self.instance.obj_clone())
         pickle.dumps(md, protocol=0)
 
+    def test_document_round_trip(self):
+        sgroups = [dict(test_security_group.fake_secgroup, name='default'),
+                   dict(test_security_group.fake_secgroup, name='other')]
+        md = fake_InstanceMetadata(self.stubs, self.instance.obj_clone(),
+                                   address='192.168.1.1', sgroups=sgroups)
+        document = jsonutils.loads(jsonutils.dumps(md.get_document()))
+
+        stored = base.InstanceMetadata.from_document(document, '192.168.1.1')
+        self.assertEqual(md.get_ec2_metadata('latest'),
+                         stored.get_ec2_metadata('latest'))
+        for path in ('/openstack/%s/meta_data.json' % base.FOLSOM,
+                     '/openstack/latest/vendor_data.json',
+                     '/openstack/latest/user_data',
+                     '/openstack/latest'):
+            self.assertEqual(md.lookup(path), stored.lookup(path))
+        self.assertEqual(md.password, stored.password)
+        self.assertEqual(md.instance.uuid, stored.instance.uuid)
+
     def test_user_data(self):
         inst = self.instance.obj_clone()
         inst['user_data'] = base64.b64encode("happy")
@@ -558,6 +578,8 @@ class MetadataHandlerTestCase(test.TestCase):
         self.flags(use_local=True, group='conductor')
         self.mdinst = fake_InstanceMetadata(self.stubs, self.instance,
             address=None, sgroups=None)
+        metadata_documents.reset_cache()
+        self.addCleanup(metadata_documents.reset_cache)
 
     def test_callable(self):
 
@@ -573,6 +595,31 @@ class MetadataHandlerTestCase(test.TestCase):
         self.assertEqual(response.status_int, 200)
         self.assertEqual(response.body, "foo")
 
+    def test_metadata_document_stored(self):
+        md = fake_InstanceMetadata(self.stubs, self.instance,
+                                   address='192.168.1.2')
+        hnd = handler.MetadataRequestHandler()
+
+        with mock.patch.object(base, 'get_metadata_by_address',
+                               return_value=md) as mock_get:
+            hnd.get_metadata_by_remote_address('192.168.1.2')
+            stored = hnd.get_metadata_by_remote_address('192.168.1.2')
+        mock_get.assert_called_once_with(hnd.conductor_api, '192.168.1.2')
+        self.assertEqual('192.168.1.2', stored.address)
+        self.assertEqual(md.get_ec2_metadata('latest'),
+                         stored.get_ec2_metadata('latest'))
+
+        with mock.patch.object(base,
+                               'get_metadata_by_instance_id') as mock_get:
+            stored = hnd.get_metadata_by_instance_id(self.instance.uuid,
+                                                     '192.168.1.3')
+        self.assertFalse(mock_get.called)
+        self.assertEqual('192.168.1.3', stored.address)
+
+        metadata_documents.invalidate_document(self.instance.uuid)
+        self.assertIsNone(
+            metadata_documents.get_document_by_address('192.168.1.2'))
+
     def test_root(self):
         expected = "\n".join(base.VERSIONS) + "\nlatest"
         response = fake_request(self.stubs, self.mdinst, "/")
@@ -0,0 +1,82 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Tests for the store of metadata documents
+"""
+
+import mock
+
+from nova import metadata_documents
+from nova import test
+
+UUID = 'b65cee2f-8c69-4aeb-be2f-f79742548fc2'
+ADDRESSES = ['10.0.0.2', 'fe80::2']
+
+
+class MetadataDocumentsTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(MetadataDocumentsTestCase, self).setUp()
+        metadata_documents.reset_cache()
+        self.addCleanup(metadata_documents.reset_cache)
+
+    def test_store_document(self):
+        metadata_documents.store_document(UUID, ADDRESSES, {'foo': 'bar'})
+        expected = {'foo': 'bar', 'addresses': ADDRESSES}
+        self.assertEqual(expected, metadata_documents.get_document(UUID))
+        for address in ADDRESSES:
+            self.assertEqual(
+                expected, metadata_documents.get_document_by_address(address))
+        self.assertIsNone(
+            metadata_documents.get_document_by_address('10.0.0.3'))
+
+    def test_store_document_expiration(self):
+        self.flags(metadata_document_expiration=30)
+        cache = metadata_documents._get_cache()
+        with mock.patch.object(cache, 'set') as mock_set:
+            metadata_documents.store_document(UUID, ['10.0.0.2'], {})
+        self.assertEqual(
+            [mock.call('metadata-document-%s' % UUID, mock.ANY, 30),
+             mock.call('metadata-address-10.0.0.2', UUID, 30)],
+            mock_set.call_args_list)
+
+    def test_invalidate_document(self):
+        metadata_documents.store_document(UUID, ADDRESSES, {})
+        metadata_documents.store_document('other-uuid', ['10.0.0.3'], {})
+
+        metadata_documents.invalidate_document(UUID)
+        self.assertIsNone(metadata_documents.get_document(UUID))
+        for address in ADDRESSES:
+            self.assertIsNone(
+                metadata_documents.get_document_by_address(address))
+        self.assertIsNotNone(
+            metadata_documents.get_document_by_address('10.0.0.3'))
+        # Nothing left to drop
+        metadata_documents.invalidate_document(UUID)
+
+    def test_address_given_to_another_instance(self):
+        metadata_documents.store_document(UUID, ADDRESSES, {})
+        # The previous owner of the address is stored again without it,
+        # e.g. once its document was evicted, leaving the pointer behind.
+        metadata_documents.store_document(UUID, ['10.0.0.4'], {})
+        self.assertIsNone(
+            metadata_documents.get_document_by_address('10.0.0.2'))
+
+        metadata_documents.store_document('other-uuid', ['10.0.0.2'],
+                                          {'foo': 'bar'})
+        self.assertEqual(
+            {'foo': 'bar', 'addresses': ['10.0.0.2']},
+            metadata_documents.get_document_by_address('10.0.0.2'))
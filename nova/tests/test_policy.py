@@ -57,6 +57,24 @@ class PolicyFileTestCase(test.NoDBTestCase):
             self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
                               self.context, action, self.target)
 
+    def test_policy_file_reload_changes_generation(self):
+        with utils.tempdir() as tmpdir:
+            tmpfilename = os.path.join(tmpdir, 'policy')
+            with open(tmpfilename, "w") as policyfile:
+                policyfile.write('{"example:test": ""}')
+            self.flags(policy_file=tmpfilename)
+            policy.reset()
+            policy.init()
+            policy.enforce(self.context, "example:test", self.target)
+            generation = policy._ENFORCER.generation
+
+            with open(tmpfilename, "w") as policyfile:
+                policyfile.write('{"example:test": "!"}')
+            policy._ENFORCER.load_rules(force_reload=True)
+            self.assertNotEqual(generation, policy._ENFORCER.generation)
+            self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                              self.context, "example:test", self.target)
+
 
 class PolicyTestCase(test.NoDBTestCase):
     def setUp(self):
@@ -144,6 +162,47 @@ class PolicyTestCase(test.NoDBTestCase):
         policy.enforce(admin_context, lowercase_action, self.target)
         policy.enforce(admin_context, uppercase_action, self.target)
 
+    def test_enforce_memoized(self):
+        action = "example:my_file"
+        target_mine = {'project_id': 'fake'}
+        with mock.patch.object(policy._ENFORCER, 'enforce',
+                               wraps=policy._ENFORCER.enforce) as enforce:
+            for i in range(3):
+                policy.enforce(self.context, action, dict(target_mine))
+            self.assertEqual(1, enforce.call_count)
+
+            self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                              self.context, action, {'project_id': 'other'})
+            self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                              self.context, action, {'project_id': 'other'})
+            self.assertEqual(2, enforce.call_count)
+
+            # Changes to the credentials the rule reads are seen
+            self.context.roles.append('compute_admin')
+            policy.enforce(self.context, action, {'project_id': 'other'})
+            self.assertEqual(3, enforce.call_count)
+
+    def test_enforce_memo_reset_by_new_rules(self):
+        action = "example:allowed"
+        policy.enforce(self.context, action, self.target)
+        policy.set_rules({action: common_policy.parse_rule('!')})
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, action, self.target)
+
+    @mock.patch.object(urlrequest, 'urlopen')
+    def test_enforce_http_not_memoized(self, mock_urlrequest):
+        mock_urlrequest.side_effect = lambda *a: StringIO.StringIO("True")
+        action = "example:get_http"
+        policy.enforce(self.context, action, {})
+        policy.enforce(self.context, action, {})
+        self.assertEqual(2, mock_urlrequest.call_count)
+
+    def test_get_dependencies(self):
+        self.assertEqual((['project_id', 'roles'], ['project_id']),
+                         policy._get_dependencies("example:my_file"))
+        self.assertEqual(([], []), policy._get_dependencies("true"))
+        self.assertIsNone(policy._get_dependencies("example:get_http"))
+
 
 class DefaultPolicyTestCase(test.NoDBTestCase):
 
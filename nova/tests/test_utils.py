@@ -20,11 +20,16 @@ import importlib
 import os
 import os.path
 import StringIO
+import sys
 import tempfile
 
+import fixtures
+import mock
 import mox
 import netaddr
 from oslo.config import cfg
+from oslo.rootwrap import client as rootwrap_client
+from oslo.rootwrap import wrapper as rootwrap_wrapper
 
 import nova
 from nova import exception
@@ -573,6 +578,131 @@ class MkfsTestCase(test.NoDBTestCase):
         utils.mkfs('swap', '/my/swap/block/dev', 'swap-vol')
 
 
+class RootwrapDaemonTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(RootwrapDaemonTestCase, self).setUp()
+        self.flags(use_rootwrap_daemon=True,
+                   rootwrap_config='/etc/nova/rootwrap.conf')
+        self.stubs.Set(utils, '_ROOTWRAP_DAEMON_CLIENTS', {})
+        self.stubs.Set(os, 'geteuid', lambda: 1000)
+        self.client = mock.Mock()
+        self.client.execute.return_value = (0, 'out', 'err')
+        self.stubs.Set(utils, '_get_rootwrap_daemon_client',
+                       lambda: self.client)
+
+    def test_execute(self):
+        self.assertEqual(('out', 'err'),
+                         utils.execute('ip', 'link', 1, run_as_root=True,
+                                       process_input='in',
+                                       env_variables={'LC_ALL': 'C'}))
+        self.client.execute.assert_called_once_with(
+            ['ip', 'link', '1'], {'LC_ALL': 'C'}, 'in')
+
+    def test_execute_failure(self):
+        self.client.execute.return_value = (1, 'out', 'err')
+        self.assertRaises(processutils.ProcessExecutionError,
+                          utils.execute, 'ip', run_as_root=True,
+                          attempts=2, delay_on_retry=False)
+        self.assertEqual(2, self.client.execute.call_count)
+
+    def test_execute_check_exit_code(self):
+        self.client.execute.return_value = (2, 'out', 'err')
+        self.assertEqual(('out', 'err'),
+                         utils.execute('ip', run_as_root=True,
+                                       check_exit_code=[0, 2]))
+        self.assertEqual(('out', 'err'),
+                         utils.execute('ip', run_as_root=True,
+                                       check_exit_code=False))
+
+    def test_execute_unauthorized(self):
+        self.client.execute.side_effect = rootwrap_wrapper.NoFilterMatched()
+        exc = self.assertRaises(processutils.ProcessExecutionError,
+                                utils.execute, 'rm', '-rf', '/',
+                                run_as_root=True)
+        self.assertEqual(99, exc.exit_code)
+        self.assertIn('Unauthorized command: rm -rf /', exc.stderr)
+
+    def test_execute_daemon_failure(self):
+        self.client.execute.side_effect = EOFError()
+        exc = self.assertRaises(processutils.ProcessExecutionError,
+                                utils.execute, 'ip', run_as_root=True,
+                                check_exit_code=False, attempts=2,
+                                delay_on_retry=False)
+        self.assertIsNone(exc.exit_code)
+        self.assertEqual(2, self.client.execute.call_count)
+
+    def test_execute_missing_executable(self):
+        # Runs a real daemon, without sudo, for the error it really sends
+        # back when the executable of the matching filter is missing.
+        tmpdir = self.useFixture(fixtures.TempDir()).path
+        filters_path = os.path.join(tmpdir, 'rootwrap.d')
+        os.mkdir(filters_path)
+        config = os.path.join(tmpdir, 'rootwrap.conf')
+        with open(config, 'w') as config_file:
+            config_file.write('[DEFAULT]\n'
+                              'filters_path=%s\n'
+                              'exec_dirs=/sbin,/usr/sbin,/bin,/usr/bin\n'
+                              'use_syslog=False\n' % filters_path)
+        with open(os.path.join(filters_path, 'test.filters'), 'w') as filters:
+            filters.write('[Filters]\n'
+                          'missing: CommandFilter, nova-no-such-binary, '
+                          'root\n')
+        client = rootwrap_client.Client(
+            [sys.executable, '-c',
+             'import sys; from oslo.rootwrap import cmd; '
+             'sys.argv = ["nova-rootwrap-daemon", %r]; cmd.daemon()' %
+             config])
+        self.addCleanup(lambda: client._finalize and client._finalize())
+        self.stubs.Set(utils, '_get_rootwrap_daemon_client', lambda: client)
+
+        exc = self.assertRaises(processutils.ProcessExecutionError,
+                                utils.execute, 'nova-no-such-binary',
+                                run_as_root=True)
+        self.assertIn('CommandFilter', exc.stderr)
+        out, err = utils.trycmd('nova-no-such-binary', run_as_root=True)
+        self.assertEqual('', out)
+        self.assertIn('CommandFilter', err)
+
+    def test_execute_unknown_argument(self):
+        self.assertRaises(processutils.UnknownArgumentError,
+                          utils.execute, 'ip', run_as_root=True, foo='bar')
+
+    def test_trycmd(self):
+        self.assertEqual(('out', ''),
+                         utils.trycmd('ip', run_as_root=True,
+                                      discard_warnings=True))
+        self.client.execute.return_value = (1, 'out', 'err')
+        out, err = utils.trycmd('ip', run_as_root=True)
+        self.assertEqual('', out)
+        self.assertIn('err', err)
+
+    @mock.patch.object(processutils, 'execute')
+    def test_execute_without_daemon(self, mock_execute):
+        utils.execute('ip')
+        utils.execute('ip', run_as_root=True, root_helper='sudo')
+        self.flags(use_rootwrap_daemon=False)
+        utils.execute('ip', run_as_root=True)
+        self.assertEqual(
+            [mock.call('ip'),
+             mock.call('ip', run_as_root=True, root_helper='sudo'),
+             mock.call('ip', run_as_root=True,
+                       root_helper='sudo nova-rootwrap '
+                                   '/etc/nova/rootwrap.conf')],
+            mock_execute.call_args_list)
+        self.assertFalse(self.client.execute.called)
+
+    def test_get_rootwrap_daemon_client(self):
+        self.stubs.UnsetAll()
+        self.stubs.Set(utils, '_ROOTWRAP_DAEMON_CLIENTS', {})
+        with mock.patch('oslo.rootwrap.client.Client') as mock_client:
+            client = utils._get_rootwrap_daemon_client()
+            self.assertIs(client, utils._get_rootwrap_daemon_client())
+        mock_client.assert_called_once_with(
+            ['sudo', 'nova-rootwrap-daemon', '/etc/nova/rootwrap.conf'])
+        self.assertIs(mock_client.return_value, client)
+
+
 class LastBytesTestCase(test.NoDBTestCase):
     """Test the last_bytes() utility method."""
 
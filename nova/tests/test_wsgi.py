@@ -171,6 +171,79 @@ class TestWSGIServer(test.NoDBTestCase):
         server.start()
         self.assertEqual(server._pool.size, CONF.wsgi_default_pool_size)
 
+    def _get(self, server):
+        resp = requests.get("http://127.0.0.1:%d/" % server.port,
+                            proxies={"http": ""})
+        eventlet.sleep(0)
+        return resp
+
+    def _pong_app(self, env, start_response):
+        start_response('200 OK', [])
+        return ['PONG']
+
+    def test_reuse_port(self):
+        self.flags(wsgi_reuse_port=True)
+        server = nova.wsgi.Server("test_reuse_port", self._pong_app,
+                                  host="127.0.0.1", port=0)
+        self.assertNotEqual(0, server.port)
+        # Each worker listens on the port with a socket of its own.
+        server.start()
+        worker = nova.wsgi.Server("test_reuse_port", self._pong_app,
+                                  host="127.0.0.1", port=server.port)
+        worker.start()
+
+        self.assertEqual('PONG', self._get(server).text)
+
+        server.stop()
+        server.wait()
+        self.assertEqual('PONG', self._get(worker).text)
+        worker.stop()
+        worker.wait()
+
+    def test_request_stats(self):
+        self.flags(wsgi_stats_interval=60)
+        server = nova.wsgi.Server("test_stats", self._pong_app,
+                                  host="127.0.0.1", port=0)
+        server.start()
+        self._get(server)
+        self._get(server)
+
+        stats = server.get_stats()
+        self.assertEqual(os.getpid(), stats['pid'])
+        self.assertEqual(2, stats['requests'])
+        self.assertEqual(2, sum(count for _bound, count in stats['latency']))
+        self.assertIsNone(stats['latency'][-1][0])
+        server.stop()
+        server.wait()
+
+    @mock.patch('os._exit')
+    def test_worker_recycled(self, mock_exit):
+        self.flags(wsgi_max_requests_per_worker=2)
+        server = nova.wsgi.Server("test_recycle", self._pong_app,
+                                  host="127.0.0.1", port=0)
+        # Pretend the server was forked into a worker process
+        server._parent_pid = -1
+        server.start()
+
+        self.assertEqual(200, self._get(server).status_code)
+        self.assertFalse(mock_exit.called)
+        self.assertEqual(200, self._get(server).status_code)
+        server.wait()
+        mock_exit.assert_called_once_with(0)
+        self.assertEqual(0, server._pool.size)
+
+    @mock.patch('os._exit')
+    def test_worker_not_recycled_without_fork(self, mock_exit):
+        self.flags(wsgi_max_requests_per_worker=1)
+        server = nova.wsgi.Server("test_recycle", self._pong_app,
+                                  host="127.0.0.1", port=0)
+        server.start()
+        self._get(server)
+        self._get(server)
+        self.assertFalse(mock_exit.called)
+        server.stop()
+        server.wait()
+
 
 class TestWSGIServerWithSSL(test.NoDBTestCase):
     """WSGI server with SSL tests."""
@@ -54,6 +54,31 @@ class LibvirtConfigTest(LibvirtConfigBaseTest):
         obj = config.LibvirtConfigObject(root_name="demo")
         obj.parse_str(inxml)
 
+    def test_config_freeze(self):
+        obj = config.LibvirtConfigGuestCPUFeature("mtrr")
+        self.assertIs(obj, obj.freeze())
+
+        # Later changes are not reflected in the pre-rendered XML
+        obj.name = "apic"
+        self.assertXmlEqual(obj.to_xml(), """
+            <feature name="mtrr" policy="require"/>""")
+
+        # Each call hands out a separate copy of the element
+        self.assertIsNot(obj.format_dom(), obj.format_dom())
+
+    def test_config_freeze_child(self):
+        cpu = config.LibvirtConfigGuestCPU()
+        cpu.model = "Penryn"
+        cpu.add_feature(config.LibvirtConfigGuestCPUFeature("mtrr").freeze())
+        cpu.add_feature(config.LibvirtConfigGuestCPUFeature("apic"))
+
+        self.assertXmlEqual(cpu.to_xml(), """
+            <cpu match="exact">
+              <model>Penryn</model>
+              <feature name="apic" policy="require"/>
+              <feature name="mtrr" policy="require"/>
+            </cpu>""")
+
 
 class LibvirtConfigCapsTest(LibvirtConfigBaseTest):
 
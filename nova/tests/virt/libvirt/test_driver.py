@@ -79,6 +79,7 @@ from nova.virt.libvirt import config as vconfig
 from nova.virt.libvirt import driver as libvirt_driver
 from nova.virt.libvirt import firewall
 from nova.virt.libvirt import imagebackend
+from nova.virt.libvirt import imagecopy
 from nova.virt.libvirt import utils as libvirt_utils
 from nova.virt import netutils
 
@@ -1023,6 +1024,52 @@ class LibvirtConnTestCase(test.TestCase,
             self.assertRaises(libvirt.libvirtError,
                               conn._get_host_capabilities)
 
+    def test_new_connection_invalidates_host_caches(self):
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), True)
+        caps = conn._get_host_capabilities()
+        conn._get_host_cpu_for_guest()
+        self.assertIsNotNone(conn._host_cpu_features)
+
+        with contextlib.nested(
+            mock.patch.object(conn, "_connect", return_value=self.conn),
+            mock.patch.object(conn, "_set_host_enabled")):
+            conn._get_new_connection()
+
+        self.assertIsNone(conn._caps)
+        self.assertIsNone(conn._host_cpu_features)
+        self.assertIsNone(conn._host_sysinfo)
+        self.assertIsNot(caps, conn._get_host_capabilities())
+
+    def test_get_host_cpu_for_guest_reuses_features(self):
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), True)
+
+        cpu1 = conn._get_host_cpu_for_guest()
+        cpu2 = conn._get_host_cpu_for_guest()
+
+        self.assertIsNot(cpu1.features, cpu2.features)
+        self.assertEqual(set(id(f) for f in cpu1.features),
+                         set(id(f) for f in cpu2.features))
+        self.assertEqual(cpu1.to_xml(), cpu2.to_xml())
+
+        # Changing the capabilities rebuilds the feature list
+        conn._caps = None
+        cpu3 = conn._get_host_cpu_for_guest()
+        self.assertNotEqual(set(id(f) for f in cpu1.features),
+                            set(id(f) for f in cpu3.features))
+
+    def test_get_guest_config_sysinfo_cached(self):
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), True)
+
+        with mock.patch.object(conn, '_get_host_uuid',
+                               return_value='fake-serial') as mock_uuid:
+            sysinfo1 = conn._get_guest_config_sysinfo({'uuid': 'uuid1'})
+            sysinfo2 = conn._get_guest_config_sysinfo({'uuid': 'uuid2'})
+
+        self.assertEqual(1, mock_uuid.call_count)
+        self.assertEqual('fake-serial', sysinfo2.system_serial)
+        self.assertEqual('uuid1', sysinfo1.system_uuid)
+        self.assertEqual('uuid2', sysinfo2.system_uuid)
+
     def test_lxc_get_host_capabilities_failed(self):
         conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), True)
 
@@ -8516,6 +8563,198 @@ class IptablesFirewallTestCase(test.TestCase):
                                                    any_order=True)
             self.assertEqual(0, mock_filter.add_chain.call_count)
 
+    def _setup_ipset_groups(self):
+        admin_ctxt = context.get_admin_context()
+        instance_ref = self._create_instance_ref()
+        src_instance_ref = self._create_instance_ref()
+        secgroup = db.security_group_create(admin_ctxt,
+                                            {'user_id': 'fake',
+                                             'project_id': 'fake',
+                                             'name': 'testgroup',
+                                             'description': 'test group'})
+        src_secgroup = db.security_group_create(admin_ctxt,
+                                                {'user_id': 'fake',
+                                                 'project_id': 'fake',
+                                                 'name': 'testsourcegroup',
+                                                 'description': 'src group'})
+        db.security_group_rule_create(admin_ctxt,
+                                      {'parent_group_id': secgroup['id'],
+                                       'protocol': 'tcp',
+                                       'from_port': 22,
+                                       'to_port': 22,
+                                       'group_id': src_secgroup['id']})
+        db.instance_add_security_group(admin_ctxt, instance_ref['uuid'],
+                                       secgroup['id'])
+        db.instance_add_security_group(admin_ctxt, src_instance_ref['uuid'],
+                                       src_secgroup['id'])
+        instance_ref = db.instance_get(admin_ctxt, instance_ref['id'])
+
+        network_model = _fake_network_info(self.stubs, 2)
+        from nova.compute import utils as compute_utils  # noqa
+        self.stubs.Set(compute_utils, 'get_nw_info_for_instance',
+                       lambda instance: network_model)
+        return instance_ref, src_secgroup, network_model
+
+    def test_instance_rules_ipset(self):
+        self.flags(use_ipset=True)
+        self.fw = firewall.IptablesFirewallDriver(
+                      fake.FakeVirtAPI(),
+                      get_connection=lambda: self.fake_libvirt_connection)
+        instance_ref, src_secgroup, network_model = self._setup_ipset_groups()
+
+        with mock.patch.object(self.fw.ipset, 'set_members') as mock_set:
+            ipv4_rules, ipv6_rules = self.fw.instance_rules(instance_ref,
+                                                            network_model)
+
+        set_name = 'nova-sg4-%s' % src_secgroup['id']
+        ips = [ip['address'] for ip in network_model.fixed_ips()
+               if ip['version'] == 4]
+        mock_set.assert_called_once_with(set_name, ips, family='inet')
+        grantee_rules = [rule for rule in ipv4_rules if '--dport 22' in rule]
+        self.assertEqual(['-j ACCEPT -p tcp --dport 22 '
+                          '-m set --match-set %s src' % set_name],
+                         grantee_rules)
+
+    def test_refresh_security_group_members_ipset(self):
+        self.flags(use_ipset=True)
+        self.fw = firewall.IptablesFirewallDriver(
+                      fake.FakeVirtAPI(),
+                      get_connection=lambda: self.fake_libvirt_connection)
+        instance_ref, src_secgroup, network_model = self._setup_ipset_groups()
+        self.fw.ipset.execute = mock.Mock(return_value=('', ''))
+        self.fw.instance_rules(instance_ref, network_model)
+        self.fw.ipset.execute.reset_mock()
+
+        with contextlib.nested(
+            mock.patch.object(self.fw, 'do_refresh_security_group_rules'),
+            mock.patch.object(self.fw.iptables, 'apply'),
+            mock.patch.object(self.fw.ipset, 'set_members'),
+        ) as (mock_refresh, mock_apply, mock_set):
+            self.fw.refresh_security_group_members(src_secgroup['id'])
+            # A group no rule on this host refers to is ignored.
+            self.fw.refresh_security_group_members(src_secgroup['id'] + 1)
+
+        self.assertFalse(mock_refresh.called)
+        self.assertFalse(mock_apply.called)
+        mock_set.assert_called_once_with('nova-sg4-%s' % src_secgroup['id'],
+                                         mock.ANY, family='inet')
+
+    def test_unfilter_instance_destroys_unused_ipsets(self):
+        self.flags(use_ipset=True)
+        self.fw = firewall.IptablesFirewallDriver(
+                      fake.FakeVirtAPI(),
+                      get_connection=lambda: self.fake_libvirt_connection)
+        self.fw.ipset.sets = {'nova-sg4-1': set(), 'nova-sg4-2': set()}
+        self.fw.instance_info = {1: ({'id': 1}, []), 2: ({'id': 2}, [])}
+        self.fw._instance_groups = {1: set([1, 2]), 2: set([2])}
+
+        with contextlib.nested(
+            mock.patch.object(self.fw, 'remove_filters_for_instance'),
+            mock.patch.object(self.fw.iptables, 'apply'),
+            mock.patch.object(self.fw.ipset, 'destroy_set'),
+        ) as (mock_remove, mock_apply, mock_destroy):
+            self.fw.unfilter_instance({'id': 1}, [])
+            # Group 2 is still referred to by instance 2.
+            mock_destroy.assert_called_once_with('nova-sg4-1')
+            mock_destroy.reset_mock()
+            self.fw.unfilter_instance({'id': 2}, [])
+            mock_destroy.assert_called_once_with('nova-sg4-2')
+
+    def test_refresh_security_group_members_without_ipset(self):
+        with contextlib.nested(
+            mock.patch.object(self.fw, 'do_refresh_security_group_rules'),
+            mock.patch.object(self.fw.iptables, 'apply'),
+        ) as (mock_refresh, mock_apply):
+            self.fw.refresh_security_group_members('fake')
+        mock_refresh.assert_called_once_with('fake')
+        mock_apply.assert_called_once_with()
+
+    def test_instance_rules_cached(self):
+        instance_ref, src_secgroup, network_model = self._setup_ipset_groups()
+        secgroup = objects.SecurityGroupList.get_by_instance(
+            self.context, objects.Instance(uuid=instance_ref['uuid']))[0]
+
+        get_rules = objects.SecurityGroupRuleList.get_by_security_group
+        get_members = objects.InstanceList.get_by_security_group_id
+        with contextlib.nested(
+            mock.patch.object(objects.SecurityGroupRuleList,
+                              'get_by_security_group',
+                              side_effect=get_rules),
+            mock.patch.object(objects.InstanceList,
+                              'get_by_security_group_id',
+                              side_effect=get_members),
+        ) as (mock_rules, mock_members):
+            first = self.fw.instance_rules(instance_ref, network_model)
+            second = self.fw.instance_rules(instance_ref, network_model)
+            self.assertEqual(first, second)
+            self.assertEqual(1, mock_rules.call_count)
+            self.assertEqual(1, mock_members.call_count)
+
+            with mock.patch.object(self.fw, 'do_refresh_security_group_rules'):
+                self.fw.refresh_security_group_rules(secgroup.id)
+            self.assertEqual(first, self.fw.instance_rules(instance_ref,
+                                                           network_model))
+            self.assertEqual(2, mock_rules.call_count)
+            # The members of the grantee group were not invalidated.
+            self.assertEqual(1, mock_members.call_count)
+
+        self.assertEqual(set([secgroup.id, src_secgroup['id']]),
+                         self.fw._instance_groups[instance_ref['id']])
+
+    def test_refresh_instance_security_rules_invalidates_groups(self):
+        instance = {'id': 1, 'uuid': 'fake-uuid1'}
+        self.fw._instance_groups = {1: set([10, 20])}
+        with mock.patch.object(self.fw, 'do_refresh_instance_rules'):
+            self.fw.refresh_instance_security_rules(instance)
+        self.assertEqual({10: 1, 20: 1}, self.fw._security_group_revisions)
+
+    def test_do_refresh_security_group_rules_affected_only(self):
+        instances = dict((i, {'id': i, 'uuid': 'fake-uuid%d' % i})
+                         for i in range(1, 5))
+        self.fw.instance_info = dict((i, (inst, 'netinfo%d' % i))
+                                     for i, inst in instances.items())
+        # 1 uses the group, 2 does not, 3 just joined it and the groups of
+        # 4 are not known.
+        self.fw._instance_groups = {1: set([10]), 2: set([20]),
+                                    3: set([20])}
+        with contextlib.nested(
+            mock.patch.object(self.fw, '_security_group_instance_ids',
+                              return_value=set([3])),
+            mock.patch.object(self.fw, 'instance_rules',
+                              return_value=(None, None)),
+            mock.patch.object(self.fw, '_inner_do_refresh_many_rules'),
+        ) as (mock_ids, mock_ir, mock_inner):
+            self.fw.do_refresh_security_group_rules(10)
+
+        mock_ids.assert_called_once_with(10)
+        refreshed = [instances[1], instances[3], instances[4]]
+        self.assertEqual(refreshed,
+                         sorted(c[0][0] for c in mock_ir.call_args_list))
+        self.assertEqual(refreshed,
+                         sorted(r[0] for r in mock_inner.call_args[0][0]))
+
+    def test_refresh_instance_chains_unchanged(self):
+        instance_ref = self._create_instance_ref()
+        network_info = _fake_network_info(self.stubs, 1)
+        self.fw.prepare_instance_filter(instance_ref, network_info)
+        ipv4_rules, ipv6_rules = self.fw.instance_rules(instance_ref,
+                                                        network_info)
+        with contextlib.nested(
+            mock.patch.object(self.fw, 'remove_filters_for_instances'),
+            mock.patch.object(self.fw, 'add_filters_for_instance'),
+        ) as (mock_remove, mock_add):
+            self.fw._inner_do_refresh_rules(instance_ref, network_info,
+                                            ipv4_rules, ipv6_rules)
+            self.assertFalse(mock_remove.called)
+            self.assertFalse(mock_add.called)
+
+            ipv4_rules.insert(-1, '-j ACCEPT -p tcp --dport 22')
+            self.fw._inner_do_refresh_rules(instance_ref, network_info,
+                                            ipv4_rules, ipv6_rules)
+            mock_remove.assert_called_once_with([instance_ref])
+            mock_add.assert_called_once_with(instance_ref, network_info,
+                                             ipv4_rules, ipv6_rules)
+
     def test_unfilter_instance_undefines_nwfilter(self):
         admin_ctxt = context.get_admin_context()
 
@@ -9295,6 +9534,7 @@ class LibvirtDriverTestCase(test.TestCase):
         self.stubs.Set(self.libvirtconnection, 'get_host_ip_addr',
                        fake_get_host_ip_addr)
         self.stubs.Set(utils, 'execute', fake_execute)
+        self.stubs.Set(imagecopy, 'copy_file', fake_execute)
 
         ins_ref = self._create_instance()
         flavor = {'root_gb': 10, 'ephemeral_gb': 20}
@@ -0,0 +1,129 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import os
+
+import fixtures
+import mock
+
+from nova import test
+from nova.virt.libvirt import imagecopy
+
+
+class ImageCopyTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(ImageCopyTestCase, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.src = os.path.join(self.tmpdir, 'src')
+        self.dest = os.path.join(self.tmpdir, 'dest')
+        # Keep the tests deterministic regardless of the filesystem the
+        # temporary directory happens to live on.
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.virt.libvirt.imagecopy._reflink',
+            lambda src_fd, dst_fd: False))
+
+    def _write_sparse(self, extents, size):
+        with open(self.src, 'wb') as f:
+            for offset, data in extents:
+                f.seek(offset)
+                f.write(data)
+            f.truncate(size)
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_copy_sparse_file(self):
+        size = 8 * imagecopy.CHUNK_SIZE
+        self._write_sparse([(0, b'head'),
+                            (5 * imagecopy.CHUNK_SIZE, b'middle')], size)
+
+        stats = imagecopy.copy_file(self.src, self.dest)
+
+        self.assertEqual(self._read(self.src), self._read(self.dest))
+        self.assertEqual(size, stats.size)
+        self.assertEqual(size, stats.copied + stats.skipped)
+        self.assertTrue(stats.skipped >= 6 * imagecopy.CHUNK_SIZE)
+
+    def test_copy_trailing_hole(self):
+        self._write_sparse([(0, b'data')], 3 * imagecopy.CHUNK_SIZE)
+
+        imagecopy.copy_file(self.src, self.dest)
+
+        self.assertEqual(3 * imagecopy.CHUNK_SIZE,
+                         os.path.getsize(self.dest))
+        self.assertEqual(self._read(self.src), self._read(self.dest))
+
+    def test_copy_empty_file(self):
+        self._write_sparse([], 0)
+
+        stats = imagecopy.copy_file(self.src, self.dest)
+
+        self.assertEqual(0, os.path.getsize(self.dest))
+        self.assertEqual(0, stats.copied)
+
+    def test_copy_truncates_existing_dest(self):
+        self._write_sparse([(0, b'new')], 3)
+        with open(self.dest, 'wb') as f:
+            f.write(b'old contents')
+
+        imagecopy.copy_file(self.src, self.dest)
+
+        self.assertEqual(b'new', self._read(self.dest))
+
+    @mock.patch('os.lseek', side_effect=OSError(errno.EINVAL, 'EINVAL'))
+    def test_data_extents_unsupported(self, mock_lseek):
+        self.assertEqual([(0, 10)],
+                         list(imagecopy._data_extents(42, 10)))
+
+    def test_buffered_copy_skips_zero_blocks(self):
+        data = b'x' * imagecopy.CHUNK_SIZE + b'\0' * imagecopy.CHUNK_SIZE
+        self._write_sparse([(0, data)], len(data))
+        src_fd = os.open(self.src, os.O_RDONLY)
+        dst_fd = os.open(self.dest, os.O_WRONLY | os.O_CREAT)
+        try:
+            stats = imagecopy.CopyStats('buffered', len(data))
+            imagecopy._copy_range_buffered(src_fd, dst_fd, 0, len(data),
+                                           stats)
+            os.ftruncate(dst_fd, len(data))
+        finally:
+            os.close(src_fd)
+            os.close(dst_fd)
+
+        self.assertEqual(data, self._read(self.dest))
+        self.assertEqual(imagecopy.CHUNK_SIZE, stats.copied)
+        self.assertEqual(imagecopy.CHUNK_SIZE, stats.skipped)
+
+    def test_reflink(self):
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.virt.libvirt.imagecopy._reflink',
+            lambda src_fd, dst_fd: True))
+        self._write_sparse([(0, b'data')], 4)
+
+        stats = imagecopy.copy_file(self.src, self.dest)
+
+        self.assertEqual('reflink', stats.method)
+        self.assertEqual(0, stats.copied)
+
+    @mock.patch('fcntl.ioctl', side_effect=IOError(errno.EOPNOTSUPP, 'no'))
+    def test_reflink_unsupported(self, mock_ioctl):
+        self.assertFalse(_reflink(1, 2))
+        mock_ioctl.assert_called_once_with(2, imagecopy.FICLONE, 1)
+
+    @mock.patch('fcntl.ioctl', side_effect=IOError(errno.EIO, 'EIO'))
+    def test_reflink_io_error(self, mock_ioctl):
+        self.assertRaises(IOError, _reflink, 1, 2)
+
+
+# The real implementation, as setUp() replaces it for the copy tests.
+_reflink = imagecopy._reflink
@@ -16,6 +16,7 @@
 import functools
 import os
 
+import fixtures
 import mock
 from oslo.config import cfg
 
@@ -89,9 +90,24 @@ blah BLAH: bb
 
     @mock.patch('nova.utils.execute')
     def test_copy_image_local_cp(self, mock_execute):
+        self.flags(sparse_image_copy=False, group='libvirt')
         libvirt_utils.copy_image('src', 'dest')
         mock_execute.assert_called_once_with('cp', 'src', 'dest')
 
+    @mock.patch('nova.utils.execute')
+    @mock.patch('nova.virt.libvirt.imagecopy.copy_file')
+    def test_copy_image_local_sparse(self, mock_copy_file, mock_execute):
+        libvirt_utils.copy_image('src', 'dest')
+        mock_copy_file.assert_called_once_with('src', 'dest')
+        self.assertFalse(mock_execute.called)
+
+    @mock.patch('nova.virt.libvirt.imagecopy.copy_file')
+    def test_copy_image_local_sparse_to_directory(self, mock_copy_file):
+        dest = self.useFixture(fixtures.TempDir()).path
+        libvirt_utils.copy_image('/base/src', dest)
+        mock_copy_file.assert_called_once_with('/base/src',
+                                               os.path.join(dest, 'src'))
+
     _rsync_call = functools.partial(mock.call,
                                     'rsync', '--sparse', '--compress')
 
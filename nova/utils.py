@@ -23,6 +23,7 @@ import functools
 import hashlib
 import hmac
 import inspect
+import logging as std_logging
 import os
 import pyclbr
 import random
@@ -38,6 +39,7 @@ import eventlet
 import netaddr
 from oslo.config import cfg
 from oslo import messaging
+from oslo.rootwrap import wrapper as rootwrap_wrapper
 import six
 
 from nova import exception
@@ -74,6 +76,12 @@ utils_opts = [
                default="/etc/nova/rootwrap.conf",
                help='Path to the rootwrap configuration file to use for '
                     'running commands as root'),
+    cfg.BoolOpt('use_rootwrap_daemon',
+                default=False,
+                help='Run the commands that need root privileges through a '
+                     'long running nova-rootwrap-daemon, started on first '
+                     'use, instead of starting sudo nova-rootwrap for each '
+                     'command. The daemon applies the same filters.'),
     cfg.StrOpt('tempdir',
                help='Explicitly specify the temporary working directory'),
 ]
@@ -156,8 +164,105 @@ def _get_root_helper():
     return 'sudo nova-rootwrap %s' % CONF.rootwrap_config
 
 
+# Clients of the rootwrap daemons started by this process, by config file
+_ROOTWRAP_DAEMON_CLIENTS = {}
+
+# Exit code of nova-rootwrap for the commands it refuses to run
+_ROOTWRAP_UNAUTHORIZED = 99
+
+
+def _use_rootwrap_daemon(kwargs):
+    return (CONF.use_rootwrap_daemon and kwargs.get('run_as_root') and
+            'root_helper' not in kwargs and not kwargs.get('shell') and
+            os.geteuid() != 0)
+
+
+def _get_rootwrap_daemon_client():
+    config = CONF.rootwrap_config
+    client = _ROOTWRAP_DAEMON_CLIENTS.get(config)
+    if client is None:
+        # Imported here so that processes not using the daemon do not pull
+        # in multiprocessing.
+        from oslo.rootwrap import client as rootwrap_client
+        # The daemon itself is started on the first command.
+        client = rootwrap_client.Client(['sudo', 'nova-rootwrap-daemon',
+                                         config])
+        _ROOTWRAP_DAEMON_CLIENTS[config] = client
+    return client
+
+
+def _rootwrap_daemon_execute(*cmd, **kwargs):
+    """Run a command as root through the rootwrap daemon.
+
+    Takes the same arguments as processutils.execute(), except shell.
+    """
+    process_input = kwargs.pop('process_input', None)
+    env_variables = kwargs.pop('env_variables', None)
+    check_exit_code = kwargs.pop('check_exit_code', [0])
+    ignore_exit_code = False
+    delay_on_retry = kwargs.pop('delay_on_retry', True)
+    attempts = kwargs.pop('attempts', 1)
+    loglevel = kwargs.pop('loglevel', std_logging.DEBUG)
+    kwargs.pop('run_as_root')
+
+    if isinstance(check_exit_code, bool):
+        ignore_exit_code = not check_exit_code
+        check_exit_code = [0]
+    elif isinstance(check_exit_code, int):
+        check_exit_code = [check_exit_code]
+
+    if kwargs:
+        raise processutils.UnknownArgumentError(
+            _('Got unknown keyword args to utils.execute: %r') % kwargs)
+
+    cmd = map(str, cmd)
+    client = _get_rootwrap_daemon_client()
+    from multiprocessing import managers
+
+    while attempts > 0:
+        attempts -= 1
+        LOG.log(loglevel, 'Running cmd (rootwrap daemon): %s',
+                logging.mask_password(' '.join(cmd)))
+        daemon_failed = False
+        try:
+            returncode, stdout, stderr = client.execute(cmd, env_variables,
+                                                        process_input)
+        except rootwrap_wrapper.NoFilterMatched:
+            returncode, stdout, stderr = (
+                _ROOTWRAP_UNAUTHORIZED, '',
+                'Unauthorized command: %s (no filter matched)' %
+                ' '.join(cmd))
+        except (managers.RemoteError, EOFError, IOError) as exc:
+            # NOTE: the daemon failed to run the command or to send back
+            # its result, and the client already restarted a dead daemon
+            # once.  A RemoteError is also what a filter whose executable
+            # is missing ends up as, as the daemon can not serialize the
+            # FilterMatchNotExecutable it raises.
+            daemon_failed = True
+            returncode, stdout, stderr = None, '', six.text_type(exc)
+        LOG.log(loglevel, 'Result was %s' % returncode)
+        if not daemon_failed and (ignore_exit_code or
+                                  returncode in check_exit_code):
+            return stdout, stderr
+        if not attempts:
+            description = None
+            if daemon_failed:
+                description = _('The rootwrap daemon failed to run the '
+                                'command')
+            raise processutils.ProcessExecutionError(exit_code=returncode,
+                                                     stdout=stdout,
+                                                     stderr=stderr,
+                                                     cmd=' '.join(cmd),
+                                                     description=description)
+        LOG.log(loglevel, '%r failed. Retrying.', cmd)
+        if delay_on_retry:
+            eventlet.sleep(random.randint(20, 200) / 100.0)
+
+
 def execute(*cmd, **kwargs):
     """Convenience wrapper around oslo's execute() method."""
+    if _use_rootwrap_daemon(kwargs):
+        return _rootwrap_daemon_execute(*cmd, **kwargs)
     if 'run_as_root' in kwargs and 'root_helper' not in kwargs:
         kwargs['root_helper'] = _get_root_helper()
     return processutils.execute(*cmd, **kwargs)
@@ -165,6 +270,15 @@ def execute(*cmd, **kwargs):
 
 def trycmd(*args, **kwargs):
     """Convenience wrapper around oslo's trycmd() method."""
+    if _use_rootwrap_daemon(kwargs):
+        discard_warnings = kwargs.pop('discard_warnings', False)
+        try:
+            out, err = _rootwrap_daemon_execute(*args, **kwargs)
+        except processutils.ProcessExecutionError as exn:
+            return '', six.text_type(exn)
+        if discard_warnings:
+            err = ''
+        return out, err
     if 'run_as_root' in kwargs and 'root_helper' not in kwargs:
         kwargs['root_helper'] = _get_root_helper()
     return processutils.trycmd(*args, **kwargs)
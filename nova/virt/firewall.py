@@ -19,6 +19,7 @@ from oslo.config import cfg
 
 from nova.compute import utils as compute_utils
 from nova import context
+from nova import exception
 from nova.i18n import _
 from nova.i18n import _LI
 from nova.network import linux_net
@@ -37,6 +38,12 @@ firewall_opts = [
     cfg.BoolOpt('allow_same_net_traffic',
                 default=True,
                 help='Whether to allow network traffic from same network'),
+    cfg.BoolOpt('use_ipset',
+                default=False,
+                help='Whether the iptables firewall driver should match '
+                     'the members of a source security group with a '
+                     'single rule referencing an ipset, rather than one '
+                     'rule per member address'),
 ]
 
 CONF = cfg.CONF
@@ -141,7 +148,17 @@ class IptablesFirewallDriver(FirewallDriver):
     def __init__(self, virtapi, **kwargs):
         super(IptablesFirewallDriver, self).__init__(virtapi)
         self.iptables = linux_net.iptables_manager
+        self.ipset = linux_net.IpsetManager() if CONF.use_ipset else None
         self.instance_info = {}
+        # Compiled rules and member addresses of security groups, tagged
+        # with the group revision they were built from, and for each
+        # filtered instance the groups its rules were built from and the
+        # rules currently in its chain.
+        self._security_group_revisions = {}
+        self._security_group_rules_cache = {}
+        self._security_group_members_cache = {}
+        self._instance_groups = {}
+        self._instance_chain_rules = {}
         self.basically_filtered = False
 
         # Flags for DHCP request rule
@@ -167,9 +184,13 @@ class IptablesFirewallDriver(FirewallDriver):
         self.iptables.defer_apply_off()
 
     def unfilter_instance(self, instance, network_info):
+        group_ids = self._instance_groups.pop(instance['id'], None)
+        self._instance_chain_rules.pop(instance['id'], None)
         if self.instance_info.pop(instance['id'], None):
             self.remove_filters_for_instance(instance)
             self.iptables.apply()
+            if self.ipset is not None and group_ids:
+                self._destroy_unused_ipsets(group_ids)
         else:
             LOG.info(_('Attempted to unfilter instance which is not '
                      'filtered'), instance=instance)
@@ -181,7 +202,9 @@ class IptablesFirewallDriver(FirewallDriver):
                                       ipv6_rules)
         LOG.debug('Filters added to instance: %s', instance['id'],
                   instance=instance)
-        self.refresh_provider_fw_rules()
+        # NOTE: the rules are applied once, below, together with the
+        # instance filters rather than in a separate iptables-restore.
+        self._do_refresh_provider_fw_rules()
         LOG.debug('Provider Firewall Rules refreshed: %s', instance['id'],
                   instance=instance)
         # Ensure that DHCP request rule is updated if necessary
@@ -247,13 +270,19 @@ class IptablesFirewallDriver(FirewallDriver):
                                                             network_info)
         self._add_filters('local', ipv4_rules, ipv6_rules)
         self._add_filters(chain_name, inst_ipv4_rules, inst_ipv6_rules)
+        self._instance_chain_rules[instance['id']] = (inst_ipv4_rules,
+                                                      inst_ipv6_rules)
 
     def remove_filters_for_instance(self, instance):
-        chain_name = self._instance_chain_name(instance)
+        self.remove_filters_for_instances([instance])
+
+    def remove_filters_for_instances(self, instances):
+        chain_names = [self._instance_chain_name(instance)
+                       for instance in instances]
 
-        self.iptables.ipv4['filter'].remove_chain(chain_name)
+        self.iptables.ipv4['filter'].bulk_remove_chains(chain_names)
         if CONF.use_ipv6:
-            self.iptables.ipv6['filter'].remove_chain(chain_name)
+            self.iptables.ipv6['filter'].bulk_remove_chains(chain_names)
 
     def _instance_chain_name(self, instance):
         return 'inst-%s' % (instance['id'],)
@@ -359,60 +388,34 @@ class IptablesFirewallDriver(FirewallDriver):
             ctxt, instance)
 
         # then, security group chains and rules
+        group_ids = set()
         for security_group in security_groups:
-            rules = objects.SecurityGroupRuleList.get_by_security_group(
-                    ctxt, security_group)
-
-            for rule in rules:
-                if not rule['cidr']:
-                    version = 4
-                else:
-                    version = netutils.get_ip_version(rule['cidr'])
-
+            group_ids.add(security_group.id)
+            compiled = self._security_group_rules(ctxt, security_group)
+            for version, rule, grantee_group_id in compiled:
                 if version == 4:
                     fw_rules = ipv4_rules
                 else:
                     fw_rules = ipv6_rules
 
-                protocol = rule['protocol']
+                if grantee_group_id is None:
+                    fw_rules.append(rule)
+                    continue
 
-                if protocol:
-                    protocol = rule['protocol'].lower()
-
-                if version == 6 and protocol == 'icmp':
-                    protocol = 'icmpv6'
-
-                args = ['-j ACCEPT']
-                if protocol:
-                    args += ['-p', protocol]
-
-                if protocol in ['udp', 'tcp']:
-                    args += self._build_tcp_udp_rule(rule, version)
-                elif protocol == 'icmp':
-                    args += self._build_icmp_rule(rule, version)
-                if rule['cidr']:
-                    args += ['-s', str(rule['cidr'])]
-                    fw_rules += [' '.join(args)]
+                group_ids.add(grantee_group_id)
+                if self.ipset is not None:
+                    set_name = self._update_security_group_ipset(
+                        ctxt, grantee_group_id, version)
+                    subrule = rule + ['-m set --match-set %s src' % set_name]
+                    fw_rules += [' '.join(subrule)]
                 else:
-                    if rule['grantee_group']:
-                        insts = (
-                            objects.InstanceList.get_by_security_group(
-                                ctxt, rule['grantee_group']))
-                        for instance in insts:
-                            if instance['info_cache']['deleted']:
-                                LOG.debug('ignoring deleted cache')
-                                continue
-                            nw_info = compute_utils.get_nw_info_for_instance(
-                                    instance)
-
-                            ips = [ip['address']
-                                for ip in nw_info.fixed_ips()
-                                    if ip['version'] == version]
-
-                            LOG.debug('ips: %r', ips, instance=instance)
-                            for ip in ips:
-                                subrule = args + ['-s %s' % ip]
-                                fw_rules += [' '.join(subrule)]
+                    ips = self._security_group_member_ips(
+                        ctxt, grantee_group_id, version)
+                    for ip in ips:
+                        subrule = rule + ['-s %s' % ip]
+                        fw_rules += [' '.join(subrule)]
+
+        self._instance_groups[instance['id']] = group_ids
 
         ipv4_rules += ['-j $sg-fallback']
         ipv6_rules += ['-j $sg-fallback']
@@ -420,38 +423,209 @@ class IptablesFirewallDriver(FirewallDriver):
             security_groups, ipv4_rules, ipv6_rules, instance=instance)
         return ipv4_rules, ipv6_rules
 
+    def _invalidate_security_group(self, security_group_id):
+        revision = self._security_group_revisions.get(security_group_id, 0)
+        self._security_group_revisions[security_group_id] = revision + 1
+
+    def _security_group_rules(self, ctxt, security_group):
+        """Return the compiled rules of a security group.
+
+        Each rule is a (version, rule, grantee_group_id) tuple.  Rules
+        granting access to a CIDR are complete and have no grantee, the
+        others are a list of arguments still to be combined with the
+        addresses of the grantee group's members.
+        """
+        # NOTE: entries are tagged with the revision they were built from
+        # rather than dropped on invalidation, so that a lookup which was
+        # in flight while the group changed can not store stale rules.
+        revision = self._security_group_revisions.get(security_group.id, 0)
+        cached = self._security_group_rules_cache.get(security_group.id)
+        if cached is not None and cached[0] == revision:
+            return cached[1]
+
+        compiled = []
+        rules = objects.SecurityGroupRuleList.get_by_security_group(
+                ctxt, security_group)
+        for rule in rules:
+            if not rule['cidr']:
+                version = 4
+            else:
+                version = netutils.get_ip_version(rule['cidr'])
+
+            protocol = rule['protocol']
+
+            if protocol:
+                protocol = rule['protocol'].lower()
+
+            if version == 6 and protocol == 'icmp':
+                protocol = 'icmpv6'
+
+            args = ['-j ACCEPT']
+            if protocol:
+                args += ['-p', protocol]
+
+            if protocol in ['udp', 'tcp']:
+                args += self._build_tcp_udp_rule(rule, version)
+            elif protocol == 'icmp':
+                args += self._build_icmp_rule(rule, version)
+            if rule['cidr']:
+                args += ['-s', str(rule['cidr'])]
+                compiled.append((version, ' '.join(args), None))
+            elif rule['grantee_group']:
+                compiled.append((version, args, rule['grantee_group'].id))
+
+        self._security_group_rules_cache[security_group.id] = (revision,
+                                                               compiled)
+        return compiled
+
+    def _security_group_member_ips(self, ctxt, security_group_id, version):
+        revision = self._security_group_revisions.get(security_group_id, 0)
+        cached = self._security_group_members_cache.get(security_group_id)
+        if cached is not None and cached[0] == revision:
+            return cached[1][version]
+
+        ips = {4: [], 6: []}
+        insts = objects.InstanceList.get_by_security_group_id(
+            ctxt, security_group_id)
+        for instance in insts:
+            if instance['info_cache']['deleted']:
+                LOG.debug('ignoring deleted cache')
+                continue
+            nw_info = compute_utils.get_nw_info_for_instance(instance)
+            fixed_ips = nw_info.fixed_ips()
+            for ip in fixed_ips:
+                ips[ip['version']].append(ip['address'])
+            LOG.debug('ips: %r', [ip['address'] for ip in fixed_ips],
+                      instance=instance)
+
+        self._security_group_members_cache[security_group_id] = (revision,
+                                                                 ips)
+        return ips[version]
+
+    def _security_group_ipset_name(self, security_group_id, version):
+        # NOTE: ipset names are limited to 31 characters.
+        return 'nova-sg%d-%s' % (version, security_group_id)
+
+    def _update_security_group_ipset(self, ctxt, security_group_id, version):
+        """Sync the ipset holding the members of a security group.
+
+        Returns the name of the set, for use in a --match-set rule.
+        """
+        name = self._security_group_ipset_name(security_group_id, version)
+        ips = self._security_group_member_ips(ctxt, security_group_id,
+                                              version)
+        family = 'inet' if version == 4 else 'inet6'
+        self.ipset.set_members(name, ips, family=family)
+        return name
+
+    def _destroy_unused_ipsets(self, group_ids):
+        """Destroy the ipsets of groups no filtered instance refers to."""
+        in_use = set()
+        for instance_group_ids in self._instance_groups.itervalues():
+            in_use.update(instance_group_ids)
+        for security_group_id in set(group_ids) - in_use:
+            for version in (4, 6):
+                name = self._security_group_ipset_name(security_group_id,
+                                                       version)
+                if self.ipset.has_set(name):
+                    self.ipset.destroy_set(name)
+
     def instance_filter_exists(self, instance, network_info):
         pass
 
     def refresh_security_group_members(self, security_group):
+        if self.ipset is not None:
+            # NOTE: rules granting access to a group only reference its
+            # ipset, so a change of membership never touches iptables.
+            # A set which does not exist yet is not referenced by any
+            # rule on this host, so there is nothing to refresh either.
+            self._invalidate_security_group(security_group)
+            ctxt = context.get_admin_context()
+            for version in (4, 6):
+                name = self._security_group_ipset_name(security_group,
+                                                       version)
+                if self.ipset.has_set(name):
+                    self._update_security_group_ipset(ctxt, security_group,
+                                                      version)
+            return
+        self._invalidate_security_group(security_group)
         self.do_refresh_security_group_rules(security_group)
         self.iptables.apply()
 
     def refresh_security_group_rules(self, security_group):
+        self._invalidate_security_group(security_group)
         self.do_refresh_security_group_rules(security_group)
         self.iptables.apply()
 
     def refresh_instance_security_rules(self, instance):
+        # NOTE: we are not told what changed, which may be the rules of
+        # any of the instance's groups or the members of a group they
+        # grant access to.
+        for group_id in self._instance_groups.get(instance['id'], ()):
+            self._invalidate_security_group(group_id)
         self.do_refresh_instance_rules(instance)
         self.iptables.apply()
 
     @utils.synchronized('iptables', external=True)
     def _inner_do_refresh_rules(self, instance, network_info, ipv4_rules,
                                 ipv6_rules):
-        chain_name = self._instance_chain_name(instance)
-        if not self.iptables.ipv4['filter'].has_chain(chain_name):
-            LOG.info(
-                _LI('instance chain %s disappeared during refresh, '
-                    'skipping') % chain_name,
-                instance=instance)
+        self._refresh_instance_chains([(instance, network_info, ipv4_rules,
+                                        ipv6_rules)])
+
+    @utils.synchronized('iptables', external=True)
+    def _inner_do_refresh_many_rules(self, refreshes):
+        self._refresh_instance_chains(refreshes)
+
+    def _refresh_instance_chains(self, refreshes):
+        """Rebuild the chains of instances whose rules changed.
+
+        refreshes is a list of (instance, network_info, ipv4_rules,
+        ipv6_rules) tuples.  The chains are removed together, as each
+        removal has to go through every rule of the table.
+        """
+        changed = []
+        for instance, network_info, ipv4_rules, ipv6_rules in refreshes:
+            chain_name = self._instance_chain_name(instance)
+            if not self.iptables.ipv4['filter'].has_chain(chain_name):
+                LOG.info(
+                    _LI('instance chain %s disappeared during refresh, '
+                        'skipping') % chain_name,
+                    instance=instance)
+                continue
+            if (self._instance_chain_rules.get(instance['id']) ==
+                    (ipv4_rules, ipv6_rules)):
+                LOG.debug('Rules of instance chain %s unchanged', chain_name,
+                          instance=instance)
+                continue
+            changed.append((instance, network_info, ipv4_rules, ipv6_rules))
+
+        if not changed:
             return
-        self.remove_filters_for_instance(instance)
-        self.add_filters_for_instance(instance, network_info, ipv4_rules,
-                                      ipv6_rules)
+        self.remove_filters_for_instances([refresh[0] for refresh in changed])
+        for instance, network_info, ipv4_rules, ipv6_rules in changed:
+            self.add_filters_for_instance(instance, network_info, ipv4_rules,
+                                          ipv6_rules)
+
+    def _security_group_instance_ids(self, security_group):
+        ctxt = context.get_admin_context()
+        try:
+            insts = objects.InstanceList.get_by_security_group_id(
+                ctxt, security_group)
+        except exception.SecurityGroupNotFound:
+            return set()
+        return set(inst['id'] for inst in insts)
 
     def do_refresh_security_group_rules(self, security_group):
+        # Only rebuild the chains of instances whose rules were built from
+        # the group, or which have just been added to it.
+        members = self._security_group_instance_ids(security_group)
+        refreshes = []
         id_list = self.instance_info.keys()
         for instance_id in id_list:
+            groups = self._instance_groups.get(instance_id)
+            if (groups is not None and security_group not in groups and
+                    instance_id not in members):
+                continue
             try:
                 instance, network_info = self.instance_info[instance_id]
             except KeyError:
@@ -460,8 +634,9 @@ class IptablesFirewallDriver(FirewallDriver):
                 continue
             ipv4_rules, ipv6_rules = self.instance_rules(instance,
                                                          network_info)
-            self._inner_do_refresh_rules(instance, network_info, ipv4_rules,
-                                         ipv6_rules)
+            refreshes.append((instance, network_info, ipv4_rules,
+                              ipv6_rules))
+        self._inner_do_refresh_many_rules(refreshes)
 
     def do_refresh_instance_rules(self, instance):
         _instance, network_info = self.instance_info[instance['id']]
@@ -23,6 +23,7 @@ policy belongs in the 'designer.py' module which provides simplified
 helpers for populating up config object instances.
 """
 
+import copy
 import time
 
 from nova import exception
@@ -78,6 +79,21 @@ class LibvirtConfigObject(object):
         LOG.debug("Generated XML %s ", (xml_str,))
         return xml_str
 
+    def freeze(self):
+        """Pre-render this object for reuse across many documents.
+
+        Once frozen, format_dom() returns a copy of an element tree
+        rendered a single time instead of rebuilding it from the object
+        attributes. This suits host derived sections which are identical
+        for every guest. The object must not be modified once frozen.
+        """
+        self._frozen_dom = self.format_dom()
+        self.format_dom = self._copy_frozen_dom
+        return self
+
+    def _copy_frozen_dom(self):
+        return copy.deepcopy(self._frozen_dom)
+
 
 class LibvirtConfigCaps(LibvirtConfigObject):
 
@@ -333,6 +333,8 @@ class LibvirtDriver(driver.ComputeDriver):
         self._wrapped_conn = None
         self._wrapped_conn_lock = threading.Lock()
         self._caps = None
+        self._host_cpu_features = None
+        self._host_sysinfo = None
         self._vcpu_total = 0
         self.read_only = read_only
         self.firewall_driver = firewall.load_driver(
@@ -657,6 +659,9 @@ class LibvirtDriver(driver.ComputeDriver):
 
         self._wrapped_conn = wrapped_conn
         self._skip_list_all_domains = False
+        # libvirtd may have been restarted or upgraded since the last
+        # connection, so anything derived from the host must be re-read.
+        self._invalidate_host_caches()
 
         try:
             LOG.debug("Registering for lifecycle events %s", self)
@@ -2910,6 +2915,14 @@ class LibvirtDriver(driver.ComputeDriver):
                          'due to an unexpected exception.'), CONF.host,
                      exc_info=True)
 
+    def _invalidate_host_caches(self):
+        """Drops the cached host capabilities and the guest config
+           sections derived from them.
+        """
+        self._caps = None
+        self._host_cpu_features = None
+        self._host_sysinfo = None
+
     def _get_host_capabilities(self):
         """Returns an instance of config.LibvirtConfigCaps representing
            the capabilities of the host.
@@ -2962,10 +2975,17 @@ class LibvirtDriver(driver.ComputeDriver):
 
         guestcpu.match = "exact"
 
-        for hostfeat in hostcpu.features:
-            guestfeat = vconfig.LibvirtConfigGuestCPUFeature(hostfeat.name)
-            guestfeat.policy = "require"
-            guestcpu.add_feature(guestfeat)
+        # The feature list is the same for every guest on this host, so
+        # it is built and pre-rendered once per set of capabilities.
+        if (self._host_cpu_features is None or
+                self._host_cpu_features[0] is not caps):
+            features = set()
+            for hostfeat in hostcpu.features:
+                guestfeat = vconfig.LibvirtConfigGuestCPUFeature(hostfeat.name)
+                guestfeat.policy = "require"
+                features.add(guestfeat.freeze())
+            self._host_cpu_features = (caps, features)
+        guestcpu.features = set(self._host_cpu_features[1])
 
         return guestcpu
 
@@ -3147,13 +3167,20 @@ class LibvirtDriver(driver.ComputeDriver):
         return devices
 
     def _get_guest_config_sysinfo(self, instance):
-        sysinfo = vconfig.LibvirtConfigGuestSysinfo()
+        caps = self._get_host_capabilities()
+        if self._host_sysinfo is None or self._host_sysinfo[0] is not caps:
+            self._host_sysinfo = (caps,
+                                  version.vendor_string(),
+                                  version.product_string(),
+                                  version.version_string_with_package(),
+                                  self._get_host_uuid())
 
-        sysinfo.system_manufacturer = version.vendor_string()
-        sysinfo.system_product = version.product_string()
-        sysinfo.system_version = version.version_string_with_package()
+        sysinfo = vconfig.LibvirtConfigGuestSysinfo()
 
-        sysinfo.system_serial = self._get_host_uuid()
+        (sysinfo.system_manufacturer,
+         sysinfo.system_product,
+         sysinfo.system_version,
+         sysinfo.system_serial) = self._host_sysinfo[1:]
         sysinfo.system_uuid = instance['uuid']
 
         return sysinfo
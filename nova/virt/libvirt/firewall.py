@@ -296,10 +296,14 @@ class IptablesFirewallDriver(base_firewall.IptablesFirewallDriver):
     def unfilter_instance(self, instance, network_info):
         # NOTE(salvatore-orlando):
         # Overriding base class method for applying nwfilter operation
+        group_ids = self._instance_groups.pop(instance['id'], None)
+        self._instance_chain_rules.pop(instance['id'], None)
         if self.instance_info.pop(instance['id'], None):
             self.remove_filters_for_instance(instance)
             self.iptables.apply()
             self.nwfilter.unfilter_instance(instance, network_info)
+            if self.ipset is not None and group_ids:
+                self._destroy_unused_ipsets(group_ids)
         else:
             LOG.info(_LI('Attempted to unfilter instance which is not '
                          'filtered'), instance=instance)
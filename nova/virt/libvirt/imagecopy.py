@@ -0,0 +1,205 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-process, sparse aware copying of local disk images.
+
+Images are copied by the cheapest mechanism the host supports:
+
+ * a reflink clone (FICLONE), which shares extents with the source and
+   completes in constant time on filesystems such as btrfs and XFS;
+ * otherwise, only the data extents reported by SEEK_DATA/SEEK_HOLE are
+   copied, using copy_file_range(2) or sendfile(2) when the interpreter
+   exposes them and a buffered read/write loop that also skips all-zero
+   blocks when it does not.
+
+Holes in the source are never written to the destination, so the copy
+stays as sparse as the original.
+"""
+
+import errno
+import fcntl
+import os
+
+from nova.openstack.common import log as logging
+from nova.openstack.common import units
+
+LOG = logging.getLogger(__name__)
+
+# Linux specific constants which the os module only exposes on newer
+# interpreters.
+SEEK_DATA = getattr(os, 'SEEK_DATA', 3)
+SEEK_HOLE = getattr(os, 'SEEK_HOLE', 4)
+FICLONE = 0x40049409
+
+CHUNK_SIZE = units.Mi
+
+_ZERO_CHUNK = b'\0' * CHUNK_SIZE
+
+# errnos meaning "this mechanism is not available here", as opposed to a
+# real I/O failure which must be propagated.
+_UNSUPPORTED_ERRNOS = (errno.EINVAL, errno.ENOSYS, errno.ENOTTY,
+                       errno.EOPNOTSUPP, errno.EXDEV, errno.EBADF,
+                       errno.ETXTBSY, errno.EPERM)
+
+
+class CopyStats(object):
+    """Summary of a copy_file() call."""
+
+    def __init__(self, method, size, copied=0, skipped=0):
+        self.method = method
+        self.size = size
+        self.copied = copied
+        self.skipped = skipped
+
+    def __repr__(self):
+        return ('<CopyStats method=%s size=%d copied=%d skipped=%d>' %
+                (self.method, self.size, self.copied, self.skipped))
+
+
+def _reflink(src_fd, dst_fd):
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except (IOError, OSError) as e:
+        if e.errno in _UNSUPPORTED_ERRNOS:
+            return False
+        raise
+    return True
+
+
+def _data_extents(fd, size):
+    """Yield (offset, length) for each data extent of an open file.
+
+    Falls back to a single extent covering the whole file when the
+    filesystem does not implement SEEK_DATA/SEEK_HOLE.
+    """
+    offset = 0
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # No data past offset, the rest of the file is a hole.
+                return
+            if e.errno in _UNSUPPORTED_ERRNOS and offset == 0:
+                yield 0, size
+                return
+            raise
+        end = min(os.lseek(fd, start, SEEK_HOLE), size)
+        if end > start:
+            yield start, end - start
+        offset = end
+
+
+def _copy_range_syscall(src_fd, dst_fd, offset, length):
+    """Copy an extent without bouncing it through userspace.
+
+    Returns the number of bytes copied, which may be less than length if
+    the kernel refuses the request part way through, or 0 if neither
+    copy_file_range nor sendfile are usable.
+    """
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    sendfile = getattr(os, 'sendfile', None)
+    done = 0
+    while done < length:
+        pos = offset + done
+        try:
+            if copy_file_range is not None:
+                n = copy_file_range(src_fd, dst_fd, length - done,
+                                    pos, pos)
+            elif sendfile is not None:
+                os.lseek(dst_fd, pos, os.SEEK_SET)
+                n = sendfile(dst_fd, src_fd, pos, length - done)
+            else:
+                return 0
+        except OSError as e:
+            if e.errno in _UNSUPPORTED_ERRNOS and done == 0:
+                return 0
+            raise
+        if n == 0:
+            break
+        done += n
+    return done
+
+
+def _copy_range_buffered(src_fd, dst_fd, offset, length, stats):
+    end = offset + length
+    while offset < end:
+        os.lseek(src_fd, offset, os.SEEK_SET)
+        buf = os.read(src_fd, min(CHUNK_SIZE, end - offset))
+        if not buf:
+            break
+        n = len(buf)
+        if buf == _ZERO_CHUNK[:n]:
+            stats.skipped += n
+        else:
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            view = memoryview(buf)
+            written = 0
+            while written < n:
+                written += os.write(dst_fd, view[written:])
+            stats.copied += n
+        offset += n
+
+
+def copy_file(src, dest):
+    """Copy the regular file src to dest, preserving holes.
+
+    dest is created or truncated.  Returns a CopyStats describing how
+    the copy was performed and how many bytes were actually transferred
+    versus skipped as holes or zero blocks.
+    """
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        size = os.fstat(src_fd).st_size
+        dst_fd = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if size and _reflink(src_fd, dst_fd):
+                stats = CopyStats('reflink', size, skipped=size)
+            else:
+                stats = _copy_extents(src_fd, dst_fd, size)
+            # Recreate any trailing hole and fix up the size if the
+            # final extents were skipped.
+            os.ftruncate(dst_fd, size)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+    LOG.debug('Copied %(src)s to %(dest)s using %(method)s: '
+              '%(copied)d bytes copied, %(skipped)d bytes skipped',
+              {'src': src, 'dest': dest, 'method': stats.method,
+               'copied': stats.copied, 'skipped': stats.skipped})
+    return stats
+
+
+def _copy_extents(src_fd, dst_fd, size):
+    stats = CopyStats('buffered', size)
+    use_syscall = True
+    data = 0
+    for offset, length in _data_extents(src_fd, size):
+        data += length
+        if use_syscall:
+            done = _copy_range_syscall(src_fd, dst_fd, offset, length)
+            if done:
+                stats.method = 'syscall'
+                stats.copied += done
+                offset += done
+                length -= done
+            else:
+                use_syscall = False
+        if length:
+            _copy_range_buffered(src_fd, dst_fd, offset, length, stats)
+    stats.skipped += size - data
+    return stats
@@ -22,6 +22,7 @@ import errno
 import os
 import platform
 
+from eventlet import tpool
 from lxml import etree
 from oslo.config import cfg
 
@@ -32,6 +33,7 @@ from nova.openstack.common import log as logging
 from nova.openstack.common import processutils
 from nova import utils
 from nova.virt import images
+from nova.virt.libvirt import imagecopy
 from nova.virt import volumeutils
 
 libvirt_opts = [
@@ -39,6 +41,12 @@ libvirt_opts = [
                 default=False,
                 help='Compress snapshot images when possible. This '
                      'currently applies exclusively to qcow2 images'),
+    cfg.BoolOpt('sparse_image_copy',
+                default=True,
+                help='Copy local disk images in-process, cloning them with '
+                     'a reflink where the filesystem supports it and '
+                     'otherwise copying only their data extents. When '
+                     'disabled, local copies shell out to cp.'),
     ]
 
 CONF = cfg.CONF
@@ -312,6 +320,13 @@ def copy_image(src, dest, host=None):
     """
 
     if not host:
+        if os.path.isdir(dest):
+            dest = os.path.join(dest, os.path.basename(src))
+        if CONF.libvirt.sparse_image_copy:
+            # Run in a native thread so that copying a large image does
+            # not stall every other greenthread in the process.
+            tpool.execute(imagecopy.copy_file, src, dest)
+            return
         # We shell out to cp because that will intelligently copy
         # sparse files.  I.E. holes will not be written to DEST,
         # rather recreated efficiently.  In addition, since
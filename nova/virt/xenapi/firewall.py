@@ -46,6 +46,9 @@ class Dom0IptablesFirewallDriver(firewall.IptablesFirewallDriver):
         self._session = xenapi_session
         # Create IpTablesManager with executor through plugin
         self.iptables = linux_net.IptablesManager(self._plugin_execute)
+        # NOTE: the dom0 plugin only runs iptables commands, so ipsets
+        # can not be used to match security group members.
+        self.ipset = None
         self.iptables.ipv4['filter'].add_chain('sg-fallback')
         self.iptables.ipv4['filter'].add_rule('sg-fallback', '-j DROP')
         self.iptables.ipv6['filter'].add_chain('sg-fallback')
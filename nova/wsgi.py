@@ -19,12 +19,18 @@
 
 from __future__ import print_function
 
+import bisect
+import os
 import os.path
+import random
 import socket
 import ssl
 import sys
+import time
 
 import eventlet
+from eventlet import event
+from eventlet.green import socket as green_socket
 import eventlet.wsgi
 import greenlet
 from oslo.config import cfg
@@ -69,12 +75,38 @@ wsgi_opts = [
                     "max_header_line may need to be increased when using "
                     "large tokens (typically those generated by the "
                     "Keystone v3 API with big service catalogs)."),
+    cfg.BoolOpt('wsgi_reuse_port',
+                default=False,
+                help="Give each worker process its own listening socket "
+                     "bound with SO_REUSEPORT, so the kernel balances new "
+                     "connections across the workers instead of them "
+                     "competing to accept from one shared socket. Requires "
+                     "Linux 3.9 or later."),
+    cfg.IntOpt('wsgi_max_requests_per_worker',
+               default=0,
+               help="Number of requests a worker process serves before it "
+                    "finishes its in flight requests and exits, to be "
+                    "replaced by a fresh one. Caps the memory growth of "
+                    "long running workers. Each worker adds up to 10% to "
+                    "the limit, so they are not all replaced at once. 0 "
+                    "means unlimited."),
+    cfg.IntOpt('wsgi_stats_interval',
+               default=0,
+               help="Interval in seconds at which each worker process logs "
+                    "its request count and latency histogram. 0 disables "
+                    "the statistics."),
     ]
 CONF = cfg.CONF
 CONF.register_opts(wsgi_opts)
 
 LOG = logging.getLogger(__name__)
 
+# Upper bounds in seconds of the buckets of the request latency histogram
+_LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+# Seconds a recycled worker waits for its in flight requests to finish
+_RECYCLE_GRACE_PERIOD = 60
+
 
 class Server(object):
     """Server class to manage a WSGI server, serving a WSGI application."""
@@ -108,6 +140,18 @@ class Server(object):
         self._wsgi_logger = logging.WritableLogger(self._logger)
         self._use_ssl = use_ssl
         self._max_url_len = max_url_len
+        self._reuse_port = CONF.wsgi_reuse_port
+        self._max_requests = CONF.wsgi_max_requests_per_worker
+        self._request_limit = self._max_requests
+        self._stats_thread = None
+        self._listen_socket = None
+        self._ssl_kwargs = None
+        self._wsgi_server = None
+        # Only the worker processes forked from this one are recycled,
+        # as the launcher in this process replaces them when they exit.
+        self._parent_pid = os.getpid()
+        self._requests = 0
+        self._latencies = [0] * (len(_LATENCY_BUCKETS) + 1)
 
         if backlog < 1:
             raise exception.InvalidInput(
@@ -127,16 +171,116 @@ class Server(object):
         except Exception:
             family = socket.AF_INET
 
+        self._bind_addr = bind_addr
+        self._family = family
+        self._backlog = backlog
         try:
-            self._socket = eventlet.listen(bind_addr, family, backlog=backlog)
+            if self._reuse_port:
+                # Hold on to the address without listening on it, each
+                # worker listens on a socket of its own.
+                self._socket = self._reuse_port_socket(listen=False)
+            else:
+                self._socket = eventlet.listen(bind_addr, family,
+                                               backlog=backlog)
         except EnvironmentError:
             LOG.error(_("Could not bind to %(host)s:%(port)s"),
                       {'host': host, 'port': port})
             raise
 
         (self.host, self.port) = self._socket.getsockname()[0:2]
+        self._bind_addr = self._socket.getsockname()
         LOG.info(_("%(name)s listening on %(host)s:%(port)s") % self.__dict__)
 
+    def _reuse_port_socket(self, listen=True):
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise exception.InvalidInput(
+                    reason=_('SO_REUSEPORT is not supported on this '
+                             'platform'))
+        sock = green_socket.socket(self._family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(self._bind_addr)
+        if listen:
+            sock.listen(self._backlog)
+        return sock
+
+    def get_stats(self):
+        """Return the request statistics of this worker process.
+
+        latency is a list of (upper bound in seconds, request count)
+        tuples, with None as the bound of the last bucket.
+        """
+        return {'pid': os.getpid(),
+                'requests': self._requests,
+                'latency': zip(_LATENCY_BUCKETS + (None,), self._latencies)}
+
+    def _log_stats(self):
+        stats = self.get_stats()
+        histogram = ', '.join(
+            ('<=%ss: %d' % (bound, count) if bound is not None
+             else '>%ss: %d' % (_LATENCY_BUCKETS[-1], count))
+            for bound, count in stats['latency'])
+        LOG.info(_("%(name)s worker %(pid)d served %(requests)d requests, "
+                   "latencies %(histogram)s"),
+                 {'name': self.name, 'pid': stats['pid'],
+                  'requests': stats['requests'], 'histogram': histogram})
+
+    def _report_stats(self):
+        while True:
+            eventlet.sleep(CONF.wsgi_stats_interval)
+            self._log_stats()
+
+    def _count_request(self, environ, start_response):
+        """Serve a request, recording it in the worker statistics."""
+        start = time.time()
+        try:
+            return self.app(environ, start_response)
+        finally:
+            self._requests += 1
+            self._latencies[bisect.bisect_left(_LATENCY_BUCKETS,
+                                               time.time() - start)] += 1
+            if (self._requests == self._request_limit and
+                    os.getpid() != self._parent_pid):
+                eventlet.spawn_n(self._recycle)
+
+    def _recycle(self):
+        """Finish the in flight requests and exit the worker process."""
+        LOG.info(_("%(name)s worker %(pid)d exiting after %(requests)d "
+                   "requests"),
+                 {'name': self.name, 'pid': os.getpid(),
+                  'requests': self._requests})
+        listen_socket, self._listen_socket = self._listen_socket, None
+        self.stop()
+        if listen_socket is not None:
+            self._pool.resize(self.pool_size)
+            self._drain_listen_socket(listen_socket)
+        with eventlet.Timeout(_RECYCLE_GRACE_PERIOD, False):
+            self._pool.waitall()
+        self._log_stats()
+        # The launcher that forked this worker replaces it.
+        os._exit(0)
+
+    def _drain_listen_socket(self, sock):
+        """Serve the connections queued on this worker's own socket.
+
+        Closing a SO_REUSEPORT socket resets the connections the kernel
+        already queued on it, rather than handing them to the other
+        workers.
+        """
+        wsgi_server = self._wsgi_server.wait()
+        sock.settimeout(0.0)
+        while True:
+            try:
+                client, address = sock.accept()
+            except (socket.error, socket.timeout):
+                break
+            client.settimeout(wsgi_server.socket_timeout)
+            if self._ssl_kwargs:
+                client = eventlet.wrap_ssl(client, **self._ssl_kwargs)
+            self._pool.spawn_n(wsgi_server.process_request,
+                               (client, address))
+        sock.close()
+
     def start(self):
         """Start serving a WSGI application.
 
@@ -147,7 +291,11 @@ class Server(object):
         # give bad file descriptor error. So duplicating the socket object,
         # to keep file descriptor usable.
 
-        dup_socket = self._socket.dup()
+        if self._reuse_port:
+            self._listen_socket = self._reuse_port_socket()
+            dup_socket = self._listen_socket.dup()
+        else:
+            dup_socket = self._socket.dup()
         if self._use_ssl:
             try:
                 ca_file = CONF.ssl_ca_file
@@ -184,6 +332,7 @@ class Server(object):
 
                 dup_socket = eventlet.wrap_ssl(dup_socket,
                                                **ssl_kwargs)
+                self._ssl_kwargs = ssl_kwargs
 
                 dup_socket.setsockopt(socket.SOL_SOCKET,
                                       socket.SO_REUSEADDR, 1)
@@ -202,14 +351,25 @@ class Server(object):
                     LOG.error(_("Failed to start %(name)s on %(host)s"
                                 ":%(port)s with SSL support") % self.__dict__)
 
+        self._wsgi_server = event.Event()
+        # Spread the limits so the workers are not all replaced at once
+        self._request_limit = (self._max_requests +
+                               random.randint(0, self._max_requests // 10))
+        site = self.app
+        if self._max_requests or CONF.wsgi_stats_interval:
+            site = self._count_request
+            if CONF.wsgi_stats_interval:
+                self._stats_thread = eventlet.spawn(self._report_stats)
+
         wsgi_kwargs = {
             'func': eventlet.wsgi.server,
             'sock': dup_socket,
-            'site': self.app,
+            'site': site,
             'protocol': self._protocol,
             'custom_pool': self._pool,
             'log': self._wsgi_logger,
             'log_format': CONF.wsgi_log_format,
+            'server_event': self._wsgi_server,
             'debug': False
             }
 
@@ -237,6 +397,15 @@ class Server(object):
         """
         LOG.info(_("Stopping WSGI server."))
 
+        if self._stats_thread is not None:
+            self._stats_thread.kill()
+            self._stats_thread = None
+
+        if self._listen_socket is not None:
+            # Let the other workers get the new connections
+            self._listen_socket.close()
+            self._listen_socket = None
+
         if self._server is not None:
             # Resize pool to stop new requests from being processed
             self._pool.resize(0)